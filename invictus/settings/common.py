@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -138,3 +139,58 @@ STATIC_URL = '/static/'
 GRAPHENE = {
     'SCHEMA': 'invictus.schema.schema',
 }
+
+# Caches
+# The graphql cache keeps the GraphQL query responses of the current crawl
+# version, its backend is any Django cache backend and is bounded by MAX_ENTRIES
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'graphql': {
+        'BACKEND': os.environ.get('GRAPHQL_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('GRAPHQL_CACHE_LOCATION', 'graphql'),
+        'TIMEOUT': int(os.environ.get('GRAPHQL_CACHE_TIMEOUT', 24 * 60 * 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('GRAPHQL_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+# Size in bytes of the largest GraphQL response cached
+GRAPHQL_CACHE_MAX_RESPONSE_SIZE = int(os.environ.get('GRAPHQL_CACHE_MAX_RESPONSE_SIZE', 1024 * 1024))
+
+# Seconds the crawl version of the cached GraphQL responses is reused before being read again
+GRAPHQL_CACHE_VERSION_TTL = float(os.environ.get('GRAPHQL_CACHE_VERSION_TTL', 1))
+
+# Number of parsed and validated GraphQL documents kept in memory
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 256))
+
+# Only execute the GraphQL queries registered with register_persisted_queries
+GRAPHQL_PERSISTED_QUERIES_ONLY = os.environ.get('GRAPHQL_PERSISTED_QUERIES_ONLY', '').lower() in ('1', 'true', 'yes')
+
+# Maximum number of rows of a page of the API connection fields
+GRAPHQL_MAX_PAGE_SIZE = int(os.environ.get('GRAPHQL_MAX_PAGE_SIZE', 100))
+
+# Crawlers
+# Directory of the lock files preventing overlapping runs of a crawler
+CRAWL_LOCK_DIR = os.environ.get('CRAWL_LOCK_DIR', tempfile.gettempdir())
+
+# (community, server id) universes crawled by crawl_ogame, set as "br:144,en:1"
+OGAME_UNIVERSES = [
+    (community, int(server_id))
+    for community, server_id in (
+        universe.strip().split(':') for universe in os.environ.get('OGAME_UNIVERSES', 'br:144').split(',')
+    )
+]
+
+# Days raw scores and hourly score rollups are kept once rolled up, unset keeps them forever
+SCORE_RETENTION_DAYS = int(os.environ.get('SCORE_RETENTION_DAYS', 0)) or None
+HOURLY_SCORE_RETENTION_DAYS = int(os.environ.get('HOURLY_SCORE_RETENTION_DAYS', 0)) or None
+
+# Read CompressedDict blobs written before the codec version header, turn off once recompress_blobs ran
+COMPRESSED_DICT_LEGACY_READS = os.environ.get('COMPRESSED_DICT_LEGACY_READS', 'true').lower() in ('1', 'true', 'yes')
+
+# Directory of the Parquet score archive, unset disables it
+SCORE_ARCHIVE_DIR = os.environ.get('SCORE_ARCHIVE_DIR')
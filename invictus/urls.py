@@ -15,12 +15,11 @@ Including another URLconf
 """
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
-from ogame.views import api_root, wiki
+from ogame.views import api_root, wiki, CachedGraphQLView
 
 
 urlpatterns = [
-    path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path('graphql/', csrf_exempt(CachedGraphQLView.as_view(graphiql=True))),
     path('', api_root),
     path('wiki/', wiki)
 ]
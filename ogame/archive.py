@@ -0,0 +1,120 @@
+import os
+import uuid
+import pandas as pd
+import pytz
+from django.conf import settings
+from ogame.models import Score
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+class ScoreArchive:
+    """
+    Append only Parquet archive of the collected scores.
+
+    Scores are stored in one directory per UTC day (`day=YYYY-MM-DD`), with a
+    file per write, so appending never rewrites existing files. Reads only
+    open the days in range, memory map the files and load the requested
+    columns. The archive is disabled when SCORE_ARCHIVE_DIR is unset or
+    pyarrow is not installed.
+    """
+    COLUMNS = ['player_id', 'timestamp', 'datetime'] + [
+        f'{category}_{column}' for category in Score.CATEGORIES for column in ('score', 'rank')
+    ] + ['military_ships']
+
+    def __init__(self, path=None):
+        self.path = path or settings.SCORE_ARCHIVE_DIR
+
+    @property
+    def enabled(self):
+        return bool(self.path) and pq is not None
+
+    def append(self, rows, prefix='scores'):
+        """
+        Writes the score `rows`, dicts with the archive columns, to the days
+        they were collected on.
+        """
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=ScoreArchive.COLUMNS)
+        frame['datetime'] = pd.to_datetime(frame['datetime'], utc=True)
+        name = f'{prefix}-{int(frame.timestamp.min())}-{uuid.uuid4().hex[:8]}.parquet'
+
+        for day, day_frame in frame.groupby(frame['datetime'].dt.strftime('%Y-%m-%d')):
+            directory = os.path.join(self.path, f'day={day}')
+            os.makedirs(directory, exist_ok=True)
+            # readers never see a partially written file
+            temp_path = os.path.join(directory, f'.{name}')
+            pq.write_table(pa.Table.from_pandas(day_frame, preserve_index=False), temp_path)
+            os.replace(temp_path, os.path.join(directory, name))
+
+    def append_records(self, written):
+        """
+        Archives the scores written by a crawl cycle, from the (player,
+        record) pairs of `PlayerScoreIngest.written`.
+        """
+        self.append([
+            dict(player_id=player.pk, timestamp=record['timestamp'], datetime=record['datetime'], **record['scores'])
+            for player, record in written
+            if record['scores'] is not None
+        ])
+
+    def files(self, start=None, stop=None):
+        if not os.path.isdir(self.path):
+            return []
+        start_day = start.astimezone(pytz.utc).strftime('%Y-%m-%d') if start else None
+        stop_day = stop.astimezone(pytz.utc).strftime('%Y-%m-%d') if stop else None
+
+        paths = []
+        for directory in sorted(os.listdir(self.path)):
+            day = directory.split('=')[-1]
+            if (start_day and day < start_day) or (stop_day and day > stop_day):
+                continue
+            day_path = os.path.join(self.path, directory)
+            paths += [
+                os.path.join(day_path, name)
+                for name in sorted(os.listdir(day_path))
+                if name.endswith('.parquet') and not name.startswith('.')
+            ]
+        return paths
+
+    def read(self, columns=None, start=None, stop=None, player_ids=None):
+        """
+        Returns the archived scores collected between `start` and `stop` as a
+        DataFrame with the given `columns`, optionally limited to the players
+        with primary keys in `player_ids`.
+        """
+        columns = list(columns or ScoreArchive.COLUMNS)
+        read_columns = list(dict.fromkeys(columns + ['player_id', 'timestamp']))
+        filters = []
+        if start is not None:
+            filters.append(('timestamp', '>=', int(start.timestamp())))
+        if stop is not None:
+            filters.append(('timestamp', '<=', int(stop.timestamp())))
+        if player_ids is not None:
+            filters.append(('player_id', 'in', list(player_ids)))
+
+        tables = [
+            pq.read_table(path, columns=read_columns, filters=filters or None, memory_map=True)
+            for path in self.files(start, stop)
+        ]
+        if not tables:
+            return pd.DataFrame(columns=columns)
+
+        frame = pa.concat_tables(tables).to_pandas()
+        # a score archived twice, by a backfill and a crawl cycle, is read once
+        frame = frame.drop_duplicates(['player_id', 'timestamp']).sort_values('timestamp')
+        return frame[columns].reset_index(drop=True)
+
+    def history(self, player_id, start=None, stop=None):
+        """
+        Returns the archived (datetime, total score) pairs of a player, in the
+        format the statistics functions take.
+        """
+        frame = self.read(['datetime', 'total_score'], start, stop, player_ids=[player_id])
+        frame = frame[frame.total_score.notna()]
+        return list(zip(frame['datetime'].dt.to_pydatetime(), frame['total_score']))
@@ -0,0 +1,117 @@
+import json
+from functools import lru_cache
+from hashlib import sha1
+from time import monotonic
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+from graphql.error import GraphQLSyntaxError
+from graphql.language import ast
+from graphql.language.parser import parse
+from graphql.language.printer import print_ast
+from ogame.models import CrawlRun, FleetRecord
+
+
+@lru_cache(maxsize=1024)
+def normalize(query):
+    """
+    Returns the printed AST of the `query` document, the same for documents
+    differing only in whitespace, commas and comments, and the type of each
+    of its operations by operation name. Returns None for invalid documents.
+    """
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError:
+        return None
+    operations = {
+        definition.name.value if definition.name else None: definition.operation
+        for definition in document.definitions
+        if isinstance(definition, ast.OperationDefinition)
+    }
+    return print_ast(document), operations
+
+
+class GraphQLResponseCache:
+    """
+    Caches the responses of GraphQL queries by normalized document,
+    variables and crawl version.
+
+    The data served only changes when a crawl run finishes or a fleet record
+    is created, so the crawl version is made of the last CrawlRun finish
+    time and the last FleetRecord id. Commands changing data outside a crawl
+    run record one with `bump`. Responses of older versions are never
+    read again and are evicted by the size bound of the cache backend. The
+    version is read at most once every `version_ttl` seconds per process.
+    """
+    def __init__(self, alias='graphql', max_response_size=None, version_ttl=None):
+        self.alias = alias
+        self.max_response_size = max_response_size or settings.GRAPHQL_CACHE_MAX_RESPONSE_SIZE
+        self.version_ttl = version_ttl if version_ttl is not None else settings.GRAPHQL_CACHE_VERSION_TTL
+        self.version = None
+        self.version_expires = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def crawl_version(self):
+        now = monotonic()
+        if self.version is None or now >= self.version_expires:
+            finished_at = CrawlRun.objects.aggregate(last=Max('finished_at'))['last']
+            fleet_record = FleetRecord.objects.aggregate(last=Max('pk'))['last']
+            self.version = f'{finished_at.timestamp() if finished_at else 0}:{fleet_record or 0}'
+            self.version_expires = now + self.version_ttl
+        return self.version
+
+    def invalidate(self):
+        """
+        Reads the crawl version again on the next request, after a change
+        made by this process.
+        """
+        self.version = None
+
+    def bump(self, job):
+        """
+        Moves the crawl version of every process forward after a data change
+        made outside a crawl run, recorded as a finished run of `job`.
+        """
+        now = timezone.now()
+        CrawlRun.objects.create(job=job, status=CrawlRun.SUCCESS, started_at=now, finished_at=now, duration=0)
+        self.invalidate()
+
+    def get_key(self, query, variables=None, operation_name=None, pretty=False):
+        """
+        Returns the cache key of a request, None when it is not a query
+        operation.
+        """
+        if not query:
+            return None
+        normalized = normalize(query)
+        if normalized is None:
+            return None
+        document, operations = normalized
+        if operation_name is None and len(operations) == 1:
+            operation = next(iter(operations.values()))
+        else:
+            operation = operations.get(operation_name)
+        if operation != 'query':
+            return None
+
+        payload = json.dumps(
+            [document, variables or {}, operation_name, pretty, self.crawl_version()],
+            sort_keys=True,
+            default=str
+        )
+        return f'graphql:{sha1(payload.encode()).hexdigest()}'
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, response):
+        if len(response) > self.max_response_size:
+            return
+        self.cache.set(key, response)
+
+
+response_cache = GraphQLResponseCache()
@@ -2,12 +2,24 @@ import re
 import requests
 from bs4 import BeautifulSoup
 from dateutil import parser
-from time import sleep
 from datetime import datetime
+from functools import lru_cache
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import warnings
+import pandas as pd
 import ogame_stats
-from ogame.models import Player, Score, Alliance, CombatReport
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from ogame.models import Player, Planet, Score, Alliance, AllianceGalaxy, CombatReport, CombatReportFleet
 from ogame.types import CompressedDict
+from ogame.ingest import PlayerScoreIngest, PlayerNameIndex
+from ogame.rollups import ScoreRollups
+from ogame.archive import ScoreArchive
+from ogame.fetchers import PlayerDataFetcher, ForumFetcher
+from ogame.util import fleet_mapping
 
 
 warnings.filterwarnings('ignore')
@@ -19,214 +31,335 @@ class OgameStatsCrawler:
     """
     SERVER_ID = 144
     COMMUNITY = 'br'
+    HIGHSCORE_CATEGORIES = Score.CATEGORIES
+    GALAXIES = 9
 
     @staticmethod
-    def get_universe_data():
-        data = ogame_stats.UniverseQuestions(
-            OgameStatsCrawler.SERVER_ID,
-            OgameStatsCrawler.COMMUNITY
-        )
+    def get_universe_data(server_id=SERVER_ID, community=COMMUNITY):
+        data = ogame_stats.UniverseQuestions(server_id, community)
         return data
 
     @staticmethod
-    def get_highscore_data():
-        data = ogame_stats.HighScoreQuestions(
-            OgameStatsCrawler.SERVER_ID,
-            OgameStatsCrawler.COMMUNITY
-        )
+    def get_highscore_data(server_id=SERVER_ID, community=COMMUNITY):
+        data = ogame_stats.HighScoreQuestions(server_id, community)
         return data
 
     @staticmethod
-    def update_player_data(data, player_id, highscores, status, alliances):
-        player, _ = Player.objects.get_or_create(
-            player_id=int(player_id),
-            server_id=data['serverId']
-        )
+    def get_highscore_index(highscores):
+        """
+        Joins the eight highscore categories into a single mapping keyed by
+        player id, so each player score is found with one dict lookup
+        instead of eight dataframe scans.
+        """
+        layout = []
+        frames = []
+        for category in OgameStatsCrawler.HIGHSCORE_CATEGORIES:
+            columns = ['position', 'score']
+            if category == 'military':
+                columns.append('ships')
+            frame = getattr(highscores, category).drop_duplicates('id').set_index('id')
+            frame = frame[columns].fillna(0)
+            frame.columns = [f'{category}_{column}' for column in columns]
+            frames.append(frame)
+            layout.append((category, len(columns) == 3))
+
+        # players missing from any category are left out, as before
+        highscore_table = pd.concat(frames, axis=1, join='inner')
+
+        index = {}
+        for player_id, *values in highscore_table.itertuples(name=None):
+            values = iter(values)
+            player_scores = {}
+            for category, has_ships in layout:
+                rank, score = next(values), next(values)
+                player_scores[category] = {'score': float(score), 'rank': int(rank)}
+                if has_ships:
+                    player_scores[category]['ships'] = int(next(values))
+            index[player_id] = player_scores
+
+        return index
 
-        player.name = data['name']
-        # print(f'Updating player: {player.player_id}:{player.name}')
-        player.status = status
-        player.planets = CompressedDict(data['planets']).bit_string
-        player.save()
+    @staticmethod
+    def get_planet_rows(planets):
+        """
+        Maps the planet ids of a playerData planets element to their
+        (name, galaxy, system, position, moon name) rows.
+        """
+        planets = (planets or {}).get('planet', [])
+        if isinstance(planets, dict):
+            planets = [planets]
+
+        rows = {}
+        for planet in planets:
+            galaxy, system, position = (int(coord) for coord in planet['coords'].split(':'))
+            moon = planet.get('moon')
+            rows[int(planet['id'])] = (planet['name'], galaxy, system, position, moon['name'] if moon else None)
+        return rows
 
+    @staticmethod
+    def get_player_record(data, player_id, highscore_index, status):
+        """
+        Builds the player and score record of a player for the ingest stage.
+        """
         dt_reference = datetime.utcnow()
-        score, created = Score.objects.get_or_create(
-            player=player,
-            timestamp=dt_reference.timestamp()
-        )
+        record = {
+            'player_id': int(player_id),
+            'server_id': data['serverId'],
+            'name': data['name'],
+            'status': status if status is None else str(status),
+            'planets': CompressedDict(data['planets']).bit_string,
+            'planet_rows': OgameStatsCrawler.get_planet_rows(data['planets']),
+            'alliance': data.get('alliance'),
+            'timestamp': int(dt_reference.timestamp()),
+            'datetime': dt_reference,
+            'rank': None,
+            'scores': None,
+        }
 
-        if not created:
-            return
+        player_scores = highscore_index.get(str(player_id))
+        if player_scores is None:
+            print(f'Failed retrieving {data["name"]} score')
+            return record
 
-        # print(f'Updating score for player: {player.player_id}:{player.name}')
-        player_id = str(player_id)
-        try:
-            total = highscores.total[['position', 'score']].loc[highscores.total.id == player_id].fillna(0).values[0]
-            economy = highscores.economy[['position', 'score']].loc[highscores.economy.id == player_id].fillna(0).values[0]
-            research = highscores.research[['position', 'score']].loc[highscores.research.id == player_id].fillna(0).values[0]
-            military = highscores.military[['position', 'score', 'ships']].loc[highscores.military.id == player_id].fillna(0).values[0]
-            military_built = highscores.military_built[['position', 'score']].loc[highscores.military_built.id == player_id].fillna(0).values[0]
-            military_destroyed = highscores.military_destroyed[['position', 'score']].loc[highscores.military_destroyed.id == player_id].fillna(0).values[0]
-            military_lost = highscores.military_lost[['position', 'score']].loc[highscores.military_lost.id == player_id].fillna(0).values[0]
-            honor = highscores.honor[['position', 'score']].loc[highscores.honor.id == player_id].fillna(0).values[0]
-        except IndexError:
-            print(f'Failed retrieving {player.name} score')
-            return
+        record['rank'] = player_scores['total']['rank']
+        record['scores'] = {}
+        for category in OgameStatsCrawler.HIGHSCORE_CATEGORIES:
+            record['scores'][f'{category}_score'] = player_scores[category]['score']
+            record['scores'][f'{category}_rank'] = player_scores[category]['rank']
+        record['scores']['military_ships'] = player_scores['military']['ships']
+        return record
 
-        score.total = CompressedDict({
-            'score': float(total[1]),
-            'rank': int(total[0])}
-        ).bit_string
-        score.economy = CompressedDict({
-            'score': float(economy[1]),
-            'rank': int(economy[0])}
-        ).bit_string
-        score.research = CompressedDict({
-            'score': float(research[1]),
-            'rank': int(research[0])}
-        ).bit_string
-        score.military = CompressedDict({
-            'score': float(military[1]),
-            'rank': int(military[0]),
-            'ships': int(military[2])
-        }).bit_string
-        score.military_built = CompressedDict({
-            'score': float(military_built[1]),
-            'rank': int(military_built[0])}
-        ).bit_string
-        score.military_destroyed = CompressedDict({
-            'score': float(military_destroyed[1]),
-            'rank': int(military_destroyed[0])}
-        ).bit_string
-        score.military_lost = CompressedDict({
-            'score': float(military_lost[1]),
-            'rank': int(military_lost[0])}
-        ).bit_string
-        score.honor = CompressedDict({
-            'score': float(honor[1]),
-            'rank': int(honor[0])}
-        ).bit_string
-        score.datetime = dt_reference
-        score.save()
-        player.rank = int(total[0])
-        player.save()
-
-        if not data.get('alliance'):
-            player.alliance = None
-            player.save()
-            return
+    @staticmethod
+    def update_alliances(alliances, server_id=SERVER_ID):
+        """
+        Upserts every alliance of the universe alliances data in bulk,
+        resolving founders from an in memory player id map.
+        Returns the stored alliances of the server keyed by ingame alliance id.
+        """
+        server_id = str(server_id)
+        founders = dict(Player.objects.filter(server_id=server_id).values_list('player_id', 'pk'))
+        stored = {ally.ally_id: ally for ally in Alliance.objects.filter(server_id=server_id)}
+
+        created, updated = [], []
+        for ally_data in alliances.drop_duplicates('id').values:
+            ally_id, name, tag, founder, found_date, is_open, logo, homepage = ally_data
+            try:
+                ally_id = int(ally_id)
+                found_date = datetime.fromtimestamp(int(found_date))
+                founder = founders.get(int(founder))
+            except Exception as err:
+                print(f'Ally {name} update error: {str(err)}')
+                continue
 
-        ally_data = alliances.loc[alliances.id == data['alliance'].get('id')]
-        if len(ally_data.values) < 1:
-            return
+            ally = stored.get(ally_id)
+            if ally is None:
+                ally = Alliance(ally_id=ally_id, server_id=server_id)
+                created.append(ally)
+            else:
+                updated.append(ally)
+
+            ally.name = name
+            ally.tag = tag
+            ally.founder_id = founder
+            ally.found_date = found_date
+            ally.application_open = None if not str(is_open).isdigit() else bool(int(is_open))
+            ally.logo = logo
+            ally.homepage = homepage
+
+        with transaction.atomic():
+            Alliance.objects.bulk_create(created, batch_size=PlayerScoreIngest.CHUNK_SIZE)
+            Alliance.objects.bulk_update(
+                updated,
+                ['name', 'tag', 'founder', 'found_date', 'application_open', 'logo', 'homepage'],
+                batch_size=PlayerScoreIngest.CHUNK_SIZE
+            )
+
+        return {ally.ally_id: ally for ally in Alliance.objects.filter(server_id=server_id)}
 
-        # print(f'Updating alliance for player: {player.player_id}:{player.name}')
-        try:
-            ally, created = Alliance.objects.get_or_create(ally_id=int(data['alliance']['id']))
-        except Exception as err:
-            print(f'Ally {data["alliance"].get("name")} update error: {str(err)} on player {player.name}')
-            return
+    @staticmethod
+    def update_player_alliances(written, alliance_map):
+        """
+        Links the players written on the cycle to their current alliance,
+        updating only the players whose alliance changed.
+        """
+        changed = []
+        for player, record in written:
+            ally_reference = record['alliance']
+            if not ally_reference:
+                ally = None
+            else:
+                try:
+                    ally = alliance_map[int(ally_reference['id'])]
+                except (KeyError, TypeError, ValueError):
+                    # alliance not listed on the universe data, keep current
+                    continue
 
-        # first row if exists
-        ally_data = ally_data.values[0]
-        _, name, tag, founder, found_date, is_open, logo, homepage = ally_data
+            ally_pk = ally.pk if ally else None
+            if player.alliance_id != ally_pk:
+                player.alliance_id = ally_pk
+                changed.append(player)
 
-        if player.player_id != int(founder):
-            try:
-                founder = Player.objects.get(player_id=int(founder))
-            except Player.DoesNotExist:
-                founder = None
-        else:
-            founder = player
-
-        is_open = None if not str(is_open).isdigit() else bool(int(is_open))
-
-        ally.name = name
-        ally.tag = tag
-        ally.founder = founder
-        ally.found_date = datetime.fromtimestamp(int(found_date))
-        ally.application_open = is_open
-        ally.logo = logo
-        ally.homepage = homepage
-        ally.save()
+        Player.objects.bulk_update(changed, ['alliance'], batch_size=PlayerScoreIngest.CHUNK_SIZE)
 
-        player.alliance = ally
-        player.save()
+    @staticmethod
+    def update_deleted_players(players, server_id=SERVER_ID):
+        """
+        Flags as deleted the stored players of the server missing from the
+        universe players data, and reactivates deleted players listed on it
+        again.
+        """
+        server_players = Player.objects.filter(server_id=str(server_id))
+        listed = {
+            int(player_id): status if status is None else str(status)
+            for player_id, status in players[['id', 'status']].values
+        }
+        stored = server_players.values_list('player_id', 'status')
+
+        deleted = []
+        returned = defaultdict(list)
+        for player_id, status in stored:
+            if status != 'del' and player_id not in listed:
+                deleted.append(player_id)
+            elif status == 'del' and player_id in listed:
+                returned[listed[player_id]].append(player_id)
+
+        chunk_size = PlayerScoreIngest.CHUNK_SIZE
+        with transaction.atomic():
+            for start in range(0, len(deleted), chunk_size):
+                server_players.filter(
+                    player_id__in=deleted[start:start + chunk_size]
+                ).update(status='del')
+            for status, player_ids in returned.items():
+                for start in range(0, len(player_ids), chunk_size):
+                    server_players.filter(
+                        player_id__in=player_ids[start:start + chunk_size]
+                    ).update(status=status)
 
     @staticmethod
     def update_ally_data(ally, universe):
-        try:
-            galaxy_distribution = universe.get_planets_distribution_by_galaxy(ally.tag)
-        except:
-            raise Exception(f'Failed retrieving distribution data of ally: {ally.name}')
-
-        try:
-            ally_planets = universe.get_planets_of_alliance(ally.tag)
-        except:
-            raise Exception(f'Failed retrieving planets data of ally: {ally.name}')
-
         try:
             ally_members = universe.get_players_of_alliance(ally.tag).id.astype('int').values
         except:
             raise Exception(f'Failed retrieving members of ally: {ally.name}')
 
-        # print(f'Updating alliance: {ally.name}')
-        ally.planets_distribution_coords = CompressedDict(ally_planets).bit_string
-        ally.planets_distribution_by_galaxy = CompressedDict(galaxy_distribution).bit_string
-        
-        ally.members.clear()
-        ally.members.set(Player.objects.filter(player_id__in=ally_members))
+        ally.members.set(Player.objects.filter(server_id=ally.server_id, player_id__in=ally_members))
+
+        # planet counts come from the planets of the members, counted in the database
+        distribution = dict(
+            Planet.objects.filter(player__ally_members=ally)
+            .values_list('galaxy')
+            .annotate(planets=Count('pk'))
+        )
+        for galaxy in range(1, OgameStatsCrawler.GALAXIES + 1):
+            distribution.setdefault(galaxy, 0)
+
+        galaxies = {row.galaxy: row for row in ally.galaxy_distribution.all()}
+        created, updated = [], []
+        for galaxy, planets in distribution.items():
+            row = galaxies.pop(galaxy, None)
+            if row is None:
+                created.append(AllianceGalaxy(alliance=ally, galaxy=galaxy, planets=planets))
+            elif row.planets != planets:
+                row.planets = planets
+                updated.append(row)
+        AllianceGalaxy.objects.bulk_create(created)
+        AllianceGalaxy.objects.bulk_update(updated, ['planets'])
+        AllianceGalaxy.objects.filter(pk__in=[row.pk for row in galaxies.values()]).delete()
+
+        ally.players_count = ally.members.count()
+        ally.planets_count = sum(distribution.values())
         ally.save()
-        # print(f'Updated alliance {ally.name} data!')
 
     @staticmethod
-    def crawl():
-        while True:
-            universe = OgameStatsCrawler.get_universe_data()
-            alliances = universe.alliances
-            highscores = OgameStatsCrawler.get_highscore_data()
-            for player_id, player_name, status in universe.players[['id', 'name', 'status']].values:
-                try:
-                    data = universe.get_player_data(player_name)
-                except ogame_stats.utils.xmltodict.expat.ExpatError:
-                    #  third party lib error, skip
-                    continue
+    def crawl(community=COMMUNITY, server_id=SERVER_ID, workers=PlayerDataFetcher.WORKERS):
+        universe = OgameStatsCrawler.get_universe_data(server_id, community)
+        alliances = universe.alliances
+        highscores = OgameStatsCrawler.get_highscore_data(server_id, community)
+        highscore_index = OgameStatsCrawler.get_highscore_index(highscores)
+        ingest = PlayerScoreIngest()
+        fetcher = PlayerDataFetcher(server_id, community, workers=workers)
+        players = universe.players[['id', 'name', 'status']].values
+        for (player_id, player_name, status), data, error in fetcher.fetch(players):
+            if error is not None:
+                print(f'Crawling Error: Failed fetching player {player_name} with error: {str(error)}')
+                continue
 
-                try:
-                    OgameStatsCrawler.update_player_data(
-                        data['playerData'],
-                        player_id,
-                        highscores,
-                        status,
-                        alliances
-                    )
-                except Exception as err:
-                    print(f'Crawling Error: Failed updating player {player_name} with error: {str(err)}')
-                    continue
-                    
-            
-            for alliance in Alliance.objects.all():
-                try:
-                    OgameStatsCrawler.update_ally_data(alliance, universe)
-                except Exception as err:
-                    print(f'CrawlingError: Failed updating alliance {alliance.name} with error: {str(err)}')
-                    continue
+            try:
+                ingest.add(OgameStatsCrawler.get_player_record(
+                    data['playerData'],
+                    player_id,
+                    highscore_index,
+                    status
+                ))
+            except Exception as err:
+                print(f'Crawling Error: Failed updating player {player_name} with error: {str(err)}')
+                continue
+        ingest.flush()
+        ScoreRollups.add_records(ingest.written)
+        archive = ScoreArchive()
+        if archive.enabled:
+            try:
+                archive.append_records(ingest.written)
+            except Exception as err:
+                print(f'Crawling Error: Failed archiving scores with error: {str(err)}')
 
-            # Update deleted players status
-            for player in Player.objects.all():
-                if player.status == 'del':
-                    continue
-                try:
-                    universe.get_player_data(player.name)
-                except IndexError:
-                    # Player was deleted
-                    player.status = 'del'
-                    player.save()
-                except ogame_stats.utils.xmltodict.expat.ExpatError:
-                    # third part lib faulure
-                    continue
+        alliance_map = OgameStatsCrawler.update_alliances(alliances, server_id)
+        OgameStatsCrawler.update_player_alliances(ingest.written, alliance_map)
 
-            sleep(3600*2)
+        for alliance in alliance_map.values():
+            try:
+                OgameStatsCrawler.update_ally_data(alliance, universe)
+            except Exception as err:
+                print(f'CrawlingError: Failed updating alliance {alliance.name} with error: {str(err)}')
+                continue
+
+        OgameStatsCrawler.update_deleted_players(universe.players, server_id)
+
+    @staticmethod
+    def prune_scores():
+        """
+        Applies the score retention of all universes, once per crawl cycle.
+        """
+        try:
+            ScoreRollups.prune(settings.SCORE_RETENTION_DAYS, settings.HOURLY_SCORE_RETENTION_DAYS)
+        except Exception as err:
+            print(f'Crawling Error: Failed pruning scores with error: {str(err)}')
+
+    @staticmethod
+    def crawl_universes(universes, workers=PlayerDataFetcher.WORKERS, processes=None):
+        """
+        Crawls each (community, server id) universe of `universes` in its own
+        worker process, running up to `processes` universes at once.
+        """
+        if len(universes) == 1:
+            community, server_id = universes[0]
+            OgameStatsCrawler.crawl(community, server_id, workers)
+            OgameStatsCrawler.prune_scores()
+            return
+
+        # sqlite locks the whole database on writes, universes are crawled in turn
+        if connections['default'].vendor == 'sqlite':
+            processes = 1
+
+        # forked workers must not share the parent database connections
+        connections.close_all()
+        failed = []
+        with ProcessPoolExecutor(max_workers=processes or len(universes), initializer=django.setup) as executor:
+            futures = {
+                executor.submit(OgameStatsCrawler.crawl, community, server_id, workers): (community, server_id)
+                for community, server_id in universes
+            }
+            for future in as_completed(futures):
+                community, server_id = futures[future]
+                error = future.exception()
+                if error is not None:
+                    print(f'Crawling Error: Failed crawling universe {community}-{server_id} with error: {str(error)}')
+                    failed.append(f'{community}-{server_id}')
+
+        # only rolled up scores are pruned, whether or not every universe was crawled
+        OgameStatsCrawler.prune_scores()
+        if failed:
+            raise Exception(f'Failed crawling universes {", ".join(failed)}')
 
 
 class OgameForumCrawler:
@@ -235,52 +368,36 @@ class OgameForumCrawler:
     """
     # FORUM_URL = 'https://forum.pt.ogame.gameforge.com/forum/board/26-relat%C3%B3rios-de-combate/?labelIDs%5B2%5D=75'
     FORUM_URL = 'https://forum.pt.ogame.gameforge.com/forum/board/26-relat%C3%B3rios-de-combate/?pageNo=1&labelIDs%5B2%5D=75'
+    # community of the universes the forum reports are from
+    COMMUNITY = 'br'
 
     @staticmethod
-    def get_thread_list(url):
-        response = requests.get(url).content
-        main_threads_html = BeautifulSoup(response, 'html.parser')
-        combat_reports = main_threads_html.findAll(class_='messageGroupLink')
-        return [{'title': i.text, 'url': i.attrs.get('href')} for i in combat_reports]
-
-    @staticmethod
-    def is_defense(text):
-        return bool(ForumReportText.DEFENSES_REGEX.search(text))
-
-    @staticmethod
-    def is_ship(text):
-        return bool(ForumReportText.SHIPS_REGEX.search(text))
+    def get_server_ids(community=COMMUNITY):
+        """
+        Returns the server ids of the crawled universes of `community`, the
+        players report participants are matched against.
+        """
+        return [str(server_id) for universe_community, server_id in settings.OGAME_UNIVERSES
+                if universe_community == community]
 
     @staticmethod
-    def is_noise(text):
-        return bool(ForumReportText.NOISE_REGEX.search(text))
+    def get_thread_list(page):
+        main_threads_html = BeautifulSoup(page, 'html.parser')
+        combat_reports = main_threads_html.findAll(class_='messageGroupLink')
+        return [{'title': i.text, 'url': i.attrs.get('href')} for i in combat_reports]
 
     @staticmethod
     def get_count(text):
         tokens = text.split()
         for token in tokens:
-            match = re.search('[0-9]+.+[0-9]', token)
-            if bool(match):
+            if ForumReportText.COUNT_REGEX.search(token):
                 return int(token.replace('.', ''))
 
         # if no floating point number was found maybe its preented as integer
         for token in tokens:
-            match = re.search('[0-9]', token)
-            if bool(match):
+            if ForumReportText.DIGIT_REGEX.search(token):
                 return int(token)
 
-    @staticmethod
-    def get_ship_from_text(text):
-        eye = ForumReportText.SHIPS_REGEX.search(text)
-        start, end = eye.start(), eye.end()
-        return text[start:end]
-
-    @staticmethod
-    def get_defense_from_text(text):
-        eye = ForumReportText.DEFENSES_REGEX.search(text)
-        start, end = eye.start(), eye.end()
-        return text[start:end]
-
     @staticmethod
     def get_report_combat_data(message_text):
         combat_data = {
@@ -297,111 +414,278 @@ class OgameForumCrawler:
             if not text_line:
                 continue
 
-            if OgameForumCrawler.is_noise(text_line):
+            line_kind, token = ForumReportText.classify(text_line)
+
+            if line_kind == 'noise':
                 continue
 
-            elif '--:--:--' in text_line:
-                combat_data['date'] = str(parser.parse(text_line, fuzzy=True).date())
+            elif line_kind == 'date':
+                combat_data['date'] = ForumReportText.get_date(text_line)
 
-            elif 'Atacante' in text_line:
+            elif line_kind == 'attacker':
                 attacker = text_line.split('Atacante')[-1].strip()
                 cursor = ('attackers', attacker)
                 if attacker not in combat_data['attackers']:
                     combat_data['attackers'][attacker] = {'ships': {}}
 
-            elif OgameForumCrawler.is_ship(text_line):
+            elif line_kind == 'ship':
                 try:
                     subject, name = cursor
                 except TypeError:
                     # maybe some text mentioned a ship, ignore and continue
                     continue
 
-                ship = OgameForumCrawler.get_ship_from_text(text_line)
                 count = OgameForumCrawler.get_count(text_line)
-                if ship not in combat_data[subject][name]['ships']:
-                    combat_data[subject][name]['ships'][ship] = count
+                if token not in combat_data[subject][name]['ships']:
+                    combat_data[subject][name]['ships'][token] = count
 
-            elif 'Defensor' in text_line:
+            elif line_kind == 'defender':
                 defender = text_line.split('Defensor')[-1].strip()
                 cursor = ('defenders', defender)
                 if defender not in combat_data['defenders']:
                     combat_data['defenders'][defender] = {'ships': {}, 'defenses': {}}
 
-            elif OgameForumCrawler.is_defense(text_line):
+            elif line_kind == 'defense':
                 try:
                     subject, name = cursor
                 except TypeError:
                     # maybe some text mentioned a defense, ignore and continue
                     continue
 
-                defense = OgameForumCrawler.get_defense_from_text(text_line)
                 count = OgameForumCrawler.get_count(text_line)
-                if defense not in combat_data[subject][name]['defenses']:
-                    combat_data[subject][name]['defenses'][defense] = count
-                    
-            elif 'venceu a batalha' in text_line:
+                if token not in combat_data[subject][name]['defenses']:
+                    combat_data[subject][name]['defenses'][token] = count
+
+            elif line_kind == 'victory':
                 if 'atacante' in text_line.lower():
                     combat_data['winner'] = 'attackers'
                 elif 'defensor' in text_line.lower():
                     combat_data['winner'] = 'defenders'
                 return combat_data
 
-            elif 'batalha terminou empatada' in text_line:
+            elif line_kind == 'draw':
                 combat_data['winner'] = 'draw'
                 return combat_data
 
         return combat_data
 
     @staticmethod
-    def crawl():
+    def get_new_threads(page, known_urls):
+        threads = []
+        for thread in OgameForumCrawler.get_thread_list(page):
+            url = thread.get('url')
+            title = thread.get('title')
+            if not url or not title:
+                print(f'Skipping save of thread {thread}')
+                continue
+            if url not in known_urls:
+                threads.append(thread)
+        return threads
+
+    @staticmethod
+    def get_participant_name(participant):
+        # slice player name from [ally tag]
+        return participant.split('[')[0].strip()
+
+    @staticmethod
+    def get_fleet_rows(report_pk, side, participants, players, model=CombatReportFleet):
+        """
+        Returns the CombatReportFleet rows of the ships of a report side,
+        from its `participants` data as parsed by get_report_combat_data.
+        `players` maps participant names to the primary keys of the players
+        named so, rows of names matching several players have no player.
+        """
+        ship2int, _ = fleet_mapping()
+        rows = []
+        for participant, data in participants.items():
+            player_pks = players.get(OgameForumCrawler.get_participant_name(participant), ())
+            player_pk = next(iter(player_pks)) if len(player_pks) == 1 else None
+
+            units = Counter()
+            for ship, count in data.get('ships', {}).items():
+                if ship in ship2int and count:
+                    units[ship2int[ship]] += count
+            rows += [
+                model(report_id=report_pk, side=side, player_id=player_pk, unit=unit, count=count)
+                for unit, count in units.items()
+            ]
+        return rows
+
+    @staticmethod
+    def backfill_report_fleet(reports, name_index, batch_size=500, model=CombatReportFleet):
+        """
+        Writes the fleet rows of the `reports` queryset of combat reports
+        which have none yet, from their stored participant data.
+        Returns the number of reports read and of rows written.
+        """
+        reports = reports.filter(fleet__isnull=True).order_by('pk').only('pk', 'attackers', 'defenders')
+        report_count = row_count = 0
+        last_pk = 0
         while True:
-            forum_url = OgameForumCrawler.FORUM_URL
-            for page_num in range(1, 26):
-                threads = OgameForumCrawler.get_thread_list(forum_url)
-                for thread in threads:
-                    url = thread.get('url')
-                    title = thread.get('title')
-                    if not url or not title:
-                        print(f'Skipping save of thread {thread}')
+            batch = list(reports.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return report_count, row_count
+            last_pk = batch[-1].pk
+
+            fleet_rows = []
+            for report in batch:
+                for side, bit_string in (
+                    (CombatReportFleet.ATTACKERS, report.attackers),
+                    (CombatReportFleet.DEFENDERS, report.defenders),
+                ):
+                    if not bit_string:
                         continue
-
-                    combat_report, created = CombatReport.objects.get_or_create(
-                        title=title,
-                        url=url
-                    )
-                    if not created:
+                    try:
+                        # reports crawled before the codec version header included
+                        participants = CompressedDict.decode_legacy(bit_string)
+                    except Exception as err:
+                        print(f'Failed decoding CombatReport {report.pk} {side} with error: {str(err)}')
                         continue
+                    players = name_index.lookup(
+                        [OgameForumCrawler.get_participant_name(name) for name in participants]
+                    )
+                    fleet_rows += OgameForumCrawler.get_fleet_rows(report.pk, side, participants, players, model)
 
-                    thread_html = BeautifulSoup(requests.get(url).content, 'html.parser')
-                    message_text = thread_html.find(class_='messageText').findAll('p')
-                    report_data = OgameForumCrawler.get_report_combat_data(message_text)
+            with transaction.atomic():
+                model.objects.bulk_create(fleet_rows)
+            report_count += len(batch)
+            row_count += len(fleet_rows)
 
-                    attackers = []
-                    defenders = []
-                    # slice player name from [ally tag]
-                    for attacker in list(report_data['attackers'].keys()):
-                        attackers.append(attacker.split('[')[0].strip())
+    @staticmethod
+    def parse_report(thread_page):
+        thread_html = BeautifulSoup(thread_page, 'html.parser')
+        message_text = thread_html.find(class_='messageText').findAll('p')
+        return OgameForumCrawler.get_report_combat_data(message_text)
+
+    @staticmethod
+    def save_reports(reports, name_index):
+        """
+        Saves the (title, url, report_data) reports of a thread list page,
+        links them to their participants and writes their fleet rows, with a
+        few bulk statements.
+        Reports which failed parsing have report_data None and are saved
+        blank, so they are not fetched again.
+        """
+        combat_reports = []
+        participants = {}
+        for title, url, report_data in reports:
+            combat_report = CombatReport(title=title, url=url, url_hash=CombatReport.get_url_hash(url))
+            combat_reports.append(combat_report)
+            if report_data is None:
+                continue
 
-                    for defender in list(report_data['defenders'].keys()):
-                        defenders.append(defender.split('[')[0].strip())
+            try:
+                combat_report.date = parser.parse(report_data['date'])
+                combat_report.winner = report_data['winner']
+                combat_report.attackers = CompressedDict(report_data['attackers']).bit_string
+                combat_report.defenders = CompressedDict(report_data['defenders']).bit_string
+            except Exception as err:
+                print(f'Failed saving report {url} with error {str(err)}')
+                combat_report.date = combat_report.winner = None
+                combat_report.attackers = combat_report.defenders = None
+                continue
 
-                    # try to retrieve players record from database
-                    attacker_players = Player.objects.filter(name__in=attackers)
-                    defender_players = Player.objects.filter(name__in=defenders)
+            participants[url] = (report_data['attackers'], report_data['defenders'])
+
+        name_index.refresh()
+        attacker_link = CombatReport.attacker_players.through
+        defender_link = CombatReport.defender_players.through
+        with transaction.atomic():
+            # urls are unique, a report saved meanwhile is left as it is
+            CombatReport.objects.bulk_create(combat_reports, ignore_conflicts=True)
+            # bulk_create does not set primary keys on every backend
+            report_pks = dict(CombatReport.objects.filter(
+                url_hash__in=[CombatReport.get_url_hash(url) for url in participants]
+            ).values_list('url', 'pk'))
+            with_fleet = set(CombatReportFleet.objects.filter(
+                report__in=list(report_pks.values())
+            ).values_list('report_id', flat=True).distinct())
+
+            # names of the whole page are looked up at once
+            players = name_index.lookup({
+                OgameForumCrawler.get_participant_name(name)
+                for attackers, defenders in participants.values()
+                for name in list(attackers) + list(defenders)
+            })
+
+            attacker_links, defender_links, fleet_rows = [], [], []
+            for url, (attackers, defenders) in participants.items():
+                attacker_players = {
+                    name: players[name]
+                    for name in map(OgameForumCrawler.get_participant_name, attackers)
+                }
+                defender_players = {
+                    name: players[name]
+                    for name in map(OgameForumCrawler.get_participant_name, defenders)
+                }
+                attacker_links += [
+                    attacker_link(combatreport_id=report_pks[url], player_id=pk)
+                    for pks in attacker_players.values() for pk in pks
+                ]
+                defender_links += [
+                    defender_link(combatreport_id=report_pks[url], player_id=pk)
+                    for pks in defender_players.values() for pk in pks
+                ]
+                if report_pks[url] not in with_fleet:
+                    fleet_rows += OgameForumCrawler.get_fleet_rows(
+                        report_pks[url], CombatReportFleet.ATTACKERS, attackers, attacker_players
+                    )
+                    fleet_rows += OgameForumCrawler.get_fleet_rows(
+                        report_pks[url], CombatReportFleet.DEFENDERS, defenders, defender_players
+                    )
+            attacker_link.objects.bulk_create(attacker_links, ignore_conflicts=True)
+            defender_link.objects.bulk_create(defender_links, ignore_conflicts=True)
+            CombatReportFleet.objects.bulk_create(fleet_rows)
 
-                    try:
-                        combat_report.date = parser.parse(report_data['date'])
-                        combat_report.winner = report_data['winner']
-                        combat_report.attackers = CompressedDict(report_data['attackers']).bit_string
-                        combat_report.defenders = CompressedDict(report_data['defenders']).bit_string
-                        combat_report.attacker_players.set(attacker_players)
-                        combat_report.defender_players.set(defender_players)
-                        combat_report.save()
-                    except Exception as err:
-                        print(f'Failed saving report {thread.get("url")} with error {str(err)}')
-                        continue
-                forum_url = forum_url.replace(f'pageNo={page_num}', f'pageNo={page_num+1}')
-            sleep(3600*24)
+    @staticmethod
+    def crawl(fetcher=None, community=COMMUNITY):
+        fetcher = fetcher or ForumFetcher()
+        name_index = PlayerNameIndex(OgameForumCrawler.get_server_ids(community))
+        known_urls = set(CombatReport.objects.values_list('url', flat=True))
+        forum_url = OgameForumCrawler.FORUM_URL
+        for page_num in range(1, 26):
+            try:
+                page = fetcher.get(forum_url)
+            except requests.RequestException as err:
+                print(f'Failed fetching thread list {forum_url} with error {str(err)}')
+                break
+
+            if page is None:
+                # thread list did not change since the last crawl
+                break
+
+            threads = OgameForumCrawler.get_new_threads(page, known_urls)
+            if not threads:
+                # newest threads come first, the remaining pages are known
+                fetcher.commit(forum_url)
+                break
+
+            titles = {thread['url']: thread['title'] for thread in threads}
+            reports = []
+            complete = True
+            for url, thread_page, error in fetcher.get_many(list(titles)):
+                if error is not None:
+                    print(f'Failed fetching report {url} with error {str(error)}')
+                    complete = False
+                    continue
+                try:
+                    report_data = OgameForumCrawler.parse_report(thread_page)
+                except Exception as err:
+                    print(f'Failed parsing report {url} with error {str(err)}')
+                    report_data = None
+                reports.append((titles[url], url, report_data))
+
+            try:
+                OgameForumCrawler.save_reports(reports, name_index)
+            except Exception as err:
+                print(f'Failed saving reports of page {page_num} with error {str(err)}')
+                break
+            known_urls.update(url for _, url, _ in reports)
+            if complete:
+                # a failed report keeps the page downloaded on the next crawl
+                fetcher.commit(forum_url)
+
+            forum_url = forum_url.replace(f'pageNo={page_num}', f'pageNo={page_num+1}')
 
 
 class ForumReportText:
@@ -464,3 +748,39 @@ class ForumReportText:
     SHIPS_REGEX = re.compile("|".join(SHIPS))
     DEFENSES_REGEX = re.compile("|".join(DEFENSES))
     NOISE_REGEX = re.compile("|".join(NOISES))
+
+    # Report line kinds, by precedence when a line mentions several of them
+    LINE_KINDS = (
+        ('noise', NOISE_REGEX),
+        ('date', re.compile('--:--:--')),
+        ('attacker', re.compile('Atacante')),
+        ('ship', SHIPS_REGEX),
+        ('defender', re.compile('Defensor')),
+        ('defense', DEFENSES_REGEX),
+        ('victory', re.compile('venceu a batalha')),
+        ('draw', re.compile('batalha terminou empatada')),
+    )
+    COUNT_REGEX = re.compile('[0-9]+.+[0-9]')
+    DIGIT_REGEX = re.compile('[0-9]')
+
+    @staticmethod
+    def classify(text):
+        """
+        Returns the kind of a report line and its first token of that kind,
+        or (None, None) for lines with no known token.
+        """
+        for line_kind, regex in ForumReportText.LINE_KINDS:
+            match = regex.search(text)
+            if match:
+                return line_kind, match.group()
+        return None, None
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def get_date(text):
+        """
+        Date of a report date line. The reports of a day share the same date
+        line, as the battle time is masked, so the fuzzy parse runs once per
+        day instead of once per report.
+        """
+        return str(parser.parse(text, fuzzy=True).date())
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from functools import partial
+from hashlib import sha256
+from threading import Lock
+from django.conf import settings
+from django.core.cache import caches
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.backend.base import GraphQLDocument
+from graphql.execution import execute, ExecutionResult
+from graphql.language.parser import parse
+from graphql.validation import validate
+from ogame.models import PersistedQuery
+
+
+def query_hash(query):
+    return sha256(query.encode()).hexdigest()
+
+
+def execute_invalid(errors, *args, **kwargs):
+    return ExecutionResult(errors=errors, invalid=True)
+
+
+class DocumentBackend(GraphQLCoreBackend):
+    """
+    GraphQL backend keeping the documents it parsed and validated in a
+    least recently used map of `size` entries, by hash of the query text.
+
+    Valid documents are executed without being validated again, invalid
+    documents are not kept.
+    """
+    def __init__(self, size=None, executor=None):
+        super().__init__(executor)
+        self.size = size or settings.GRAPHQL_DOCUMENT_CACHE_SIZE
+        self.documents = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            document = self.documents.get(key)
+            if document is not None:
+                self.documents.move_to_end(key)
+            return document
+
+    def put(self, key, document):
+        with self.lock:
+            self.documents[key] = document
+            self.documents.move_to_end(key)
+            while len(self.documents) > self.size:
+                self.documents.popitem(last=False)
+
+    def document_from_string(self, schema, document_string):
+        key = query_hash(document_string)
+        document = self.get(key)
+        if document is not None and document.schema is schema:
+            return document
+
+        document_ast = parse(document_string)
+        errors = validate(schema, document_ast)
+        if errors:
+            run = partial(execute_invalid, errors)
+        else:
+            run = partial(execute, schema, document_ast, **self.execute_params)
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=run
+        )
+        if not errors:
+            self.put(key, document)
+        return document
+
+
+class PersistedQueries:
+    """
+    Queries requested by the sha256 hash of their text, following the
+    automatic persisted queries protocol of the Apollo clients.
+
+    Queries are looked up in the document backend, then in the PersistedQuery
+    table and then in the `alias` cache, where the queries sent along with
+    their hash are registered. With `allow_list` only the queries of the
+    PersistedQuery table are executed, whether sent by hash or as text.
+    """
+    CACHE_PREFIX = 'persisted-query'
+
+    def __init__(self, backend, alias='graphql', allow_list=None):
+        self.backend = backend
+        self.alias = alias
+        self.allow_list = settings.GRAPHQL_PERSISTED_QUERIES_ONLY if allow_list is None else allow_list
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def lookup(self, key):
+        """
+        Returns the query text of the `key` hash, None when it is unknown.
+        """
+        document = self.backend.get(key)
+        if document is not None:
+            return document.document_string
+        query = PersistedQuery.objects.filter(sha256=key).values_list('query', flat=True).first()
+        if query is None and not self.allow_list:
+            query = self.cache.get(f'{self.CACHE_PREFIX}:{key}')
+        return query
+
+    def register(self, key, query):
+        if self.allow_list or self.backend.get(key) is not None:
+            return
+        self.cache.set(f'{self.CACHE_PREFIX}:{key}', query, None)
+
+    def is_allowed(self, query):
+        key = query_hash(query)
+        return self.backend.get(key) is not None or PersistedQuery.objects.filter(sha256=key).exists()
+
+
+document_backend = DocumentBackend()
+persisted_queries = PersistedQueries(document_backend)
@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from itertools import islice
+from time import sleep
+from urllib.parse import urlencode
+import requests
+import xmltodict
+from requests.adapters import HTTPAdapter
+
+
+class PlayerDataFetcher:
+    """
+    Fetches playerData documents from the Ogame API with a bounded pool of
+    worker threads sharing one pooled HTTP session.
+
+    Requests are bounded by `timeout` seconds and retried up to `retries`
+    times with exponential backoff on connection errors, timeouts and
+    server errors. Client errors and malformed documents are not retried.
+    """
+    API_URL = 'https://s{server_id}-{community}.ogame.gameforge.com/api'
+    WORKERS = 8
+    TIMEOUT = 10
+    RETRIES = 3
+    BACKOFF = 1.0
+
+    def __init__(self, server_id, community, workers=WORKERS, timeout=TIMEOUT,
+                 retries=RETRIES, backoff=BACKOFF, api_url=None):
+        self.api_url = api_url or self.API_URL.format(server_id=server_id, community=community)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_player_data(self, player_id):
+        url = f'{self.api_url}/playerData.xml?{urlencode({"id": player_id})}'
+        for attempt in range(self.retries + 1):
+            if attempt:
+                sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                response.raise_for_status()
+            except requests.HTTPError as err:
+                if err.response.status_code < 500:
+                    raise
+                error = err
+                continue
+            except (requests.ConnectionError, requests.Timeout) as err:
+                error = err
+                continue
+
+            return xmltodict.parse(
+                response.content.decode('utf-8'),
+                attr_prefix='',
+                dict_constructor=dict
+            )
+
+        raise error
+
+    def fetch(self, players):
+        """
+        Fetches the data of each (player_id, ...) row of `players`, keeping at
+        most `workers` requests in flight.
+        Yields (row, data, error) tuples in completion order, where error is
+        the exception raised by the last attempt, if any.
+        """
+        players = iter(players)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {
+                executor.submit(self.get_player_data, row[0]): row
+                for row in islice(players, self.workers)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    row = pending.pop(future)
+                    for next_row in islice(players, 1):
+                        pending[executor.submit(self.get_player_data, next_row[0])] = next_row
+
+                    error = future.exception()
+                    yield row, None if error else future.result(), error
+
+
+class ForumFetcher:
+    """
+    Fetches Ogame forum pages with one pooled HTTP session.
+
+    Pages fetched before are requested conditionally with the ETag and
+    Last-Modified validators of the previous answer, so unchanged pages
+    come back as an empty 304 answer. Validators are only used once the
+    page is committed, after everything read from it was stored.
+    """
+    WORKERS = 4
+    TIMEOUT = 20
+
+    def __init__(self, workers=WORKERS, timeout=TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.validators = {}
+        self.pending = {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, conditional=True):
+        """
+        Returns the page content, or None when the page did not change since
+        it was last committed. Pages fetched with `conditional` unset are
+        always downloaded.
+        """
+        headers = {}
+        etag, last_modified = self.validators.get(url, (None, None)) if conditional else (None, None)
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        if conditional:
+            self.pending[url] = (
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified')
+            )
+        return response.content
+
+    def commit(self, url):
+        """
+        Keeps the validators of the last download of `url` for the next
+        conditional requests.
+        """
+        validators = self.pending.pop(url, None)
+        if validators is not None:
+            self.validators[url] = validators
+
+    def get_many(self, urls):
+        """
+        Downloads `urls` with up to `workers` parallel requests.
+        Yields (url, content, error) tuples in completion order.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.get, url, False): url for url in urls}
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], None if error else future.result(), error
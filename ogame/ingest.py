@@ -0,0 +1,254 @@
+import hashlib
+import json
+from collections import defaultdict
+from django.db import transaction
+from ogame.models import Player, Planet, Score
+
+
+class PlayerScoreIngest:
+    """
+    Collects the player and score records of a crawl cycle and writes them
+    with bulk statements, one transaction per chunk of records.
+
+    A record is a dict built by `OgameStatsCrawler.get_player_record`. Players
+    are only written when their fingerprint changed, and then only the
+    changed fields; their planets are diffed against the Planet rows. When
+    a chunk fails, its records are written again one by one, so a bad
+    record does not discard the rest of the chunk.
+    """
+    CHUNK_SIZE = 500
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.records = []
+        # (player, record) pairs written on this cycle
+        self.written = []
+
+    def add(self, record):
+        self.records.append(record)
+        if len(self.records) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        records, self.records = self.records, []
+        for start in range(0, len(records), self.chunk_size):
+            chunk = records[start:start + self.chunk_size]
+            try:
+                with transaction.atomic():
+                    written = self._write(chunk)
+            except Exception as err:
+                print(f'IngestError: Failed writing chunk of {len(chunk)} players with error: {str(err)}')
+                written = []
+                for record in chunk:
+                    try:
+                        with transaction.atomic():
+                            written += self._write([record])
+                    except Exception as err:
+                        print(f'Crawling Error: Failed updating player {record["name"]} with error: {str(err)}')
+            self.written += written
+
+    @staticmethod
+    def fingerprint(values, ally_reference):
+        """
+        Content hash of the player fields written by the crawler, used to
+        skip the players that did not change since the last cycle.
+        """
+        ally_id = ally_reference.get('id') if ally_reference else None
+        digest = hashlib.sha1()
+        digest.update(json.dumps([values['name'], values['status'], values['rank'], ally_id]).encode('utf-8'))
+        digest.update(values['planets'])
+        return digest.hexdigest()
+
+    def _write(self, records):
+        players = {}
+        for player in Player.objects.filter(player_id__in=[r['player_id'] for r in records]):
+            players.setdefault((player.player_id, player.server_id), player)
+
+        created = []
+        updated = defaultdict(list)
+        planets_changed = []
+        for record in records:
+            player = players.get((record['player_id'], record['server_id']))
+            values = {
+                'name': record['name'],
+                'status': record['status'],
+                'planets': record['planets'],
+                'rank': record['rank'],
+            }
+            if player is None:
+                player = Player(player_id=record['player_id'], server_id=record['server_id'])
+                # a player listed twice in the chunk is created once
+                players[(record['player_id'], record['server_id'])] = player
+                created.append(player)
+            elif values['rank'] is None:
+                values['rank'] = player.rank
+
+            values['fingerprint'] = PlayerScoreIngest.fingerprint(values, record['alliance'])
+            if player.pk is not None and player.fingerprint == values['fingerprint']:
+                continue
+
+            changed = []
+            for field, value in values.items():
+                current = getattr(player, field)
+                if field == 'planets' and current is not None:
+                    current = bytes(current)
+                if current != value:
+                    setattr(player, field, value)
+                    changed.append(field)
+            if 'planets' in changed and record.get('planet_rows') is not None:
+                planets_changed.append(record)
+            if player.pk is not None:
+                updated[tuple(changed)].append(player)
+
+        if created:
+            # bulk_create does not set primary keys on every backend
+            Player.objects.bulk_create(created, batch_size=self.chunk_size)
+            for player in Player.objects.filter(player_id__in=[p.player_id for p in created]):
+                players[(player.player_id, player.server_id)] = player
+        for fields, changed_players in updated.items():
+            Player.objects.bulk_update(changed_players, fields, batch_size=self.chunk_size)
+        self._write_planets({
+            players[(record['player_id'], record['server_id'])].pk: record['planet_rows']
+            for record in planets_changed
+        })
+
+        pairs = [(players[(r['player_id'], r['server_id'])], r) for r in records]
+        existing_scores = set(Score.objects.filter(
+            player__in=[player for player, _ in pairs],
+            timestamp__in={record['timestamp'] for _, record in pairs}
+        ).values_list('player_id', 'timestamp'))
+
+        scores = []
+        for player, record in pairs:
+            if record['scores'] is None or (player.pk, record['timestamp']) in existing_scores:
+                continue
+            scores.append(Score(
+                player=player,
+                timestamp=record['timestamp'],
+                datetime=record['datetime'],
+                **record['scores']
+            ))
+        Score.objects.bulk_create(scores, batch_size=self.chunk_size)
+        self._write_latest_scores(pairs)
+
+        return pairs
+
+    def _write_latest_scores(self, pairs):
+        """
+        Points the players of the (player, record) `pairs` to their newest
+        stored score. Records older than the current latest score, as
+        written by backfills, leave it unchanged.
+        """
+        newest = {}
+        for player, record in pairs:
+            if record['scores'] is None:
+                continue
+            if player.pk not in newest or record['timestamp'] > newest[player.pk][1]['timestamp']:
+                newest[player.pk] = (player, record)
+        if not newest:
+            return
+
+        # bulk_create does not set primary keys on every backend
+        score_pks = {
+            (player_id, timestamp): pk
+            for player_id, timestamp, pk in Score.objects.filter(
+                player__in=list(newest),
+                timestamp__in={record['timestamp'] for _, record in newest.values()}
+            ).values_list('player_id', 'timestamp', 'pk')
+        }
+        latest_timestamps = dict(Score.objects.filter(
+            pk__in=[player.latest_score_id for player, _ in newest.values() if player.latest_score_id]
+        ).values_list('pk', 'timestamp'))
+
+        changed = []
+        for player, record in newest.values():
+            score_pk = score_pks.get((player.pk, record['timestamp']))
+            if score_pk is None or score_pk == player.latest_score_id:
+                continue
+            if latest_timestamps.get(player.latest_score_id, record['timestamp']) > record['timestamp']:
+                continue
+            player.latest_score_id = score_pk
+            changed.append(player)
+        Player.objects.bulk_update(changed, ['latest_score'], batch_size=self.chunk_size)
+
+    def _write_planets(self, planet_rows):
+        """
+        Brings the Planet rows of the players in `planet_rows`, a map of
+        player pks to `OgameStatsCrawler.get_planet_rows` results, in line
+        with them, touching only the planets that changed.
+        """
+        if not planet_rows:
+            return
+        fields = ('name', 'galaxy', 'system', 'position', 'moon')
+        existing = defaultdict(dict)
+        for planet in Planet.objects.filter(player__in=list(planet_rows)):
+            existing[planet.player_id][planet.planet_id] = planet
+
+        created, updated, deleted = [], [], []
+        for player_pk, rows in planet_rows.items():
+            current = existing[player_pk]
+            for planet_id, row in rows.items():
+                planet = current.pop(planet_id, None)
+                if planet is None:
+                    created.append(Planet(player_id=player_pk, planet_id=planet_id, **dict(zip(fields, row))))
+                elif tuple(getattr(planet, field) for field in fields) != row:
+                    for field, value in zip(fields, row):
+                        setattr(planet, field, value)
+                    updated.append(planet)
+            deleted += [planet.pk for planet in current.values()]
+
+        Planet.objects.bulk_create(created, batch_size=self.chunk_size)
+        Planet.objects.bulk_update(updated, fields, batch_size=self.chunk_size)
+        Planet.objects.filter(pk__in=deleted).delete()
+
+
+class PlayerNameIndex:
+    """
+    In memory index of player names to player primary keys, of the players
+    of `server_ids` or of every server when unset. `players` replaces the
+    Player queryset, for the historical models of the migrations.
+
+    Loaded once per crawl run and refreshed incrementally: `refresh` picks
+    the players created since the last load, and names missing from the
+    index are looked up in one query per `resolve` call, which also catches
+    renamed players.
+    """
+    def __init__(self, server_ids=None, players=None):
+        self.queryset = Player.objects.all() if players is None else players
+        if server_ids is not None:
+            self.queryset = self.queryset.filter(server_id__in=[str(server_id) for server_id in server_ids])
+        self.players = defaultdict(set)
+        self.names = {}
+        self.last_pk = 0
+        self.refresh()
+
+    def _add(self, pk, name):
+        previous = self.names.get(pk)
+        if previous is not None and previous != name:
+            self.players[previous].discard(pk)
+        self.names[pk] = name
+        self.players[name].add(pk)
+
+    def refresh(self):
+        for pk, name in self.queryset.filter(pk__gt=self.last_pk).values_list('pk', 'name'):
+            self._add(pk, name)
+            self.last_pk = max(self.last_pk, pk)
+
+    def lookup(self, names):
+        """
+        Returns a map of each of `names` to the primary keys of the players
+        named so.
+        """
+        missing = {name for name in names if not self.players.get(name)}
+        if missing:
+            for pk, name in self.queryset.filter(name__in=missing).values_list('pk', 'name'):
+                self._add(pk, name)
+                self.last_pk = max(self.last_pk, pk)
+
+        return {name: set(self.players.get(name, ())) for name in names}
+
+    def resolve(self, names):
+        """
+        Returns the primary keys of the players named as any of `names`.
+        """
+        return {pk for pks in self.lookup(names).values() for pk in pks}
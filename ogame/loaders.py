@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from django.db.models import Count, Sum
+from promise import Promise
+from promise.dataloader import DataLoader
+from ogame.models import Player, Planet, Score, Alliance, CombatReport
+
+
+class RelationLoader(DataLoader, ABC):
+    """
+    Batches the lookups of a relation made while resolving a request.
+
+    `fetch` maps every key of a batch to its value in a constant number of
+    queries, keys missing from the map resolve to `default`.
+    """
+    default = None
+
+    def __new__(cls, *args, **kwargs):
+        # threading.local, the base of DataLoader, skips the abstract method check of ABC
+        if cls.__abstractmethods__:
+            raise TypeError(
+                f'Can\'t instantiate abstract class {cls.__name__} with abstract methods '
+                f'{", ".join(sorted(cls.__abstractmethods__))}'
+            )
+        return super().__new__(cls, *args, **kwargs)
+
+    @abstractmethod
+    def fetch(self, keys):
+        pass
+
+    def batch_load_fn(self, keys):
+        values = self.fetch(keys)
+        return Promise.resolve([values.get(key, self.get_default()) for key in keys])
+
+    def get_default(self):
+        return self.default
+
+
+class InstanceLoader(RelationLoader):
+    """
+    Loads the instances of a queryset by primary key.
+    """
+    def __init__(self, queryset):
+        super().__init__()
+        self.queryset = queryset
+
+    def fetch(self, keys):
+        return self.queryset.in_bulk(keys)
+
+
+class ListLoader(RelationLoader):
+    def get_default(self):
+        return []
+
+
+class AllianceMembersLoader(ListLoader):
+    def fetch(self, alliance_pks):
+        members = defaultdict(list)
+        for link in Alliance.members.through.objects.filter(
+            alliance_id__in=alliance_pks
+        ).select_related('player__latest_score').defer('player__planets').order_by('pk'):
+            members[link.alliance_id].append(link.player)
+        return members
+
+
+class AllianceShipsLoader(RelationLoader):
+    default = 0
+
+    def fetch(self, alliance_pks):
+        return dict(
+            Alliance.members.through.objects.filter(alliance_id__in=alliance_pks)
+            .values_list('alliance_id').annotate(ships=Sum('player__latest_score__military_ships')).order_by()
+        )
+
+
+class ReportPlayersLoader(ListLoader):
+    """
+    Loads the attacker or defender players of combat reports.
+    """
+    def __init__(self, through):
+        super().__init__()
+        self.through = through
+
+    def fetch(self, report_pks):
+        players = defaultdict(list)
+        for link in self.through.objects.filter(
+            combatreport_id__in=report_pks
+        ).select_related('player__latest_score').defer('player__planets').order_by('pk'):
+            players[link.combatreport_id].append(link.player)
+        return players
+
+
+class CombatReportsCountLoader(RelationLoader):
+    default = 0
+
+    def fetch(self, player_pks):
+        counts = Counter()
+        for through in (CombatReport.attacker_players.through, CombatReport.defender_players.through):
+            counts.update(dict(
+                through.objects.filter(player_id__in=player_pks)
+                .values_list('player_id').annotate(reports=Count('pk')).order_by()
+            ))
+        return counts
+
+
+class PlayerScoresLoader(ListLoader):
+    def fetch(self, player_pks):
+        scores = defaultdict(list)
+        for score in Score.objects.filter(player__in=player_pks, datetime__isnull=False).order_by('pk'):
+            scores[score.player_id].append(score)
+        return scores
+
+
+class PlayerPlanetsLoader(ListLoader):
+    def fetch(self, player_pks):
+        planets = defaultdict(list)
+        for planet in Planet.objects.filter(player__in=player_pks).select_related('player').defer('player__planets').order_by(
+            'galaxy', 'system', 'position'
+        ):
+            planets[planet.player_id].append(planet)
+        return planets
+
+
+class Loaders:
+    """
+    Loaders of the relations resolved by the schema types, kept for the
+    lifetime of a request so lookups of the same relation are batched in
+    one query whatever the number of parent rows.
+    """
+    def __init__(self):
+        self.alliance = InstanceLoader(Alliance.objects.all())
+        self.player = InstanceLoader(Player.objects.select_related('latest_score').defer('planets'))
+        self.score = InstanceLoader(Score.objects.all())
+        self.alliance_members = AllianceMembersLoader()
+        self.alliance_ships = AllianceShipsLoader()
+        self.attacker_players = ReportPlayersLoader(CombatReport.attacker_players.through)
+        self.defender_players = ReportPlayersLoader(CombatReport.defender_players.through)
+        self.combat_reports_count = CombatReportsCountLoader()
+        self.player_scores = PlayerScoresLoader()
+        self.player_planets = PlayerPlanetsLoader()
+
+    @staticmethod
+    def related(instance, field, loader):
+        """
+        Returns the instance a foreign key of `instance` points to, from the
+        instance when it was loaded with select_related.
+        """
+        descriptor = getattr(type(instance), field)
+        key = getattr(instance, descriptor.field.attname)
+        if key is None or descriptor.is_cached(instance):
+            return Promise.resolve(getattr(instance, field))
+        return loader.load(key)
+
+    @staticmethod
+    def prefetched(instance, relation, loader):
+        """
+        Returns the instances of a many to many relation of `instance`, from
+        the instance when they were prefetched.
+        """
+        cache = getattr(instance, '_prefetched_objects_cache', {})
+        if relation in cache:
+            return Promise.resolve(list(cache[relation]))
+        return loader.load(instance.pk)
+
+    def latest_score(self, player):
+        return self.related(player, 'latest_score', self.score)
+
+
+def get_loaders(info):
+    """
+    Returns the loaders of the request being resolved, stored on its context.
+    """
+    loaders = getattr(info.context, 'loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        if info.context is not None:
+            info.context.loaders = loaders
+    return loaders
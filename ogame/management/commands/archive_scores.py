@@ -0,0 +1,37 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from ogame.archive import ScoreArchive
+from ogame.cache import response_cache
+from ogame.models import Score
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Copies the raw scores stored in the database to the Parquet score archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        archive = ScoreArchive()
+        if not archive.enabled:
+            raise CommandError('Score archive is disabled, set SCORE_ARCHIVE_DIR and install pyarrow')
+
+        scores = Score.objects.filter(datetime__isnull=False).order_by('pk')
+        last_pk = 0
+        total = 0
+        while True:
+            batch = list(
+                scores.filter(pk__gt=last_pk).values('pk', *ScoreArchive.COLUMNS)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pop('pk')
+            for row in batch:
+                row.pop('pk', None)
+
+            archive.append(batch, prefix='backfill')
+            total += len(batch)
+            self.stdout.write(f'Archived {total} scores')
+        response_cache.bump('archive_scores')
@@ -0,0 +1,30 @@
+import logging
+from django.core.management.base import BaseCommand
+from ogame.cache import response_cache
+from ogame.crawlers import OgameForumCrawler
+from ogame.ingest import PlayerNameIndex
+from ogame.models import CombatReport
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Writes the normalized fleet rows of the stored combat reports which have none yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--community',
+            default=OgameForumCrawler.COMMUNITY,
+            help='Community of the universes the report participants are matched in.'
+        )
+
+    def handle(self, *args, **options):
+        name_index = PlayerNameIndex(OgameForumCrawler.get_server_ids(options['community']))
+        reports, rows = OgameForumCrawler.backfill_report_fleet(
+            CombatReport.objects.all(),
+            name_index,
+            batch_size=options['batch_size']
+        )
+        response_cache.bump('backfill_report_fleet')
+        self.stdout.write(f'Wrote {rows} fleet rows of {reports} combat reports')
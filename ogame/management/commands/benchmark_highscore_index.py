@@ -0,0 +1,89 @@
+import logging
+from random import Random
+from time import perf_counter
+import pandas as pd
+from django.core.management.base import BaseCommand
+from ogame.crawlers import OgameStatsCrawler
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SyntheticHighScores:
+    """
+    Highscore frames shaped like the ogame_stats HighScoreQuestions ones,
+    filled with random data for a universe of `players` players.
+    """
+    def __init__(self, players, seed=0):
+        random = Random(seed)
+        ids = [str(100000 + i) for i in range(players)]
+        for category in OgameStatsCrawler.HIGHSCORE_CATEGORIES:
+            shuffled = ids[:]
+            random.shuffle(shuffled)
+            frame = pd.DataFrame({
+                'position': [str(i + 1) for i in range(players)],
+                'id': shuffled,
+                'score': [float(random.randint(0, 10**7)) for _ in range(players)],
+            })
+            if category == 'military':
+                frame['ships'] = [str(random.randint(0, 10**5)) for _ in range(players)]
+            setattr(self, category, frame)
+        self.ids = ids
+
+
+def legacy_lookup(highscores, player_id):
+    """
+    Per player lookup as done before the highscore index, one boolean mask
+    scan for each category.
+    """
+    player_scores = {}
+    for category in OgameStatsCrawler.HIGHSCORE_CATEGORIES:
+        frame = getattr(highscores, category)
+        columns = ['position', 'score', 'ships'] if category == 'military' else ['position', 'score']
+        row = frame[columns].loc[frame.id == player_id].fillna(0).values[0]
+        player_scores[category] = {'score': float(row[1]), 'rank': int(row[0])}
+        if category == 'military':
+            player_scores[category]['ships'] = int(row[2])
+    return player_scores
+
+
+class Command(BaseCommand):
+    help = 'Times highscore lookups of one crawl cycle with and without the highscore index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=10000)
+        parser.add_argument(
+            '--legacy-sample',
+            type=int,
+            default=1000,
+            help='Players looked up with the legacy scan, the cycle time is extrapolated from it.'
+        )
+
+    def handle(self, *args, **options):
+        players = options['players']
+        sample = min(options['legacy_sample'], players)
+        highscores = SyntheticHighScores(players)
+
+        start = perf_counter()
+        legacy = {player_id: legacy_lookup(highscores, player_id) for player_id in highscores.ids[:sample]}
+        legacy_time = (perf_counter() - start) * players / sample
+
+        start = perf_counter()
+        index = OgameStatsCrawler.get_highscore_index(highscores)
+        build_time = perf_counter() - start
+        start = perf_counter()
+        indexed = {player_id: index.get(player_id) for player_id in highscores.ids}
+        lookup_time = perf_counter() - start
+
+        mismatches = [player_id for player_id in legacy if legacy[player_id] != indexed[player_id]]
+        if mismatches:
+            self.stderr.write(f'{len(mismatches)} players differ between legacy and indexed lookups')
+
+        self.stdout.write(f'Universe size: {players} players')
+        self.stdout.write(
+            f'Legacy scans: {legacy_time:.2f}s per cycle (extrapolated from {sample} players)'
+        )
+        self.stdout.write(
+            f'Highscore index: {build_time + lookup_time:.2f}s per cycle '
+            f'(build {build_time:.2f}s, lookups {lookup_time:.4f}s)'
+        )
+        self.stdout.write(f'Speedup: {legacy_time / (build_time + lookup_time):.0f}x')
@@ -0,0 +1,98 @@
+import logging
+from datetime import datetime, timedelta
+from random import Random
+from time import perf_counter
+import pytz
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ogame.models import Player, Score, CombatReport
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the main API queries on a synthetic dataset, written inside a transaction '
+        'that is rolled back. Run it before and after a migration to compare both schemas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=5000)
+        parser.add_argument('--scores', type=int, default=100, help='Scores per player.')
+        parser.add_argument('--reports', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of each query.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options['players'], options['scores'], options['reports'])
+            self.run_queries(options['players'], options['reports'], options['repeat'], options['explain'])
+            transaction.set_rollback(True)
+
+    def populate(self, players, scores, reports):
+        start = perf_counter()
+        Player.objects.bulk_create(
+            [Player(player_id=100000 + i, name=f'player {i}', server_id='144', planets=b'') for i in range(players)]
+        )
+        player_pks = list(
+            Player.objects.filter(name__startswith='player ').values_list('pk', flat=True)
+        )
+
+        first_dt = datetime(2020, 1, 1, tzinfo=pytz.utc)
+        for pk in player_pks:
+            Score.objects.bulk_create([
+                Score(
+                    player_id=pk,
+                    timestamp=int((first_dt + timedelta(hours=2 * i)).timestamp()),
+                    datetime=first_dt + timedelta(hours=2 * i),
+                    total_score=float(i),
+                    total_rank=1
+                )
+                for i in range(scores)
+            ])
+
+        CombatReport.objects.bulk_create([
+            CombatReport(
+                url=f'https://forum.example/thread/{i}',
+                url_hash=CombatReport.get_url_hash(f'https://forum.example/thread/{i}'),
+                title=str(i)
+            )
+            for i in range(reports)
+        ])
+        self.stdout.write(
+            f'Created {players} players, {players * scores} scores and {reports} reports '
+            f'in {perf_counter() - start:.1f}s'
+        )
+
+    def run_queries(self, players, reports, repeat, explain):
+        random = Random(0)
+        range_start = datetime(2020, 1, 5, tzinfo=pytz.utc)
+        queries = (
+            ('player by player_id and server_id', lambda: Player.objects.filter(
+                player_id=100000 + random.randrange(players), server_id='144'
+            )),
+            ('player by name', lambda: Player.objects.filter(name=f'player {random.randrange(players)}')),
+            ('players by name__in', lambda: Player.objects.filter(
+                name__in=[f'player {random.randrange(players)}' for _ in range(50)]
+            )),
+            ('player scores by datetime range', lambda: Score.objects.filter(
+                player__player_id=100000 + random.randrange(players),
+                datetime__gte=range_start,
+                datetime__isnull=False
+            )),
+            ('player last score', lambda: Score.objects.filter(
+                player__player_id=100000 + random.randrange(players)
+            ).order_by('-pk')[:1]),
+            ('combat report by url', lambda: CombatReport.objects.filter(
+                url=f'https://forum.example/thread/{random.randrange(reports)}'
+            )),
+        )
+
+        for name, queryset in queries:
+            if explain:
+                self.stdout.write(f'{name}: {queryset().explain()}')
+            start = perf_counter()
+            for _ in range(repeat):
+                list(queryset())
+            elapsed = perf_counter() - start
+            self.stdout.write(f'{name}: {elapsed / repeat * 1000:.2f}ms per query')
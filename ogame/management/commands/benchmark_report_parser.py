@@ -0,0 +1,180 @@
+import logging
+import os
+import re
+from time import perf_counter
+from bs4 import BeautifulSoup
+from dateutil import parser
+from django.core.management.base import BaseCommand
+from ogame.crawlers import OgameForumCrawler, ForumReportText
+
+LOGGER = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'fixtures',
+    'combat_reports'
+)
+
+
+class LegacyReportParser:
+    """
+    Report parser as it was before the line classifier and the date parse
+    cache, kept to check that both produce the same output.
+    """
+    @staticmethod
+    def is_defense(text):
+        return bool(ForumReportText.DEFENSES_REGEX.search(text))
+
+    @staticmethod
+    def is_ship(text):
+        return bool(ForumReportText.SHIPS_REGEX.search(text))
+
+    @staticmethod
+    def is_noise(text):
+        return bool(ForumReportText.NOISE_REGEX.search(text))
+
+    @staticmethod
+    def get_count(text):
+        tokens = text.split()
+        for token in tokens:
+            match = re.search('[0-9]+.+[0-9]', token)
+            if bool(match):
+                return int(token.replace('.', ''))
+
+        for token in tokens:
+            match = re.search('[0-9]', token)
+            if bool(match):
+                return int(token)
+
+    @staticmethod
+    def get_ship_from_text(text):
+        eye = ForumReportText.SHIPS_REGEX.search(text)
+        start, end = eye.start(), eye.end()
+        return text[start:end]
+
+    @staticmethod
+    def get_defense_from_text(text):
+        eye = ForumReportText.DEFENSES_REGEX.search(text)
+        start, end = eye.start(), eye.end()
+        return text[start:end]
+
+    @staticmethod
+    def get_report_combat_data(message_text):
+        combat_data = {
+            'date': None,
+            'attackers': {},
+            'defenders': {},
+            'winner': None
+        }
+        cursor = None
+
+        for text_line in message_text:
+            text_line = text_line.text
+
+            if not text_line:
+                continue
+
+            if LegacyReportParser.is_noise(text_line):
+                continue
+
+            elif '--:--:--' in text_line:
+                combat_data['date'] = str(parser.parse(text_line, fuzzy=True).date())
+
+            elif 'Atacante' in text_line:
+                attacker = text_line.split('Atacante')[-1].strip()
+                cursor = ('attackers', attacker)
+                if attacker not in combat_data['attackers']:
+                    combat_data['attackers'][attacker] = {'ships': {}}
+
+            elif LegacyReportParser.is_ship(text_line):
+                try:
+                    subject, name = cursor
+                except TypeError:
+                    continue
+
+                ship = LegacyReportParser.get_ship_from_text(text_line)
+                count = LegacyReportParser.get_count(text_line)
+                if ship not in combat_data[subject][name]['ships']:
+                    combat_data[subject][name]['ships'][ship] = count
+
+            elif 'Defensor' in text_line:
+                defender = text_line.split('Defensor')[-1].strip()
+                cursor = ('defenders', defender)
+                if defender not in combat_data['defenders']:
+                    combat_data['defenders'][defender] = {'ships': {}, 'defenses': {}}
+
+            elif LegacyReportParser.is_defense(text_line):
+                try:
+                    subject, name = cursor
+                except TypeError:
+                    continue
+
+                defense = LegacyReportParser.get_defense_from_text(text_line)
+                count = LegacyReportParser.get_count(text_line)
+                if defense not in combat_data[subject][name]['defenses']:
+                    combat_data[subject][name]['defenses'][defense] = count
+
+            elif 'venceu a batalha' in text_line:
+                if 'atacante' in text_line.lower():
+                    combat_data['winner'] = 'attackers'
+                elif 'defensor' in text_line.lower():
+                    combat_data['winner'] = 'defenders'
+                return combat_data
+
+            elif 'batalha terminou empatada' in text_line:
+                combat_data['winner'] = 'draw'
+                return combat_data
+
+        return combat_data
+
+
+class Command(BaseCommand):
+    help = 'Checks the combat report parser against the legacy one on saved reports and times both.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixtures', default=FIXTURES_DIR)
+        parser.add_argument('--repeat', type=int, default=500)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        reports = {}
+        for filename in sorted(os.listdir(options['fixtures'])):
+            with open(os.path.join(options['fixtures'], filename), 'rb') as report_file:
+                thread_html = BeautifulSoup(report_file.read(), 'html.parser')
+            reports[filename] = thread_html.find(class_='messageText').findAll('p')
+
+        mismatches = 0
+        for filename, message_text in reports.items():
+            expected = LegacyReportParser.get_report_combat_data(message_text)
+            result = OgameForumCrawler.get_report_combat_data(message_text)
+            if result != expected:
+                mismatches += 1
+                self.stderr.write(f'{filename}: parsed {result}, expected {expected}')
+        self.stdout.write(f'{len(reports) - mismatches}/{len(reports)} reports match the legacy parser output')
+
+        # the parsers read the text of each line, keep html parsing out of timings
+        lines = [line for message_text in reports.values() for line in message_text]
+        total_lines = len(lines) * options['repeat']
+
+        def parse_cold(message_text):
+            # every report of a different day, the date parse is never cached
+            ForumReportText.get_date.cache_clear()
+            return OgameForumCrawler.get_report_combat_data(message_text)
+
+        parsers = (
+            ('legacy', LegacyReportParser.get_report_combat_data),
+            ('current, new date lines', parse_cold),
+            ('current, known date lines', OgameForumCrawler.get_report_combat_data),
+        )
+        # parsers take turns on each round and keep their best one, so
+        # timings are not skewed by the order they run in or by load spikes
+        best = {}
+        for _ in range(options['rounds']):
+            for name, parse in parsers:
+                start = perf_counter()
+                for _ in range(options['repeat']):
+                    for message_text in reports.values():
+                        parse(message_text)
+                best[name] = min(best.get(name, float('inf')), perf_counter() - start)
+        for name, _ in parsers:
+            self.stdout.write(f'{name}: {total_lines / best[name]:,.0f} lines/sec')
@@ -1,16 +1,45 @@
 import logging
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from ogame.crawlers import OgameForumCrawler
+from ogame.fetchers import ForumFetcher
+from ogame.models import CrawlRun
+from ogame.scheduler import CrawlScheduler
 
 LOGGER = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
-        # parser.add_argument('--name', type=int)
-        ...
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=ForumFetcher.WORKERS,
+            help='Number of report threads downloaded concurrently.'
+        )
+        parser.add_argument('--once', action='store_true', help='Run a single crawl and exit.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=86400,
+            help='Seconds between the starts of two crawls.'
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0,
+            help='Maximum random delay in seconds added to each crawl start.'
+        )
 
     def handle(self, *args, **options):
         LOGGER.info('Starting Ogame forum crawler')
-        OgameForumCrawler.crawl()
-
+        # kept across runs so unchanged pages are requested conditionally
+        fetcher = ForumFetcher(workers=options['workers'])
+        scheduler = CrawlScheduler(
+            'crawl_forum_combat_reports',
+            lambda: OgameForumCrawler.crawl(fetcher=fetcher),
+            interval=options['interval'],
+            jitter=options['jitter']
+        )
+        run = scheduler.run(once=options['once'])
+        if run is not None and run.status != CrawlRun.SUCCESS:
+            raise CommandError(f'Crawl run {run.status}: {run.error or "lock held by another run"}')
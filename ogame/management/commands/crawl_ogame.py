@@ -1,15 +1,71 @@
 import logging
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from ogame.crawlers import OgameStatsCrawler
+from ogame.fetchers import PlayerDataFetcher
+from ogame.models import CrawlRun
+from ogame.scheduler import CrawlScheduler
 
 LOGGER = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
-        # parser.add_argument('--name', type=int)
-        ...
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=PlayerDataFetcher.WORKERS,
+            help='Number of player data requests made concurrently.'
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=None,
+            help='Number of universes crawled concurrently, defaults to one process per universe.'
+        )
+        parser.add_argument(
+            '--universe',
+            action='append',
+            dest='universes',
+            metavar='COMMUNITY:SERVER_ID',
+            help='Universe to crawl instead of the OGAME_UNIVERSES setting, can be repeated.'
+        )
+        parser.add_argument('--once', action='store_true', help='Run a single crawl cycle and exit.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=7200,
+            help='Seconds between the starts of two crawl cycles.'
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0,
+            help='Maximum random delay in seconds added to each cycle start.'
+        )
 
     def handle(self, *args, **options):
         LOGGER.info('Starting Ogame scraper crawler')
-        OgameStatsCrawler.crawl()
+        universes = settings.OGAME_UNIVERSES
+        if options['universes']:
+            try:
+                universes = [
+                    (community, int(server_id))
+                    for community, server_id in (universe.split(':') for universe in options['universes'])
+                ]
+            except ValueError:
+                raise CommandError('Universes must be given as COMMUNITY:SERVER_ID, for example br:144')
+
+        scheduler = CrawlScheduler(
+            'crawl_ogame',
+            lambda: OgameStatsCrawler.crawl_universes(
+                universes,
+                workers=options['workers'],
+                processes=options['processes']
+            ),
+            interval=options['interval'],
+            jitter=options['jitter']
+        )
+        run = scheduler.run(once=options['once'])
+        if run is not None and run.status != CrawlRun.SUCCESS:
+            raise CommandError(f'Crawl run {run.status}: {run.error or "lock held by another run"}')
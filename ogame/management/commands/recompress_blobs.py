@@ -0,0 +1,65 @@
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ogame.cache import response_cache
+from ogame.models import Player, CombatReport, FleetRecord, PastScorePrediction
+from ogame.types import CompressedDict
+
+LOGGER = logging.getLogger(__name__)
+
+BLOB_FIELDS = (
+    (Player, ('planets',)),
+    (CombatReport, ('attackers', 'defenders')),
+    (FleetRecord, ('fleet',)),
+    (PastScorePrediction, ('prediction',)),
+)
+
+
+class Command(BaseCommand):
+    help = 'Rewrites the CompressedDict blobs stored with an older codec version using the current one.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, fields in BLOB_FIELDS:
+            self.recompress(model, fields, options['batch_size'])
+        response_cache.bump('recompress_blobs')
+
+    def recompress(self, model, fields, batch_size):
+        rows = before = after = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', *fields)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            for instance in batch:
+                stale = False
+                for field in fields:
+                    bit_string = getattr(instance, field)
+                    if CompressedDict.is_current(bit_string):
+                        continue
+                    try:
+                        recompressed = CompressedDict.encode(CompressedDict.decode_legacy(bit_string))
+                    except Exception as err:
+                        print(f'Failed decoding {model.__name__} {instance.pk} {field} with error: {str(err)}')
+                        continue
+                    before += len(bit_string)
+                    after += len(recompressed)
+                    setattr(instance, field, recompressed)
+                    stale = True
+                if stale:
+                    changed.append(instance)
+
+            with transaction.atomic():
+                model.objects.bulk_update(changed, fields)
+            rows += len(changed)
+
+        self.stdout.write(
+            f'{model.__name__}: recompressed {rows} rows, {before:,} to {after:,} bytes'
+        )
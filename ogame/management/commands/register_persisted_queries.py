@@ -0,0 +1,48 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from graphql import parse
+from graphql.error import GraphQLSyntaxError
+from graphql.validation import validate
+from invictus.schema import schema
+from ogame.documents import query_hash
+from ogame.models import PersistedQuery
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Registers the GraphQL queries of the given files as persisted queries, requested by the sha256 hash '
+        'of the file contents. Running processes keep removed queries until they are restarted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*')
+        parser.add_argument('--replace', action='store_true', help='Remove the queries not in the given files.')
+
+    def handle(self, *args, **options):
+        queries = {}
+        for path in options['files']:
+            with open(path) as query_file:
+                query = query_file.read()
+            try:
+                errors = validate(schema, parse(query))
+            except GraphQLSyntaxError as err:
+                errors = [err]
+            if errors:
+                raise CommandError(f'Invalid query {path}: {errors[0]}')
+            queries[query_hash(query)] = query
+            self.stdout.write(f'{query_hash(query)} {path}')
+
+        with transaction.atomic():
+            if options['replace']:
+                removed, _ = PersistedQuery.objects.exclude(sha256__in=queries).delete()
+                self.stdout.write(f'Removed {removed} persisted queries')
+            registered = set(PersistedQuery.objects.filter(sha256__in=queries).values_list('sha256', flat=True))
+            PersistedQuery.objects.bulk_create(
+                PersistedQuery(sha256=key, query=query)
+                for key, query in queries.items() if key not in registered
+            )
+
+        self.stdout.write(f'Registered {len(queries) - len(registered)} persisted queries')
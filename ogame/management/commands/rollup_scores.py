@@ -0,0 +1,22 @@
+import logging
+from django.core.management.base import BaseCommand
+from ogame.cache import response_cache
+from ogame.models import Score
+from ogame.rollups import ScoreRollups
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Builds the hourly and daily score rollups from the raw scores, scores already rolled up are skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        ScoreRollups.add_scores(
+            Score.objects.all(),
+            batch_size=options['batch_size'],
+            progress=lambda total: self.stdout.write(f'Rolled up {total} scores')
+        )
+        response_cache.bump('rollup_scores')
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0015_fleetrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='fingerprint',
+            field=models.CharField(max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0016_player_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('duration', models.FloatField(null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+            ],
+        ),
+    ]
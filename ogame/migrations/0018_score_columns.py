@@ -0,0 +1,226 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:19
+
+import json
+from django.db import migrations, models
+
+CATEGORIES = (
+    'total', 'economy', 'research', 'military',
+    'military_built', 'military_destroyed', 'military_lost', 'honor'
+)
+CHUNK_SIZE = 2000
+
+
+def decode(blob):
+    return json.loads(bytes(blob).decode('utf-8')) if blob else {}
+
+
+def score_chunks(Score):
+    """
+    Yields the scores in primary key ordered chunks, so the table is never
+    loaded in memory at once.
+    """
+    last_pk = 0
+    while True:
+        chunk = list(Score.objects.filter(pk__gt=last_pk).order_by('pk')[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def backfill_score_columns(apps, schema_editor):
+    Score = apps.get_model('ogame', 'Score')
+    fields = [f'{category}_{column}' for category in CATEGORIES for column in ('score', 'rank')]
+    fields.append('military_ships')
+    for chunk in score_chunks(Score):
+        for score in chunk:
+            for category in CATEGORIES:
+                data = decode(getattr(score, category))
+                setattr(score, f'{category}_score', data.get('score'))
+                setattr(score, f'{category}_rank', data.get('rank'))
+                if category == 'military':
+                    score.military_ships = data.get('ships')
+        Score.objects.bulk_update(chunk, fields)
+
+
+def restore_score_blobs(apps, schema_editor):
+    Score = apps.get_model('ogame', 'Score')
+    for chunk in score_chunks(Score):
+        for score in chunk:
+            for category in CATEGORIES:
+                data = {
+                    'score': getattr(score, f'{category}_score'),
+                    'rank': getattr(score, f'{category}_rank')
+                }
+                if category == 'military':
+                    data['ships'] = score.military_ships
+                setattr(score, category, json.dumps(data).encode('utf-8'))
+        Score.objects.bulk_update(chunk, CATEGORIES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0017_crawlrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='score',
+            name='economy_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='economy_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='honor_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='honor_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_built_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_built_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_destroyed_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_destroyed_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_lost_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_lost_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='military_ships',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='research_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='research_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='total_rank',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='total_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='economy',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='honor',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='military',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='military_built',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='military_destroyed',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='military_lost',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='research',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='total',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(backfill_score_columns, restore_score_blobs),
+        migrations.RemoveField(
+            model_name='score',
+            name='economy',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='honor',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='military',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='military_built',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='military_destroyed',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='military_lost',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='research',
+        ),
+        migrations.RemoveField(
+            model_name='score',
+            name='total',
+        ),
+    ]
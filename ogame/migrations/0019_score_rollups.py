@@ -0,0 +1,106 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0018_score_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('samples', models.IntegerField(default=0)),
+                ('last_timestamp', models.IntegerField()),
+                ('total_min', models.FloatField(null=True)),
+                ('total_max', models.FloatField(null=True)),
+                ('total_last', models.FloatField(null=True)),
+                ('total_delta', models.FloatField(null=True)),
+                ('economy_min', models.FloatField(null=True)),
+                ('economy_max', models.FloatField(null=True)),
+                ('economy_last', models.FloatField(null=True)),
+                ('economy_delta', models.FloatField(null=True)),
+                ('research_min', models.FloatField(null=True)),
+                ('research_max', models.FloatField(null=True)),
+                ('research_last', models.FloatField(null=True)),
+                ('research_delta', models.FloatField(null=True)),
+                ('military_min', models.FloatField(null=True)),
+                ('military_max', models.FloatField(null=True)),
+                ('military_last', models.FloatField(null=True)),
+                ('military_delta', models.FloatField(null=True)),
+                ('military_built_min', models.FloatField(null=True)),
+                ('military_built_max', models.FloatField(null=True)),
+                ('military_built_last', models.FloatField(null=True)),
+                ('military_built_delta', models.FloatField(null=True)),
+                ('military_destroyed_min', models.FloatField(null=True)),
+                ('military_destroyed_max', models.FloatField(null=True)),
+                ('military_destroyed_last', models.FloatField(null=True)),
+                ('military_destroyed_delta', models.FloatField(null=True)),
+                ('military_lost_min', models.FloatField(null=True)),
+                ('military_lost_max', models.FloatField(null=True)),
+                ('military_lost_last', models.FloatField(null=True)),
+                ('military_lost_delta', models.FloatField(null=True)),
+                ('honor_min', models.FloatField(null=True)),
+                ('honor_max', models.FloatField(null=True)),
+                ('honor_last', models.FloatField(null=True)),
+                ('honor_delta', models.FloatField(null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ogame.Player')),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('player', 'start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('samples', models.IntegerField(default=0)),
+                ('last_timestamp', models.IntegerField()),
+                ('total_min', models.FloatField(null=True)),
+                ('total_max', models.FloatField(null=True)),
+                ('total_last', models.FloatField(null=True)),
+                ('total_delta', models.FloatField(null=True)),
+                ('economy_min', models.FloatField(null=True)),
+                ('economy_max', models.FloatField(null=True)),
+                ('economy_last', models.FloatField(null=True)),
+                ('economy_delta', models.FloatField(null=True)),
+                ('research_min', models.FloatField(null=True)),
+                ('research_max', models.FloatField(null=True)),
+                ('research_last', models.FloatField(null=True)),
+                ('research_delta', models.FloatField(null=True)),
+                ('military_min', models.FloatField(null=True)),
+                ('military_max', models.FloatField(null=True)),
+                ('military_last', models.FloatField(null=True)),
+                ('military_delta', models.FloatField(null=True)),
+                ('military_built_min', models.FloatField(null=True)),
+                ('military_built_max', models.FloatField(null=True)),
+                ('military_built_last', models.FloatField(null=True)),
+                ('military_built_delta', models.FloatField(null=True)),
+                ('military_destroyed_min', models.FloatField(null=True)),
+                ('military_destroyed_max', models.FloatField(null=True)),
+                ('military_destroyed_last', models.FloatField(null=True)),
+                ('military_destroyed_delta', models.FloatField(null=True)),
+                ('military_lost_min', models.FloatField(null=True)),
+                ('military_lost_max', models.FloatField(null=True)),
+                ('military_lost_last', models.FloatField(null=True)),
+                ('military_lost_delta', models.FloatField(null=True)),
+                ('honor_min', models.FloatField(null=True)),
+                ('honor_max', models.FloatField(null=True)),
+                ('honor_last', models.FloatField(null=True)),
+                ('honor_delta', models.FloatField(null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ogame.Player')),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('player', 'start')},
+            },
+        ),
+    ]
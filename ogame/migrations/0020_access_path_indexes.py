@@ -0,0 +1,82 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:25
+
+from hashlib import sha1
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicates(model, fields):
+    """
+    Deletes the rows repeating the `fields` of an older row, printing how
+    many were deleted of each kept row and in total.
+    """
+    duplicates = (
+        model.objects.values(*fields)
+        .annotate(keep=Min('pk'), copies=Count('pk'))
+        .filter(copies__gt=1)
+    )
+    deleted = 0
+    for duplicate in duplicates:
+        keep = duplicate.pop('keep')
+        duplicate.pop('copies')
+        copies, _ = model.objects.filter(**duplicate).exclude(pk=keep).delete()
+        print(f'Deleted {copies} duplicates of {model.__name__} {keep} {duplicate}')
+        deleted += copies
+    if deleted:
+        print(f'Deleted {deleted} duplicate {model.__name__} rows')
+
+
+def delete_duplicate_rows(apps, schema_editor):
+    delete_duplicates(apps.get_model('ogame', 'Score'), ['player', 'timestamp'])
+    delete_duplicates(apps.get_model('ogame', 'CombatReport'), ['url'])
+
+
+def set_url_hashes(apps, schema_editor):
+    CombatReport = apps.get_model('ogame', 'CombatReport')
+    reports = list(CombatReport.objects.only('pk', 'url'))
+    for report in reports:
+        report.url_hash = sha1(report.url.encode('utf-8')).hexdigest()
+    CombatReport.objects.bulk_update(reports, ['url_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0019_score_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_rows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='alliance',
+            name='ally_id',
+            field=models.IntegerField(db_index=True),
+        ),
+        migrations.AddField(
+            model_name='combatreport',
+            name='url_hash',
+            field=models.CharField(max_length=40, null=True),
+        ),
+        migrations.RunPython(set_url_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='combatreport',
+            name='url_hash',
+            field=models.CharField(max_length=40, unique=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='score',
+            unique_together={('player', 'timestamp')},
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['player_id', 'server_id'], name='ogame_playe_player__a1c7d6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['name'], name='ogame_playe_name_57295c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['player', 'datetime'], name='ogame_score_player__284cb4_idx'),
+        ),
+    ]
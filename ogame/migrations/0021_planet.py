@@ -0,0 +1,78 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:29
+
+import json
+import zlib
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def decode(blob):
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    if blob[0] == 1:
+        return json.loads(zlib.decompress(blob[1:]).decode('utf-8'))
+    return json.loads(blob.decode('utf-8'))
+
+
+def create_planets(apps, schema_editor):
+    Player = apps.get_model('ogame', 'Player')
+    Planet = apps.get_model('ogame', 'Planet')
+    last_pk = 0
+    while True:
+        players = list(Player.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'planets')[:2000])
+        if not players:
+            return
+        last_pk = players[-1].pk
+
+        planets = []
+        for player in players:
+            try:
+                data = decode(player.planets).get('planet', [])
+            except ValueError:
+                continue
+            for planet in [data] if isinstance(data, dict) else data:
+                galaxy, system, position = (int(c) for c in planet['coords'].split(':'))
+                moon = planet.get('moon')
+                planets.append(Planet(
+                    player_id=player.pk,
+                    planet_id=int(planet['id']),
+                    name=planet['name'],
+                    galaxy=galaxy,
+                    system=system,
+                    position=position,
+                    moon=moon['name'] if moon else None
+                ))
+        Planet.objects.bulk_create(planets, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0020_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Planet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('planet_id', models.IntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('galaxy', models.IntegerField()),
+                ('system', models.IntegerField()),
+                ('position', models.IntegerField()),
+                ('moon', models.CharField(max_length=100, null=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ogame.Player')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='planet',
+            index=models.Index(fields=['galaxy', 'system', 'position'], name='ogame_plane_galaxy_199e10_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='planet',
+            unique_together={('player', 'planet_id')},
+        ),
+        migrations.RunPython(create_planets, migrations.RunPython.noop),
+    ]
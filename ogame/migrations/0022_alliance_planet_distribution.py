@@ -0,0 +1,86 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:30
+
+import json
+import zlib
+from ast import literal_eval
+from django.db import migrations, models
+
+# galaxies of the universes, given a row each by update_ally_data
+GALAXIES = 9
+
+
+def decode(blob):
+    if not blob:
+        return None
+    blob = bytes(blob)
+    if blob[0] == 1:
+        return json.loads(zlib.decompress(blob[1:]).decode('utf-8'))
+    text = blob.decode('utf-8')
+    try:
+        return json.loads(text)
+    except ValueError:
+        return literal_eval(text)
+
+
+def fill_alliance_counts(apps, schema_editor):
+    Alliance = apps.get_model('ogame', 'Alliance')
+    AllianceGalaxy = apps.get_model('ogame', 'AllianceGalaxy')
+    galaxies = []
+    for ally in Alliance.objects.all():
+        try:
+            coords = decode(ally.planets_distribution_coords) or []
+            distribution = decode(ally.planets_distribution_by_galaxy) or {}
+        except (ValueError, SyntaxError):
+            coords, distribution = [], {}
+        ally.planets_count = len(coords)
+        ally.players_count = ally.members.count()
+        ally.save(update_fields=['planets_count', 'players_count'])
+        counts = {galaxy: 0 for galaxy in range(1, GALAXIES + 1)}
+        counts.update((int(galaxy), planets) for galaxy, planets in distribution.items())
+        galaxies += [
+            AllianceGalaxy(alliance=ally, galaxy=galaxy, planets=planets)
+            for galaxy, planets in counts.items()
+        ]
+    AllianceGalaxy.objects.bulk_create(galaxies)
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0021_planet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alliance',
+            name='planets_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='alliance',
+            name='players_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='AllianceGalaxy',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('galaxy', models.IntegerField()),
+                ('planets', models.IntegerField(default=0)),
+                ('alliance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='galaxy_distribution', to='ogame.Alliance')),
+            ],
+            options={
+                'unique_together': {('alliance', 'galaxy')},
+            },
+        ),
+        migrations.RunPython(fill_alliance_counts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='alliance',
+            name='planets_distribution_by_galaxy',
+        ),
+        migrations.RemoveField(
+            model_name='alliance',
+            name='planets_distribution_coords',
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.15 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0022_alliance_planet_distribution'),
+    ]
+
+    operations = [
+        # every alliance stored so far was crawled from the single br 144 universe
+        migrations.AddField(
+            model_name='alliance',
+            name='server_id',
+            field=models.CharField(default='144', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='alliance',
+            name='ally_id',
+            field=models.IntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='alliance',
+            index=models.Index(fields=['server_id', 'ally_id'], name='ogame_allia_server__6f30e1_idx'),
+        ),
+    ]
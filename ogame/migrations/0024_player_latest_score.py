@@ -0,0 +1,29 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def set_latest_scores(apps, schema_editor):
+    Player = apps.get_model('ogame', 'Player')
+    Score = apps.get_model('ogame', 'Score')
+    Player.objects.update(latest_score=Subquery(
+        Score.objects.filter(player=OuterRef('pk')).order_by('-timestamp').values('pk')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0023_alliance_server_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='latest_score',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ogame.Score'),
+        ),
+        migrations.RunPython(set_latest_scores, migrations.RunPython.noop),
+    ]
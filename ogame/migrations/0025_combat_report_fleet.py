@@ -0,0 +1,29 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0024_player_latest_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CombatReportFleet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('attackers', 'Attackers'), ('defenders', 'Defenders')], max_length=9)),
+                ('unit', models.SmallIntegerField()),
+                ('count', models.BigIntegerField()),
+                ('player', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='combat_report_fleet', to='ogame.Player')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fleet', to='ogame.CombatReport')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='combatreportfleet',
+            index=models.Index(fields=['player', 'unit'], name='ogame_comba_player__b6ccc2_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0025_combat_report_fleet'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(fields=['rank', 'id'], name='ogame_playe_rank_754e26_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['datetime', 'id'], name='ogame_score_datetim_f6f6ba_idx'),
+        ),
+    ]
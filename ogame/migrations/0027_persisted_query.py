@@ -0,0 +1,22 @@
+# Generated by Django 2.2.15 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0026_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersistedQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('query', models.TextField()),
+                ('registered_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
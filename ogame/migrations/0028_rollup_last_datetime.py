@@ -0,0 +1,36 @@
+# Generated by Django 2.2.15 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_last_datetimes(apps, schema_editor):
+    Score = apps.get_model('ogame', 'Score')
+    for model_name in ('HourlyScore', 'DailyScore'):
+        apps.get_model('ogame', model_name).objects.update(last_datetime=Subquery(
+            Score.objects.filter(
+                player=OuterRef('player'),
+                timestamp=OuterRef('last_timestamp')
+            ).values('datetime')[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0027_persisted_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyscore',
+            name='last_datetime',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='hourlyscore',
+            name='last_datetime',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_last_datetimes, migrations.RunPython.noop),
+    ]
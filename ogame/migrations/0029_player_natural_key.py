@@ -0,0 +1,84 @@
+# Generated by Django 2.2.15 on 2026-10-18 18:05
+
+from django.db import migrations
+from django.db.models import Count, Min, Subquery
+
+
+def move_rows(model, field, keep, duplicates, unique=()):
+    """
+    Points the `field` of the rows of `model` referencing the `duplicates`
+    players to the `keep` player. Rows that would repeat the `unique` fields
+    of a row of the kept player are deleted.
+    """
+    rows = model.objects.filter(**{f'{field}__in': duplicates})
+    if not unique:
+        rows.update(**{field: keep})
+        return
+
+    taken = set(model.objects.filter(**{field: keep}).values_list(*unique))
+    for row in rows.order_by('pk'):
+        key = tuple(getattr(row, name) for name in unique)
+        if key in taken:
+            row.delete()
+            continue
+        taken.add(key)
+        setattr(row, field, keep)
+        row.save(update_fields=[field])
+
+
+def merge_duplicate_players(apps, schema_editor):
+    Player = apps.get_model('ogame', 'Player')
+    Score = apps.get_model('ogame', 'Score')
+    Alliance = apps.get_model('ogame', 'Alliance')
+    CombatReport = apps.get_model('ogame', 'CombatReport')
+    related = (
+        (Score, 'player', ('timestamp',)),
+        (apps.get_model('ogame', 'Planet'), 'player', ('planet_id',)),
+        (apps.get_model('ogame', 'HourlyScore'), 'player', ('start',)),
+        (apps.get_model('ogame', 'DailyScore'), 'player', ('start',)),
+        (apps.get_model('ogame', 'PastScorePrediction'), 'player', ()),
+        (apps.get_model('ogame', 'FleetRecord'), 'player', ()),
+        (apps.get_model('ogame', 'CombatReportFleet'), 'player', ()),
+        (Alliance, 'founder', ()),
+        (Alliance.members.through, 'player', ('alliance_id',)),
+        (CombatReport.attacker_players.through, 'player', ('combatreport_id',)),
+        (CombatReport.defender_players.through, 'player', ('combatreport_id',)),
+    )
+
+    # the crawler kept updating the first player stored with an ingame id
+    groups = (
+        Player.objects.values('player_id', 'server_id')
+        .annotate(keep=Min('pk'), copies=Count('pk'))
+        .filter(copies__gt=1)
+    )
+    for group in groups:
+        duplicates = list(
+            Player.objects.filter(player_id=group['player_id'], server_id=group['server_id'])
+            .exclude(pk=group['keep']).values_list('pk', flat=True)
+        )
+        for model, field, unique in related:
+            move_rows(model, f'{field}_id', group['keep'], duplicates, unique)
+        Player.objects.filter(pk__in=duplicates).delete()
+        Player.objects.filter(pk=group['keep']).update(latest_score=Subquery(
+            Score.objects.filter(player=group['keep']).order_by('-timestamp').values('pk')[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0028_rollup_last_datetime'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_players, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='player',
+            unique_together={('player_id', 'server_id')},
+        ),
+        # covered by the unique index
+        migrations.RemoveIndex(
+            model_name='player',
+            name='ogame_playe_player__a1c7d6_idx',
+        ),
+    ]
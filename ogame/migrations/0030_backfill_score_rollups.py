@@ -0,0 +1,23 @@
+# Generated by Django 2.2.15 on 2026-10-18 19:10
+
+from django.db import migrations
+from ogame.rollups import ScoreRollups
+
+
+def backfill_score_rollups(apps, schema_editor):
+    # the statistics read the rollups, scores crawled before them are rolled up here
+    ScoreRollups.add_scores(
+        apps.get_model('ogame', 'Score').objects.all(),
+        models=(apps.get_model('ogame', 'HourlyScore'), apps.get_model('ogame', 'DailyScore'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0029_player_natural_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_score_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.15 on 2026-10-18 19:25
+
+from django.db import migrations
+from ogame.crawlers import OgameForumCrawler
+from ogame.ingest import PlayerNameIndex
+
+
+def backfill_report_fleet(apps, schema_editor):
+    # the fleet statistics read the fleet rows, reports crawled before them are filled in here
+    name_index = PlayerNameIndex(
+        OgameForumCrawler.get_server_ids(),
+        players=apps.get_model('ogame', 'Player').objects.all()
+    )
+    OgameForumCrawler.backfill_report_fleet(
+        apps.get_model('ogame', 'CombatReport').objects.all(),
+        name_index,
+        model=apps.get_model('ogame', 'CombatReportFleet')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ogame', '0030_backfill_score_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_report_fleet, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from hashlib import sha1
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -15,24 +16,141 @@ class Player(models.Model):
         null=True,
         related_name='current_alliance'
     )
+    fingerprint = models.CharField(max_length=40, null=True)
+    # newest collected score, kept by the crawler ingest
+    latest_score = models.ForeignKey(
+        'ogame.Score',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+
+    class Meta:
+        unique_together = ('player_id', 'server_id')
+        indexes = [
+            models.Index(fields=['name']),
+            models.Index(fields=['rank', 'id']),
+        ]
+
+
+class Planet(models.Model):
+    player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    planet_id = models.IntegerField()
+    name = models.CharField(max_length=100)
+    galaxy = models.IntegerField()
+    system = models.IntegerField()
+    position = models.IntegerField()
+    moon = models.CharField(max_length=100, null=True)
+
+    class Meta:
+        unique_together = ('player', 'planet_id')
+        indexes = [
+            models.Index(fields=['galaxy', 'system', 'position']),
+        ]
 
 
 class Score(models.Model):
+    CATEGORIES = (
+        'total',
+        'economy',
+        'research',
+        'military',
+        'military_built',
+        'military_destroyed',
+        'military_lost',
+        'honor',
+    )
+
     timestamp = models.IntegerField()
     datetime = models.DateTimeField(null=True)
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
-    total = models.BinaryField()
-    economy = models.BinaryField()
-    research = models.BinaryField()
-    military = models.BinaryField()
-    military_built = models.BinaryField()
-    military_destroyed = models.BinaryField()
-    military_lost = models.BinaryField()
-    honor = models.BinaryField()
+    total_score = models.FloatField(null=True)
+    total_rank = models.IntegerField(null=True)
+    economy_score = models.FloatField(null=True)
+    economy_rank = models.IntegerField(null=True)
+    research_score = models.FloatField(null=True)
+    research_rank = models.IntegerField(null=True)
+    military_score = models.FloatField(null=True)
+    military_rank = models.IntegerField(null=True)
+    military_ships = models.BigIntegerField(null=True)
+    military_built_score = models.FloatField(null=True)
+    military_built_rank = models.IntegerField(null=True)
+    military_destroyed_score = models.FloatField(null=True)
+    military_destroyed_rank = models.IntegerField(null=True)
+    military_lost_score = models.FloatField(null=True)
+    military_lost_rank = models.IntegerField(null=True)
+    honor_score = models.FloatField(null=True)
+    honor_rank = models.IntegerField(null=True)
+
+    class Meta:
+        unique_together = ('player', 'timestamp')
+        indexes = [
+            models.Index(fields=['player', 'datetime']),
+            models.Index(fields=['datetime', 'id']),
+        ]
+
+
+class ScoreRollup(models.Model):
+    """
+    Minimum, maximum, last value and change of each score category of a
+    player over the period starting at `start`. The change is measured from
+    the first score collected in the period.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    start = models.DateTimeField()
+    samples = models.IntegerField(default=0)
+    last_timestamp = models.IntegerField()
+    # collection time of the last score, statistics bucket the period by it
+    last_datetime = models.DateTimeField(null=True)
+    total_min = models.FloatField(null=True)
+    total_max = models.FloatField(null=True)
+    total_last = models.FloatField(null=True)
+    total_delta = models.FloatField(null=True)
+    economy_min = models.FloatField(null=True)
+    economy_max = models.FloatField(null=True)
+    economy_last = models.FloatField(null=True)
+    economy_delta = models.FloatField(null=True)
+    research_min = models.FloatField(null=True)
+    research_max = models.FloatField(null=True)
+    research_last = models.FloatField(null=True)
+    research_delta = models.FloatField(null=True)
+    military_min = models.FloatField(null=True)
+    military_max = models.FloatField(null=True)
+    military_last = models.FloatField(null=True)
+    military_delta = models.FloatField(null=True)
+    military_built_min = models.FloatField(null=True)
+    military_built_max = models.FloatField(null=True)
+    military_built_last = models.FloatField(null=True)
+    military_built_delta = models.FloatField(null=True)
+    military_destroyed_min = models.FloatField(null=True)
+    military_destroyed_max = models.FloatField(null=True)
+    military_destroyed_last = models.FloatField(null=True)
+    military_destroyed_delta = models.FloatField(null=True)
+    military_lost_min = models.FloatField(null=True)
+    military_lost_max = models.FloatField(null=True)
+    military_lost_last = models.FloatField(null=True)
+    military_lost_delta = models.FloatField(null=True)
+    honor_min = models.FloatField(null=True)
+    honor_max = models.FloatField(null=True)
+    honor_last = models.FloatField(null=True)
+    honor_delta = models.FloatField(null=True)
+
+    class Meta:
+        abstract = True
+        unique_together = ('player', 'start')
+
+
+class HourlyScore(ScoreRollup):
+    pass
+
+
+class DailyScore(ScoreRollup):
+    pass
 
 
 class Alliance(models.Model):
     ally_id = models.IntegerField()
+    server_id = models.CharField(max_length=10)
     name = models.CharField(max_length=100, null=True)
     tag = models.CharField(max_length=15, null=True)
     founder = models.ForeignKey(
@@ -46,8 +164,22 @@ class Alliance(models.Model):
     homepage = models.TextField(null=True)
     application_open = models.BooleanField(null=True)
     members = models.ManyToManyField(Player, related_name='ally_members')
-    planets_distribution_coords = models.BinaryField(null=True)
-    planets_distribution_by_galaxy = models.BinaryField(null=True)
+    players_count = models.IntegerField(default=0)
+    planets_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['server_id', 'ally_id']),
+        ]
+
+
+class AllianceGalaxy(models.Model):
+    alliance = models.ForeignKey(Alliance, on_delete=models.CASCADE, related_name='galaxy_distribution')
+    galaxy = models.IntegerField()
+    planets = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('alliance', 'galaxy')
 
 
 class PastScorePrediction(models.Model):
@@ -58,6 +190,8 @@ class PastScorePrediction(models.Model):
 
 class CombatReport(models.Model):
     url = models.TextField()
+    # unique in place of the url, which can be too long for an index
+    url_hash = models.CharField(max_length=40, unique=True)
     title = models.TextField()
     date = models.DateField(null=True)
     winner = models.CharField(max_length=50, null=True, blank=True)
@@ -66,6 +200,41 @@ class CombatReport(models.Model):
     attacker_players = models.ManyToManyField(Player, related_name='combat_report_attacker')
     defender_players = models.ManyToManyField(Player, related_name='combat_report_defender')
 
+    @staticmethod
+    def get_url_hash(url):
+        return sha1(url.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.url_hash = CombatReport.get_url_hash(self.url)
+        super().save(*args, **kwargs)
+
+
+class CombatReportFleet(models.Model):
+    ATTACKERS = 'attackers'
+    DEFENDERS = 'defenders'
+    SIDES = (
+        (ATTACKERS, 'Attackers'),
+        (DEFENDERS, 'Defenders'),
+    )
+
+    report = models.ForeignKey(CombatReport, on_delete=models.CASCADE, related_name='fleet')
+    side = models.CharField(max_length=9, choices=SIDES)
+    # null when the participant name matches no player or several of them
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='combat_report_fleet'
+    )
+    # ship id of ogame.util.fleet_mapping
+    unit = models.SmallIntegerField()
+    count = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', 'unit']),
+        ]
+
 
 class FleetRecord(models.Model):
     datetime = models.DateTimeField(null=True)
@@ -83,3 +252,26 @@ class FleetRecord(models.Model):
     )
     fleet = models.BinaryField(null=True)
     coord = models.CharField(max_length=10, null=True, blank=True)
+
+
+class CrawlRun(models.Model):
+    RUNNING = 'running'
+    SUCCESS = 'success'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    job = models.CharField(max_length=50)
+    status = models.CharField(max_length=10)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True)
+    duration = models.FloatField(null=True)
+    error = models.TextField(null=True, blank=True)
+
+
+class PersistedQuery(models.Model):
+    """
+    GraphQL query registered to be requested by the sha256 hash of its text.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    query = models.TextField()
+    registered_at = models.DateTimeField(auto_now_add=True)
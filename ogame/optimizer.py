@@ -0,0 +1,175 @@
+from collections import defaultdict, namedtuple
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import ast
+from ogame.models import Player, Score, Alliance, CombatReport, FleetRecord
+
+# Columns a schema field reads, and the relation it is resolved from
+Hint = namedtuple('Hint', ['columns', 'select', 'prefetch'])
+Hint.__new__.__defaults__ = ((), None, None)
+
+# Columns always loaded, read by the loaders of the schema types
+BASE_COLUMNS = {
+    Player: ('alliance', 'latest_score'),
+    Alliance: ('founder',),
+    FleetRecord: ('player', 'recorded_by'),
+}
+
+SCORE_HINTS = {
+    'timestamp': Hint(('timestamp',)),
+    'datetime': Hint(('datetime',)),
+    'military': Hint(('military_score', 'military_rank', 'military_ships')),
+}
+SCORE_HINTS.update({
+    category: Hint((f'{category}_score', f'{category}_rank'))
+    for category in Score.CATEGORIES if category != 'military'
+})
+
+HINTS = {
+    Player: {
+        'player_id': Hint(('player_id',)),
+        'server_id': Hint(('server_id',)),
+        'name': Hint(('name',)),
+        'status': Hint(('status',)),
+        'rank': Hint(('rank',)),
+        'alliance': Hint(select='alliance'),
+        'latest_score': Hint(select='latest_score'),
+        'ships_count': Hint(('latest_score__military_ships',), select='latest_score'),
+    },
+    Alliance: {
+        'ally_id': Hint(('ally_id',)),
+        'server_id': Hint(('server_id',)),
+        'name': Hint(('name',)),
+        'tag': Hint(('tag',)),
+        'found_date': Hint(('found_date',)),
+        'logo': Hint(('logo',)),
+        'homepage': Hint(('homepage',)),
+        'application_open': Hint(('application_open',)),
+        'players_count': Hint(('players_count',)),
+        'planets_count': Hint(('planets_count',)),
+        'founder': Hint(select='founder'),
+        'members': Hint(prefetch='members'),
+    },
+    CombatReport: {
+        'title': Hint(('title',)),
+        'url': Hint(('url',)),
+        'winner': Hint(('winner',)),
+        'date': Hint(('date',)),
+        'attackers_fleet': Hint(('attackers',)),
+        'defenders_fleet': Hint(('defenders',)),
+        'attacker_players': Hint(prefetch='attacker_players'),
+        'defender_players': Hint(prefetch='defender_players'),
+    },
+    FleetRecord: {
+        'datetime': Hint(('datetime',)),
+        'coord': Hint(('coord',)),
+        'fleet': Hint(('fleet',)),
+        'player': Hint(select='player'),
+        'recorded_by': Hint(select='recorded_by'),
+    },
+    Score: SCORE_HINTS,
+    User: {
+        'username': Hint(('username',)),
+    },
+}
+
+
+class QueryOptimizer:
+    """
+    Fits the querysets of the schema list fields to the GraphQL selection
+    set being resolved.
+
+    Only the columns read by the selected fields are loaded, selected
+    foreign keys are joined with select_related and selected many to many
+    relations are prefetched, with querysets optimized for their own nested
+    selections. Fields without a hint are resolved from the primary key.
+    """
+    def __init__(self, info):
+        self.fragments = info.fragments
+        self.field_asts = info.field_asts
+
+    def fields(self, selection_sets):
+        """
+        Returns the selection sets of each field selected in
+        `selection_sets`, by snake case field name.
+        """
+        fields = defaultdict(list)
+        pending = [selection_set for selection_set in selection_sets if selection_set is not None]
+        while pending:
+            for selection in pending.pop().selections:
+                if isinstance(selection, ast.Field):
+                    fields[to_snake_case(selection.name.value)].append(selection.selection_set)
+                elif isinstance(selection, ast.FragmentSpread):
+                    pending.append(self.fragments[selection.name.value].selection_set)
+                elif isinstance(selection, ast.InlineFragment):
+                    pending.append(selection.selection_set)
+        return fields
+
+    def plan(self, model, selection_sets, prefix=''):
+        """
+        Returns the (only, select_related, prefetch_related) arguments
+        loading the fields of `model` in `selection_sets`, with paths
+        relative to the model the queryset is made of.
+        """
+        only = {prefix + column for column in BASE_COLUMNS.get(model, ())}
+        select, prefetch = set(), []
+        hints = HINTS.get(model, {})
+        for name, nested in self.fields(selection_sets).items():
+            hint = hints.get(name)
+            if hint is None:
+                continue
+            only.update(prefix + column for column in hint.columns)
+            if hint.select:
+                only.add(prefix + hint.select)
+                select.add(prefix + hint.select)
+                related_only, related_select, related_prefetch = self.plan(
+                    model._meta.get_field(hint.select).related_model,
+                    nested,
+                    f'{prefix}{hint.select}__'
+                )
+                only |= related_only
+                select |= related_select
+                prefetch += related_prefetch
+            if hint.prefetch:
+                related_model = model._meta.get_field(hint.prefetch).related_model
+                prefetch.append(Prefetch(
+                    prefix + hint.prefetch,
+                    queryset=self.optimize(related_model.objects.all(), nested)
+                ))
+        return only, select, prefetch
+
+    def node_selection_sets(self):
+        """
+        Returns the selection sets of the nodes of a connection field.
+        """
+        edges = self.fields([field.selection_set for field in self.field_asts]).get('edges', [])
+        return self.fields(edges).get('node', [])
+
+    def optimize(self, queryset, selection_sets=None, columns=()):
+        if selection_sets is None:
+            selection_sets = [field.selection_set for field in self.field_asts]
+        only, select, prefetch = self.plan(queryset.model, selection_sets)
+        only.update(columns)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset.only(*only)
+
+
+def optimize(queryset, info):
+    """
+    Returns `queryset` loading only what the selection set of the field
+    being resolved reads.
+    """
+    return QueryOptimizer(info).optimize(queryset)
+
+
+def optimize_connection(queryset, info, columns=()):
+    """
+    Returns `queryset` loading only what the nodes selected on the
+    connection field being resolved read, and the `columns` paginated by.
+    """
+    optimizer = QueryOptimizer(info)
+    return optimizer.optimize(queryset, optimizer.node_selection_sets(), columns)
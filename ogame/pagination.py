@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import date
+import graphene
+from django.conf import settings
+from django.db.models import F, Q
+from ogame.optimizer import optimize_connection
+
+
+class CountableConnection(graphene.relay.Connection):
+    """
+    Relay connection which counts every row of the paginated queryset when
+    totalCount is selected.
+    """
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info, **kwargs):
+        return self.queryset.count()
+
+
+class KeysetPagination:
+    """
+    Forward Relay pagination of a queryset by the values of its ordering
+    keys.
+
+    Keys are (field, descending) pairs ending with the primary key, so the
+    order is total. The cursor of a row encodes its key values and the page
+    after a cursor is read from the rows past those values, walking the
+    index of the keys instead of skipping an offset. Nullable keys sort
+    nulls last. Pages hold at most GRAPHQL_MAX_PAGE_SIZE rows.
+    """
+    def __init__(self, *keys):
+        self.keys = keys
+
+    def order_by(self):
+        return [
+            F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+            for field, descending in self.keys
+        ]
+
+    def encode(self, instance):
+        values = []
+        for field, _ in self.keys:
+            value = getattr(instance, field)
+            values.append(value.isoformat() if isinstance(value, date) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def decode(self, model, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            fields = [model._meta.pk if field == 'pk' else model._meta.get_field(field) for field, _ in self.keys]
+            if len(values) != len(fields):
+                raise ValueError(cursor)
+            return [
+                (field, descending, field.to_python(value))
+                for field, (_, descending), value in zip(fields, self.keys, values)
+            ]
+        except Exception:
+            raise Exception('Invalid cursor')
+
+    def after(self, keys):
+        """
+        Filter of the rows past the decoded (field, descending, value) `keys`
+        of a cursor.
+        """
+        (field, descending, value), rest = keys[0], keys[1:]
+        if value is None:
+            # only nulls, sorted last, follow a null
+            return Q(**{f'{field.name}__isnull': True}) & self.after(rest)
+
+        past = Q(**{f'{field.name}__{"lt" if descending else "gt"}': value})
+        if rest:
+            past |= Q(**{field.name: value}) & self.after(rest)
+        if field.null:
+            past |= Q(**{f'{field.name}__isnull': True})
+        return past
+
+    def page(self, connection_type, queryset, info, first=None, after=None):
+        max_page_size = settings.GRAPHQL_MAX_PAGE_SIZE
+        if first is None:
+            first = max_page_size
+        if first < 0:
+            raise Exception('Argument first must be a positive number')
+        if first > max_page_size:
+            raise Exception(f'Requesting {first} records exceeds the limit of {max_page_size} records per page')
+
+        rows = optimize_connection(queryset, info, [field for field, _ in self.keys if field != 'pk'])
+        rows = rows.order_by(*self.order_by())
+        if after is not None:
+            rows = rows.filter(self.after(self.decode(queryset.model, after)))
+        rows = list(rows[:first + 1])
+
+        edges = [connection_type.Edge(node=row, cursor=self.encode(row)) for row in rows[:first]]
+        connection = connection_type(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=after is not None,
+                has_next_page=len(rows) > first
+            )
+        )
+        connection.queryset = queryset
+        return connection
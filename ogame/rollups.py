@@ -0,0 +1,212 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+import pytz
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from ogame.models import Player, Score, HourlyScore, DailyScore
+
+# daily periods follow the local day used by the statistics
+ROLLUP_TIMEZONE = pytz.timezone('America/Sao_Paulo')
+
+
+class ScoreRollups:
+    """
+    Maintains the hourly and daily score rollups and the retention of the
+    raw scores they summarize.
+
+    Samples are (player pk, timestamp, datetime, scores) tuples, where
+    scores maps the Score columns to their values. A sample is applied
+    once: samples not newer than the last one of a rollup are ignored, so
+    the rollups can be rebuilt from the raw scores at any time.
+    """
+    CHUNK_SIZE = 500
+    BATCH_SIZE = 5000
+    DELETE_CHUNK_SIZE = 5000
+    FIELDS = ['samples', 'last_timestamp', 'last_datetime'] + [
+        f'{category}_{aggregate}'
+        for category in Score.CATEGORIES
+        for aggregate in ('min', 'max', 'last', 'delta')
+    ]
+
+    @staticmethod
+    def aware(dt):
+        return timezone.make_aware(dt, pytz.utc) if timezone.is_naive(dt) else dt
+
+    @staticmethod
+    def period_start(model, dt):
+        dt = ScoreRollups.aware(dt)
+        # by name, to match the historical models of the migrations as well
+        if model._meta.model_name == 'hourlyscore':
+            return dt.replace(minute=0, second=0, microsecond=0)
+
+        local = dt.astimezone(ROLLUP_TIMEZONE)
+        return ROLLUP_TIMEZONE.localize(datetime(local.year, local.month, local.day))
+
+    @staticmethod
+    def apply(rollup, timestamp, dt, scores):
+        for category in Score.CATEGORIES:
+            value = scores.get(f'{category}_score')
+            if value is None:
+                continue
+            last = getattr(rollup, f'{category}_last')
+            if last is None:
+                first = minimum = maximum = value
+            else:
+                first = last - getattr(rollup, f'{category}_delta')
+                minimum = min(getattr(rollup, f'{category}_min'), value)
+                maximum = max(getattr(rollup, f'{category}_max'), value)
+            setattr(rollup, f'{category}_min', minimum)
+            setattr(rollup, f'{category}_max', maximum)
+            setattr(rollup, f'{category}_last', value)
+            setattr(rollup, f'{category}_delta', value - first)
+        rollup.samples += 1
+        rollup.last_timestamp = timestamp
+        rollup.last_datetime = ScoreRollups.aware(dt)
+
+    @staticmethod
+    def add(samples, chunk_size=CHUNK_SIZE, models=(HourlyScore, DailyScore)):
+        samples = sorted(samples, key=lambda sample: sample[1])
+        for model in models:
+            periods = defaultdict(list)
+            for sample in samples:
+                periods[ScoreRollups.period_start(model, sample[2])].append(sample)
+
+            for start, period_samples in periods.items():
+                for offset in range(0, len(period_samples), chunk_size):
+                    chunk = period_samples[offset:offset + chunk_size]
+                    with transaction.atomic():
+                        ScoreRollups._write(model, start, chunk)
+
+    @staticmethod
+    def _write(model, start, samples):
+        rollups = {
+            rollup.player_id: rollup
+            for rollup in model.objects.filter(start=start, player_id__in={s[0] for s in samples})
+        }
+        created = {}
+        updated = {}
+        for player_id, timestamp, dt, scores in samples:
+            rollup = rollups.get(player_id)
+            if rollup is None:
+                rollup = model(player_id=player_id, start=start, last_timestamp=timestamp)
+                rollups[player_id] = created[player_id] = rollup
+            elif timestamp <= rollup.last_timestamp:
+                continue
+            elif player_id not in created:
+                updated[player_id] = rollup
+            ScoreRollups.apply(rollup, timestamp, dt, scores)
+
+        model.objects.bulk_create(created.values())
+        model.objects.bulk_update(updated.values(), ScoreRollups.FIELDS)
+
+    @staticmethod
+    def add_records(written):
+        """
+        Rolls up the scores written by a crawl cycle, from the (player,
+        record) pairs of `PlayerScoreIngest.written`.
+        """
+        ScoreRollups.add(
+            (player.pk, record['timestamp'], record['datetime'], record['scores'])
+            for player, record in written
+            if record['scores'] is not None
+        )
+
+    @staticmethod
+    def add_scores(scores, batch_size=BATCH_SIZE, models=(HourlyScore, DailyScore), progress=None):
+        """
+        Rolls up the `scores` queryset of raw scores in batches, calling
+        `progress` with the number of scores rolled up after each batch.
+        """
+        columns = [f'{category}_score' for category in Score.CATEGORIES]
+        scores = scores.filter(datetime__isnull=False).order_by('pk')
+        last_pk = 0
+        total = 0
+        while True:
+            batch = list(
+                scores.filter(pk__gt=last_pk)
+                .values_list('pk', 'player_id', 'timestamp', 'datetime', *columns)[:batch_size]
+            )
+            if not batch:
+                return total
+            last_pk = batch[-1][0]
+
+            ScoreRollups.add(
+                (
+                    (player_id, timestamp, dt, dict(zip(columns, values)))
+                    for _, player_id, timestamp, dt, *values in batch
+                ),
+                models=models
+            )
+            total += len(batch)
+            if progress is not None:
+                progress(total)
+
+    @staticmethod
+    def _delete(queryset):
+        deleted = 0
+        while True:
+            pks = list(queryset.values_list('pk', flat=True)[:ScoreRollups.DELETE_CHUNK_SIZE])
+            if not pks:
+                return deleted
+            deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+
+    @staticmethod
+    def prune(score_retention_days=None, hourly_retention_days=None):
+        """
+        Deletes the raw scores older than `score_retention_days` that are
+        already rolled up and are not the latest score of a player, and the
+        hourly rollups older than `hourly_retention_days`. Daily rollups are
+        kept.
+        Returns the number of deleted raw scores and hourly rollups.
+        """
+        now = timezone.now()
+        scores = hourly = 0
+        if score_retention_days:
+            rolled_up = DailyScore.objects.filter(
+                player=OuterRef('player'),
+                last_timestamp__gte=OuterRef('timestamp')
+            )
+            scores = ScoreRollups._delete(
+                Score.objects.annotate(rolled_up=Exists(rolled_up)).filter(
+                    datetime__lt=now - timedelta(days=score_retention_days),
+                    rolled_up=True
+                ).exclude(
+                    # the latest score snapshot of players no longer crawled
+                    pk__in=Player.objects.filter(latest_score__isnull=False).values('latest_score')
+                )
+            )
+        if hourly_retention_days:
+            hourly = ScoreRollups._delete(
+                HourlyScore.objects.filter(start__lt=now - timedelta(days=hourly_retention_days))
+            )
+        return scores, hourly
+
+    @staticmethod
+    def history(player, model=None, start=None, stop=None):
+        """
+        Returns the (datetime, total score) pairs of a player in time order,
+        from the raw scores or from the rollups of `model`, optionally limited
+        to the periods between `start` and `stop`.
+
+        Rollups are dated by the collection time of their last score, so
+        statistics bucket them as they bucket that raw score. Rollups built
+        before that time was kept fall back to the period start.
+        """
+        if model is None:
+            rows = player.score_set.filter(datetime__isnull=False, total_score__isnull=False)
+            if start is not None:
+                rows = rows.filter(datetime__gte=start)
+            if stop is not None:
+                rows = rows.filter(datetime__lte=stop)
+            return list(rows.order_by('datetime').values_list('datetime', 'total_score'))
+
+        rows = model.objects.filter(player=player, total_last__isnull=False)
+        if start is not None:
+            rows = rows.filter(start__gte=ScoreRollups.period_start(model, start))
+        if stop is not None:
+            rows = rows.filter(start__lte=stop)
+        return list(
+            rows.order_by('start').values_list(Coalesce('last_datetime', 'start'), 'total_last')
+        )
@@ -0,0 +1,84 @@
+import fcntl
+import os
+from contextlib import contextmanager
+from math import floor
+from random import uniform
+from time import perf_counter, sleep, time
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from ogame.models import CrawlRun
+
+
+class CrawlScheduler:
+    """
+    Runs a crawl job at a fixed rate.
+
+    Runs start on slots spaced `interval` seconds from the first run, delayed
+    by up to `jitter` random seconds, so a long run does not push the next
+    ones. Slots missed while a run was still going are skipped. A file lock
+    keeps two processes from running the same job at once, and every run is
+    recorded as a CrawlRun with its timing and outcome.
+    """
+    def __init__(self, name, job, interval, jitter=0):
+        self.name = name
+        self.job = job
+        self.interval = interval
+        self.jitter = jitter
+
+    @contextmanager
+    def lock(self):
+        path = os.path.join(settings.CRAWL_LOCK_DIR, f'invictus-{self.name}.lock')
+        with open(path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def run_once(self):
+        # long sleeps between runs outlive database connections
+        close_old_connections()
+        with self.lock() as acquired:
+            if not acquired:
+                print(f'Skipping {self.name} run, a previous run is still going')
+                return CrawlRun.objects.create(
+                    job=self.name,
+                    status=CrawlRun.SKIPPED,
+                    started_at=timezone.now()
+                )
+
+            run = CrawlRun.objects.create(
+                job=self.name,
+                status=CrawlRun.RUNNING,
+                started_at=timezone.now()
+            )
+            start = perf_counter()
+            try:
+                self.job()
+                run.status = CrawlRun.SUCCESS
+            except Exception as err:
+                print(f'Crawling Error: {self.name} run failed with error: {str(err)}')
+                run.status = CrawlRun.FAILED
+                run.error = str(err)
+            finally:
+                run.duration = perf_counter() - start
+                run.finished_at = timezone.now()
+                close_old_connections()
+                run.save()
+        return run
+
+    def run(self, once=False):
+        if once:
+            return self.run_once()
+
+        anchor = time()
+        while True:
+            self.run_once()
+            now = time()
+            next_slot = anchor + (floor((now - anchor) / self.interval) + 1) * self.interval
+            sleep(next_slot - now + uniform(0, self.jitter))
@@ -1,16 +1,24 @@
 from collections import OrderedDict
-from ast import literal_eval
 from datetime import timedelta, datetime
 import pytz
 import graphene
 from django.contrib.auth import get_user_model
+from django.db.models import DateTimeField, Exists, OuterRef, Prefetch, Value
 from ogame.types import DynamicScalar, CompressedDict
-from ogame.models import Player, Alliance, PastScorePrediction, Score, CombatReport, FleetRecord
+from ogame.models import (Player, Planet, Alliance, PastScorePrediction, Score, CombatReport, CombatReportFleet,
+                          FleetRecord, HourlyScore, DailyScore)
+from ogame.rollups import ScoreRollups
+from ogame.archive import ScoreArchive
 from ogame.util import get_prediction_df, get_future_activity, FleetHashMap
 from ogame.forecast import predict_player_future_score
 from ogame.statistics import (weekday_relative_freq, hour_relative_freq,
-                              fleet_relative_freq, universe_fleet_relative_freq)
+                              fleet_relative_freq, universe_fleet_relative_freq,
+                              universe_hour_relative_freq)
 from ogame.auth import access_required
+from ogame.cache import response_cache
+from ogame.loaders import get_loaders
+from ogame.optimizer import optimize
+from ogame.pagination import CountableConnection, KeysetPagination
 
 
 class UserType(graphene.ObjectType):
@@ -23,6 +31,19 @@ class PlanetType(graphene.ObjectType):
     position = graphene.Int()
     name = graphene.String()
     raw_coord = graphene.String()
+    moon = graphene.String()
+    player = graphene.Field('ogame.schema.PlayerType')
+
+    @classmethod
+    def from_planet(cls, planet):
+        return cls(
+            galaxy=planet.galaxy,
+            solar_system=planet.system,
+            position=planet.position,
+            name=planet.name,
+            moon=planet.moon,
+            player=planet.player
+        )
 
     def resolve_raw_coord(self, info, **kwargs):
         return f'{self.galaxy}:{self.solar_system}:{self.position}'
@@ -74,28 +95,43 @@ class ScoreType(graphene.ObjectType):
             print(f'FieldResolverError: Failed to resolve field with error: {str(err)}')
 
     def resolve_total(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.total)
+        return {'score': self.total_score, 'rank': self.total_rank}
 
     def resolve_economy(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.economy)
+        return {'score': self.economy_score, 'rank': self.economy_rank}
 
     def resolve_research(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.research)
+        return {'score': self.research_score, 'rank': self.research_rank}
 
     def resolve_military(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.military)
+        return {
+            'score': self.military_score,
+            'rank': self.military_rank,
+            'ships': self.military_ships
+        }
 
     def resolve_military_built(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.military_built)
+        return {'score': self.military_built_score, 'rank': self.military_built_rank}
 
     def resolve_military_destroyed(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.military_destroyed)
+        return {'score': self.military_destroyed_score, 'rank': self.military_destroyed_rank}
 
     def resolve_military_lost(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.military_lost)
+        return {'score': self.military_lost_score, 'rank': self.military_lost_rank}
 
     def resolve_honor(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.honor)
+        return {'score': self.honor_score, 'rank': self.honor_rank}
+
+
+def get_score_range(player):
+    """
+    Returns the (start, stop) window of the scores a player was queried
+    with, empty when the scores were not filtered by datetime.
+    """
+    if hasattr(player, 'score_range'):
+        return player.score_range
+    scores_after = getattr(player, 'scores_after', None)
+    return (scores_after, None) if scores_after is not None else ()
 
 
 class PlayerType(graphene.ObjectType):
@@ -112,6 +148,7 @@ class PlayerType(graphene.ObjectType):
     planets_count = graphene.Int()
     rank = graphene.Int()
     ships_count = graphene.Int()
+    latest_score = graphene.Field(ScoreType)
     combat_reports_count = graphene.Int()
     combat_reports = graphene.List('ogame.schema.CombatReportType')
     weekday_relative_frequency = graphene.Field(WeekdayRelativeFrequency)
@@ -127,14 +164,11 @@ class PlayerType(graphene.ObjectType):
         return fleet_relative_freq(self).to_dict()['FREQ']
 
     def resolve_hour_relative_frequency(self, info, **kwargs):
-        if 'scores' in self.__dict__:
-            scores = self.scores
-        else:
-            scores = self.score_set.filter(datetime__isnull=False)
-        if not scores:
+        history = ScoreRollups.history(self, HourlyScore, *get_score_range(self))
+        if not history:
             return None
 
-        rel_freq = hour_relative_freq(scores, '3600S')
+        rel_freq = hour_relative_freq(history, '3600S')
         return HourRelativeFrequency(
             hours=rel_freq.index.values,
             relative_frequency=rel_freq.REL_FREQ.values,
@@ -143,14 +177,16 @@ class PlayerType(graphene.ObjectType):
         )
 
     def resolve_halfhour_relative_frequency(self, info, **kwargs):
-        if 'scores' in self.__dict__:
-            scores = self.scores
+        # half hours need the raw collection times, kept past retention by the archive
+        archive = ScoreArchive()
+        if archive.enabled:
+            history = archive.history(self.pk, *get_score_range(self))
         else:
-            scores = self.score_set.filter(datetime__isnull=False)
-        if not scores:
+            history = ScoreRollups.history(self, None, *get_score_range(self))
+        if not history:
             return None
 
-        rel_freq = hour_relative_freq(scores, '1800S')
+        rel_freq = hour_relative_freq(history, '1800S')
         return HourRelativeFrequency(
             hours=rel_freq.index.values,
             relative_frequency=rel_freq.REL_FREQ.values,
@@ -159,14 +195,11 @@ class PlayerType(graphene.ObjectType):
         )
 
     def resolve_weekday_relative_frequency(self, info, **kwargs):
-        if 'scores' in self.__dict__:
-            scores = self.scores
-        else:
-            scores = self.score_set.filter(datetime__isnull=False)
-        if not scores:
+        history = ScoreRollups.history(self, DailyScore, *get_score_range(self))
+        if not history:
             return None
 
-        rel_freq = weekday_relative_freq(scores)
+        rel_freq = weekday_relative_freq(history)
         return WeekdayRelativeFrequency(
             weekdays=rel_freq.index.values,
             relative_frequency=rel_freq.REL_FREQ.values,
@@ -175,47 +208,51 @@ class PlayerType(graphene.ObjectType):
         )
 
     def resolve_combat_reports_count(self, info, **kwargs):
-        return self.combat_report_attacker.count() + self.combat_report_defender.count()
+        return get_loaders(info).combat_reports_count.load(self.pk)
 
     def resolve_combat_reports(self, info, **kwargs):
         return (self.combat_report_attacker.all() | self.combat_report_defender.all()).distinct()
 
     def resolve_ships_count(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.score_set.last().military).get('ships', 0)
+        return get_loaders(info).latest_score(self).then(
+            lambda score: (score.military_ships or 0) if score is not None else 0
+        )
+
+    def resolve_latest_score(self, info, **kwargs):
+        return get_loaders(info).latest_score(self)
+
+    def resolve_alliance(self, info, **kwargs):
+        loaders = get_loaders(info)
+        return loaders.related(self, 'alliance', loaders.alliance)
 
     def resolve_activity_prediction(self, info, **kwargs):
-        if 'scores' in self.__dict__:
-            scores = self.scores
-        else:
-            scores = self.score_set.filter(datetime__isnull=False)
-        if not scores:
+        history = ScoreRollups.history(self, HourlyScore, *get_score_range(self))
+        if not history:
             return None
 
-        preds = get_future_activity(scores)
+        preds = get_future_activity(history)
         return OrderedDict({i: list(preds[i].values) for i in preds.columns})
 
     def resolve_planets_count(self, info, **kwargs):
-        planets = CompressedDict.decompress_bytes(self.planets).get('planet', [])
-        if isinstance(planets, dict):
-            return 1
-        return len(planets)
+        return get_loaders(info).player_planets.load(self.pk).then(len)
 
     def resolve_scores(self, info, **kwargs):
         if 'scores' in self.__dict__:
             return self.scores
-        return self.score_set.filter(datetime__isnull=False)
+        return get_loaders(info).player_scores.load(self.pk)
 
     def resolve_score_prediction(self, info, **kwargs):
         today = datetime.now()
         past_datetime_limit = today - timedelta(days=14)
-        scores = self.score_set.filter(
-            datetime__gte=past_datetime_limit,
-            datetime__isnull=False
+        history = ScoreRollups.history(
+            self,
+            HourlyScore,
+            start=past_datetime_limit.astimezone(pytz.timezone('UTC'))
         )
-        if not scores:
+        if not history:
             return
 
-        df, future_dates = get_prediction_df(scores)
+        df, future_dates = get_prediction_df(history)
         prediction = predict_player_future_score(df, future_dates)
 
         last_prediction, _ = PastScorePrediction.objects.get_or_create(player=self)
@@ -243,27 +280,17 @@ class PlayerType(graphene.ObjectType):
         ])
 
     def resolve_alliances_founded(self, info, **kwargs):
-        return Alliance.objects.filter(founder__player_id=self.player_id)
+        return Alliance.objects.filter(founder=self)
 
     def resolve_planets(self, info, **kwargs):
-        data = CompressedDict.decompress_bytes(self.planets).get('planet', [])
-        if not data:
-            return None
-        if isinstance(data, dict):
-            coords = data['coords'].split(':')
-            coords.append(data['name'])
-            return [PlanetType(*coords)]
-        planets = []
-        for planet in data:
-            coords = planet['coords'].split(':')
-            coords.append(planet['name'])
-            planets.append(coords)
-
-        return [PlanetType(*planet) for planet in planets]
+        return get_loaders(info).player_planets.load(self.pk).then(
+            lambda planets: [PlanetType.from_planet(planet) for planet in planets] or None
+        )
 
 
 class AllianceType(graphene.ObjectType):
     ally_id = graphene.Int()
+    server_id = graphene.String()
     name = graphene.String()
     tag = graphene.String()
     founder = graphene.Field(PlayerType)
@@ -299,33 +326,33 @@ class AllianceType(graphene.ObjectType):
         return df.round(2).to_dict()['FREQ']
 
     def resolve_ships_count(self, info, **kwargs):
-        members = self.members.all()
-        ships = [CompressedDict.decompress_bytes(member.score_set.last().military).get('ships', 0)
-                 for member in members]
-        return sum(ships)
+        return get_loaders(info).alliance_ships.load(self.pk).then(lambda ships: ships or 0)
+
+    def resolve_founder(self, info, **kwargs):
+        loaders = get_loaders(info)
+        return loaders.related(self, 'founder', loaders.player)
 
     def resolve_players_count(self, info, **kwargs):
-        return self.members.count()
+        return self.players_count
 
     def resolve_planets_count(self, info, **kwargs):
-        try:
-            planets = literal_eval(self.planets_distribution_coords.decode('utf-8'))
-        except:
-            return 0
-        return len(planets)
+        return self.planets_count
 
     def resolve_members(self, info, **kwargs):
-        return self.members.all()
+        loaders = get_loaders(info)
+        return loaders.prefetched(self, 'members', loaders.alliance_members)
 
     def resolve_planets_distribution_coords(self, info, **kwargs):
-        try:
-            planets = literal_eval(self.planets_distribution_coords.decode('utf-8'))
-        except:
-            return None
-        return [PlanetType(*planet.split(':')) for planet in planets]
+        planets = Planet.objects.filter(player__ally_members=self).select_related('player').defer('player__planets').order_by(
+            'galaxy', 'system', 'position'
+        )
+        return [PlanetType.from_planet(planet) for planet in planets]
 
     def resolve_planets_distribution_by_galaxy(self, info, **kwargs):
-        return CompressedDict.decompress_bytes(self.planets_distribution_by_galaxy)
+        return OrderedDict(
+            (str(galaxy), planets)
+            for galaxy, planets in self.galaxy_distribution.order_by('galaxy').values_list('galaxy', 'planets')
+        )
 
     def resolve_found_date(self, info, **kwargs):
         try:
@@ -345,10 +372,12 @@ class CombatReportType(graphene.ObjectType):
     defender_players = graphene.List(PlayerType)
 
     def resolve_attacker_players(self, info, **kwargs):
-        return self.attacker_players.all()
+        loaders = get_loaders(info)
+        return loaders.prefetched(self, 'attacker_players', loaders.attacker_players)
 
     def resolve_defender_players(self, info, **kwargs):
-        return self.defender_players.all()
+        loaders = get_loaders(info)
+        return loaders.prefetched(self, 'defender_players', loaders.defender_players)
 
     def resolve_attackers_fleet(self, info, **kwargs):
         return CompressedDict.decompress_bytes(self.attackers)
@@ -364,6 +393,10 @@ class FleetRecordType(graphene.ObjectType):
     fleet = DynamicScalar()
     coord = graphene.String()
 
+    def resolve_player(self, info, **kwargs):
+        loaders = get_loaders(info)
+        return loaders.related(self, 'player', loaders.player)
+
     def resolve_fleet(self, info, **kwargs):
         return CompressedDict.decompress_bytes(self.fleet)
 
@@ -374,6 +407,114 @@ class FleetRecordType(graphene.ObjectType):
             print(f'FieldResolverError: Failed to resolve field with error: {str(err)}')
 
 
+class PlayerConnection(CountableConnection):
+    class Meta:
+        node = PlayerType
+
+
+class ScoreConnection(CountableConnection):
+    class Meta:
+        node = ScoreType
+
+
+class CombatReportConnection(CountableConnection):
+    class Meta:
+        node = CombatReportType
+
+
+class FleetRecordConnection(CountableConnection):
+    class Meta:
+        node = FleetRecordType
+
+
+PLAYER_PAGINATION = KeysetPagination(('rank', False), ('pk', False))
+SCORE_PAGINATION = KeysetPagination(('datetime', False), ('pk', False))
+REPORT_PAGINATION = KeysetPagination(('pk', True))
+FLEET_RECORD_PAGINATION = KeysetPagination(('pk', True))
+
+
+def player_filters():
+    return dict(
+        name__in=graphene.List(
+            graphene.String,
+            description='Filter by players full name.'
+        ),
+        status=graphene.String(
+            description='Filter by player status.'
+        ),
+        server_id=graphene.String(
+            description='Filter by player universe server ID.'
+        ),
+        status__in=graphene.List(
+            graphene.String,
+            description='Filter players by possible status'
+        ),
+        rank__gte=graphene.Int(
+            description='Filter player by rank greather equal value'
+        ),
+        rank__lte=graphene.Int(
+            description='Filter player by rank lesser equal value'
+        ),
+        datetime__gte=graphene.DateTime(
+            description='Filter player score collected on greater or equal inputed datetime.'
+        )
+    )
+
+
+def score_filters():
+    return dict(
+        player_id=graphene.Int(
+            description='Filter scores by player ingame ID.'
+        ),
+        server_id=graphene.String(
+            description='Filter scores by player universe server ID.'
+        ),
+        total_rank__lte=graphene.Int(
+            description='Filter scores with total rank lesser or equal inputed rank.'
+        ),
+        total_rank__gte=graphene.Int(
+            description='Filter scores with total rank greater or equal inputed rank.'
+        ),
+        total_score__lte=graphene.Float(
+            description='Filter scores with total score lesser or equal inputed score.'
+        ),
+        total_score__gte=graphene.Float(
+            description='Filter scores with total score greater or equal inputed score.'
+        ),
+        military_rank__lte=graphene.Int(
+            description='Filter scores with military rank lesser or equal inputed rank.'
+        ),
+        military_score__gte=graphene.Float(
+            description='Filter scores with military score greater or equal inputed score.'
+        )
+    )
+
+
+def combat_report_filters():
+    return dict(
+        attacker_players__name__in=graphene.List(
+            graphene.String,
+            description='Filter reports by attackers player name'
+        ),
+        defender_players__name__in=graphene.List(
+            graphene.String,
+            description='Filter reports by defenders player name'
+        ),
+        title__icontains=graphene.String(
+            description='Filter reports by partial title content'
+        ),
+        date__gte=graphene.Date(
+            description='Filter reports from dates greater or equal inputed date'
+        ),
+        date__lte=graphene.Date(
+            description='Filter reports from dates lesser or equal inputed date'
+        ),
+        winner=graphene.String(
+            description='Filter reports by win result: [attackers, defenders, draw]'
+        )
+    )
+
+
 ############################################
 #
 #                 QUERY
@@ -391,6 +532,9 @@ class Query(graphene.ObjectType):
         player_id=graphene.Int(
             description='Filter by player ingame ID.'
         ),
+        server_id=graphene.String(
+            description='Filter by player universe server ID.'
+        ),
         datetime__lte=graphene.DateTime(
             description='Filter player score collected on lesser or equal inputed datetime.'
         ),
@@ -406,127 +550,134 @@ class Query(graphene.ObjectType):
         dt_start = kwargs.pop('datetime__gte', None)
         dt_stop = kwargs.pop('datetime__lte', None)
         try:
-            player = Player.objects.get(**kwargs)
+            player = optimize(Player.objects.all(), info).get(**kwargs)
         except Player.DoesNotExist:
             raise Exception('Player not found')
+        except Player.MultipleObjectsReturned:
+            raise Exception('More than one player found, filter by server ID')
         
         if dt_start is None and dt_stop is None:
             return player
 
-        if dt_start and dt_stop is None:
-            player.scores = player.score_set.filter(
-                datetime__gte=dt_start.astimezone(pytz.timezone('UTC')),
-                datetime__isnull=False
-            )
-            return player
-        
-        if dt_start is None and dt_stop:
-            player.scores = player.score_set.filter(
-                datetime__lte=dt_stop.astimezone(pytz.timezone('UTC')),
-                datetime__isnull=False
-            )
-            return player
-
-        player.scores = player.score_set.filter(
-            datetime__gte=dt_start.astimezone(pytz.timezone('UTC')),
-            datetime__lte=dt_stop.astimezone(pytz.timezone('UTC')),
-            datetime__isnull=False
-        )
+        score_filter = {'datetime__isnull': False}
+        if dt_start:
+            dt_start = dt_start.astimezone(pytz.timezone('UTC'))
+            score_filter['datetime__gte'] = dt_start
+        if dt_stop:
+            dt_stop = dt_stop.astimezone(pytz.timezone('UTC'))
+            score_filter['datetime__lte'] = dt_stop
+        player.scores = player.score_set.filter(**score_filter)
+        player.score_range = (dt_start, dt_stop)
         return player
 
     players = graphene.List(
         PlayerType,
-        name__in=graphene.List(
-            graphene.String,
-            description='Filter by players full name.'
-        ),
-        status=graphene.String(
-            description='Filter by player status.'
-        ),
-        status__in=graphene.List(
-            graphene.String,
-            description='Filter players by possible status'
-        ),
-        rank__gte=graphene.Int(
-            description='Filter player by rank greather equal value'
-        ),
-        rank__lte=graphene.Int(
-            description='Filter player by rank lesser equal value'
-        ),
-        datetime__gte=graphene.DateTime(
-            description='Filter player score collected on greater or equal inputed datetime.'
-        )
+        deprecation_reason='Use playersConnection.',
+        **player_filters()
     )
 
-    def resolve_players(self, info, **kwargs):
+    @staticmethod
+    def filter_players(**kwargs):
         dt_start = kwargs.pop('datetime__gte', None)
         players = Player.objects.filter(**kwargs)
 
         if dt_start is None:
-            return players.order_by('rank')
+            return players
+
+        # players with scores in range, with those scores prefetched
+        dt_start = dt_start.astimezone(pytz.timezone('UTC'))
+        scores = Score.objects.filter(datetime__gte=dt_start, datetime__isnull=False)
+        return players.annotate(
+            has_scores=Exists(scores.filter(player=OuterRef('pk'))),
+            scores_after=Value(dt_start, output_field=DateTimeField())
+        ).filter(has_scores=True).prefetch_related(
+            Prefetch('score_set', queryset=scores.order_by('pk'), to_attr='scores')
+        )
+
+    def resolve_players(self, info, **kwargs):
+        return optimize(Query.filter_players(**kwargs), info).order_by('rank')
 
-        blacklist = []
-        for player in players:
-            player.scores = player.score_set.filter(
-                datetime__gte=dt_start.astimezone(pytz.timezone('UTC')),
-                datetime__isnull=False
-            )
-            if not player.scores.exists():
-                blacklist.append(player.name)
-        players = players.exclude(name__in=blacklist)
+    players_connection = graphene.Field(
+        PlayerConnection,
+        first=graphene.Int(description='Number of players of the page, ordered by rank.'),
+        after=graphene.String(description='Cursor of the player the page starts after.'),
+        **player_filters()
+    )
 
-        return players.order_by('rank')
+    def resolve_players_connection(self, info, first=None, after=None, **kwargs):
+        return PLAYER_PAGINATION.page(PlayerConnection, Query.filter_players(**kwargs), info, first, after)
 
     alliances = graphene.List(
         AllianceType,
         name__icontains=graphene.String(),
-        ally_id=graphene.Int()
+        ally_id=graphene.Int(),
+        server_id=graphene.String()
     )
 
     def resolve_alliances(self, info, **kwargs):
-        return Alliance.objects.filter(**kwargs)
+        return optimize(Alliance.objects.filter(**kwargs), info)
 
     alliance = graphene.Field(
         AllianceType,
         name__icontains=graphene.String(required=True),
-        ally_id=graphene.Int()
+        ally_id=graphene.Int(),
+        server_id=graphene.String()
     )
 
     def resolve_alliance(self, info, **kwargs):
-        return Alliance.objects.get(**kwargs)
-
-    scores = graphene.List(ScoreType)
+        try:
+            return optimize(Alliance.objects.all(), info).get(**kwargs)
+        except Alliance.MultipleObjectsReturned:
+            raise Exception('More than one alliance found, filter by server ID')
+
+    scores = graphene.List(
+        ScoreType,
+        deprecation_reason='Use scoresConnection.',
+        **score_filters()
+    )
 
-    def resolve_scores(self, info, **kwargs):
+    @staticmethod
+    def filter_scores(**kwargs):
+        if 'player_id' in kwargs:
+            kwargs['player__player_id'] = kwargs.pop('player_id')
+        if 'server_id' in kwargs:
+            kwargs['player__server_id'] = kwargs.pop('server_id')
         kwargs['datetime__isnull'] = False
         return Score.objects.filter(**kwargs)
 
+    def resolve_scores(self, info, **kwargs):
+        return optimize(Query.filter_scores(**kwargs), info)
+
+    scores_connection = graphene.Field(
+        ScoreConnection,
+        first=graphene.Int(description='Number of scores of the page, ordered by collection datetime.'),
+        after=graphene.String(description='Cursor of the score the page starts after.'),
+        **score_filters()
+    )
+
+    def resolve_scores_connection(self, info, first=None, after=None, **kwargs):
+        return SCORE_PAGINATION.page(ScoreConnection, Query.filter_scores(**kwargs), info, first, after)
+
     combat_reports = graphene.List(
         CombatReportType,
-        attacker_players__name__in=graphene.List(
-            graphene.String,
-            description='Filter reports by attackers player name'
-        ),
-        defender_players__name__in=graphene.List(
-            graphene.String,
-            description='Filter reports by defenders player name'
-        ),
-        title__icontains=graphene.String(
-            description='Filter reports by partial title content'
-        ),
-        date__gte=graphene.Date(
-            description='Filter reports from dates greater or equal inputed date'
-        ),
-        date__lte=graphene.Date(
-            description='Filter reports from dates lesser or equal inputed date'
-        ),
-        winner=graphene.String(
-            description='Filter reports by win result: [attackers, defenders, draw]'
-        )
+        deprecation_reason='Use combatReportsConnection.',
+        **combat_report_filters()
     )
 
     def resolve_combat_reports(self, info, **kwargs):
-        return CombatReport.objects.filter(**kwargs)
+        return optimize(CombatReport.objects.filter(**kwargs), info)
+
+    combat_reports_connection = graphene.Field(
+        CombatReportConnection,
+        first=graphene.Int(description='Number of reports of the page, newest first.'),
+        after=graphene.String(description='Cursor of the report the page starts after.'),
+        **combat_report_filters()
+    )
+
+    def resolve_combat_reports_connection(self, info, first=None, after=None, **kwargs):
+        return REPORT_PAGINATION.page(
+            CombatReportConnection, CombatReport.objects.filter(**kwargs), info, first, after
+        )
 
     combat_report = graphene.Field(
         CombatReportType,
@@ -554,21 +705,91 @@ class Query(graphene.ObjectType):
     )
 
     def resolve_combat_report(self, info, **kwargs):
-        return CombatReport.objects.get(**kwargs)
+        return optimize(CombatReport.objects.all(), info).get(**kwargs)
 
     universe_fleet_relative_frequency = DynamicScalar()
 
     def resolve_universe_fleet_relative_frequency(self, info, **kwargs):
         result =  universe_fleet_relative_freq(
-            CombatReport.objects.all(),
+            CombatReportFleet.objects.all(),
             FleetRecord.objects.all()
         )
         return result.to_dict()['FREQ']
 
-    fleet_records = graphene.List(FleetRecordType)
+    universe_hour_relative_frequency = graphene.Field(
+        HourRelativeFrequency,
+        datetime__gte=graphene.DateTime(
+            description='Consider scores collected on greater or equal inputed datetime.'
+        ),
+        datetime__lte=graphene.DateTime(
+            description='Consider scores collected on lesser or equal inputed datetime.'
+        )
+    )
+
+    def resolve_universe_hour_relative_frequency(self, info, **kwargs):
+        archive = ScoreArchive()
+        if not archive.enabled:
+            raise Exception('Score archive is not available')
+
+        scores = archive.read(
+            ['player_id', 'datetime', 'total_score'],
+            kwargs.get('datetime__gte'),
+            kwargs.get('datetime__lte')
+        )
+        if scores.empty:
+            return None
+
+        rel_freq = universe_hour_relative_freq(scores, '3600S')
+        return HourRelativeFrequency(
+            hours=rel_freq.index.values,
+            relative_frequency=rel_freq.REL_FREQ.values,
+            high_std=rel_freq.POS_STD.values,
+            low_std=rel_freq.NEG_STD.values
+        )
+
+    fleet_records = graphene.List(
+        FleetRecordType,
+        deprecation_reason='Use fleetRecordsConnection.'
+    )
 
     def resolve_fleet_records(self, info, **kwargs):
-        return FleetRecord.objects.filter(**kwargs)
+        return optimize(FleetRecord.objects.filter(**kwargs), info)
+
+    fleet_records_connection = graphene.Field(
+        FleetRecordConnection,
+        first=graphene.Int(description='Number of fleet records of the page, newest first.'),
+        after=graphene.String(description='Cursor of the fleet record the page starts after.')
+    )
+
+    def resolve_fleet_records_connection(self, info, first=None, after=None, **kwargs):
+        return FLEET_RECORD_PAGINATION.page(FleetRecordConnection, FleetRecord.objects.all(), info, first, after)
+
+    planets = graphene.List(
+        PlanetType,
+        galaxy=graphene.Int(
+            required=True,
+            description='Filter planets by galaxy.'
+        ),
+        solar_system=graphene.Int(
+            description='Filter planets by solar system.'
+        ),
+        position=graphene.Int(
+            description='Filter planets by position in the solar system.'
+        ),
+        server_id=graphene.String(
+            description='Filter planets by universe server ID.'
+        )
+    )
+
+    def resolve_planets(self, info, **kwargs):
+        if 'solar_system' in kwargs:
+            kwargs['system'] = kwargs.pop('solar_system')
+        if 'server_id' in kwargs:
+            kwargs['player__server_id'] = kwargs.pop('server_id')
+        planets = Planet.objects.filter(**kwargs).select_related('player').defer('player__planets').order_by(
+            'galaxy', 'system', 'position'
+        )
+        return [PlanetType.from_planet(planet) for planet in planets]
 
 
 ############################################
@@ -582,6 +803,7 @@ class CreateFleetRecord(graphene.relay.ClientIDMutation):
 
     class Input:
         player_id = graphene.Int(required=True)
+        server_id = graphene.String()
         coord = graphene.String()
         fleet = DynamicScalar(required=True)
         username = graphene.String(required=True)
@@ -593,10 +815,15 @@ class CreateFleetRecord(graphene.relay.ClientIDMutation):
         player_id = kwargs['player_id']
         fleet = kwargs['fleet']
 
+        player_filter = {'player_id': player_id}
+        if kwargs.get('server_id'):
+            player_filter['server_id'] = kwargs['server_id']
         try:
-            player = Player.objects.get(player_id=player_id)
+            player = Player.objects.get(**player_filter)
         except Player.DoesNotExist:
             raise Exception(f'Player with id {player_id} was not found!')
+        except Player.MultipleObjectsReturned:
+            raise Exception(f'More than one player with id {player_id} was found, inform the server ID!')
 
         fleet_eval = FleetHashMap()
         if not fleet_eval.validate_input_keys(fleet.keys()):
@@ -613,6 +840,7 @@ class CreateFleetRecord(graphene.relay.ClientIDMutation):
             recorded_by=user
         )
         record.save()
+        response_cache.invalidate()
 
         return CreateFleetRecord(record)
 
@@ -1,15 +1,15 @@
 from collections import Counter
 import pandas as pd
 import pytz
+from django.db.models import Sum
 from ogame.types import CompressedDict
 from ogame.util import fleet_mapping
 
 
-def weekday_relative_freq(scores):
+def weekday_relative_freq(history):
     data = []
-    for score in scores:
-        dt = score.datetime.astimezone(pytz.timezone('America/Sao_Paulo')).date()
-        total = CompressedDict.decompress_bytes(score.total)['score']
+    for dt, total in history:
+        dt = dt.astimezone(pytz.timezone('America/Sao_Paulo')).date()
         data.append([dt, total])
 
     # set up dataframe
@@ -47,11 +47,10 @@ def weekday_relative_freq(scores):
     return df.fillna(0)
 
 
-def hour_relative_freq(scores, period):
+def hour_relative_freq(history, period):
     data = []
-    for score in scores:
-        dt = score.datetime.astimezone(pytz.timezone('America/Sao_Paulo'))
-        total = CompressedDict.decompress_bytes(score.total)['score']
+    for dt, total in history:
+        dt = dt.astimezone(pytz.timezone('America/Sao_Paulo'))
         data.append([dt, total])
 
     # set up dataframe
@@ -85,112 +84,46 @@ def hour_relative_freq(scores, period):
     return df.fillna(0)
 
 
-def fleet_relative_freq(player):
-    ship2int, int2ship = fleet_mapping()
-    attack_instance = player.combat_report_attacker.all()
-    defense_instance = player.combat_report_defender.all()
-    fleet_records = player.player_fleet_record.all()
-
-    fleet = {}
-    for report in attack_instance:
-        data = CompressedDict.decompress_bytes(report.attackers)
-        for attacker in data:
-            if player.name in attacker:
-                for ship, number in data[attacker]['ships'].items():
-                    try:
-                        ship_key = ship2int[ship]
-                    except KeyError:
-                        continue
-                    if ship_key not in fleet:
-                        fleet[ship_key] = number
-                    else:
-                        fleet[ship_key] += number
-                break
-
-    for report in defense_instance:
-        data = CompressedDict.decompress_bytes(report.defenders)
-        for defender in data:
-            if player.name in defender:
-                for ship, number in data[defender]['ships'].items():
-                    try:
-                        ship_key = ship2int[ship]
-                    except KeyError:
-                        continue
-                    if ship_key not in fleet:
-                        fleet[ship_key] = number
-                    else:
-                        fleet[ship_key] += number
-                break
-
-    for record in fleet_records:
-        data = CompressedDict.decompress_bytes(record.fleet)
-        for ship, number in data.items():
-            try:
-                ship_key = ship2int[ship]
-            except KeyError:
-                continue
-            if ship_key not in fleet:
-                fleet[ship_key] = number
-            else:
-                fleet[ship_key] += number
-
-    # Fill non existent ships with zero percentage
-    for i in int2ship.keys():
-        if i not in fleet:
-            fleet[i] = 0
+def universe_hour_relative_freq(scores, period):
+    """
+    Hour relative frequency of the score growth of all players, from a
+    frame of archived scores with player_id, datetime and total_score columns.
+    """
+    df = scores.sort_values(['player_id', 'datetime'])
+    # score difference of each player between consecutive collections
+    df['DIFF'] = df.groupby('player_id').total_score.diff().fillna(0)
+    df['HOUR'] = df['datetime'].dt.tz_convert('America/Sao_Paulo').dt.round(period).dt.strftime('%H:'+'%M')
+    df = df[['DIFF', 'HOUR']].groupby('HOUR').agg(DIFF=('DIFF', 'sum'), F=('DIFF', 'size'))
+    df['F'] = df.F / df.F.sum()
+    # calculate the relative frequency
+    df['REL_FREQ'] = df['DIFF'] / df.DIFF.sum()
 
-    data = []
-    total_ships = sum(fleet.values())
-    # avoid zero division error
-    if total_ships == 0:
-        total_ships = 1
+    # caulcutae positive and negative deviations
+    df['POS_STD'] = df[['REL_FREQ', 'F']].T.var() + (df.REL_FREQ + df[['REL_FREQ', 'F']].T.std())
+    df['NEG_STD'] = df[['REL_FREQ', 'F']].T.var() + (df.REL_FREQ - df[['REL_FREQ', 'F']].T.std())
+    df[['REL_FREQ', 'POS_STD', 'NEG_STD']] = df[['REL_FREQ', 'POS_STD', 'NEG_STD']].clip(0)
 
-    for int_ship, number in fleet.items():
-        data.append([int2ship[int_ship], (number/total_ships) * 100])
-    df = pd.DataFrame(data, columns=['SHIP', 'FREQ']).round(2)
-    return df.set_index('SHIP').sort_index()
+    # transform to percentual and show only two decimals
+    df[['REL_FREQ', 'POS_STD', 'NEG_STD']] = (df[['REL_FREQ', 'POS_STD', 'NEG_STD']] * 100).round(2)
 
+    return df.fillna(0)
 
-def universe_fleet_relative_freq(reports, fleet_records):
-    ship2int, int2ship = fleet_mapping()
-
-    fleet = {}
-    for report in reports:
-        data = CompressedDict.decompress_bytes(report.attackers)
-        for attacker in data:
-            for ship, number in data[attacker]['ships'].items():
-                try:
-                    ship_key = ship2int[ship]
-                except KeyError:
-                    continue
-                if ship_key not in fleet:
-                    fleet[ship_key] = number
-                else:
-                    fleet[ship_key] += number
-
-        data = CompressedDict.decompress_bytes(report.defenders)
-        for defender in data:
-            for ship, number in data[defender]['ships'].items():
-                try:
-                    ship_key = ship2int[ship]
-                except KeyError:
-                    continue
-                if ship_key not in fleet:
-                    fleet[ship_key] = number
-                else:
-                    fleet[ship_key] += number
 
+def fleet_record_units(fleet_records):
+    ship2int, _ = fleet_mapping()
+    fleet = Counter()
     for record in fleet_records:
         data = CompressedDict.decompress_bytes(record.fleet)
         for ship, number in data.items():
             try:
-                ship_key = ship2int[ship]
+                fleet[ship2int[ship]] += number
             except KeyError:
                 continue
-            if ship_key not in fleet:
-                fleet[ship_key] = number
-            else:
-                fleet[ship_key] += number
+    return fleet
+
+
+def fleet_frequency(fleet):
+    _, int2ship = fleet_mapping()
 
     # Fill non existent ships with zero percentage
     for i in int2ship.keys():
@@ -207,3 +140,20 @@ def universe_fleet_relative_freq(reports, fleet_records):
         data.append([int2ship[int_ship], (number/total_ships) * 100])
     df = pd.DataFrame(data, columns=['SHIP', 'FREQ']).round(2)
     return df.set_index('SHIP').sort_index()
+
+
+def fleet_relative_freq(player):
+    # ships of the player combat reports, summed by the database
+    fleet = Counter(dict(
+        player.combat_report_fleet.values_list('unit').annotate(total=Sum('count')).order_by()
+    ))
+    fleet.update(fleet_record_units(player.player_fleet_record.all()))
+    return fleet_frequency(fleet)
+
+
+def universe_fleet_relative_freq(report_fleet, fleet_records):
+    fleet = Counter(dict(
+        report_fleet.values_list('unit').annotate(total=Sum('count')).order_by()
+    ))
+    fleet.update(fleet_record_units(fleet_records))
+    return fleet_frequency(fleet)
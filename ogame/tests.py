@@ -1,3 +1,1124 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from io import StringIO
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+from xml.parsers.expat import ExpatError
+import pytz
+import pandas as pd
+import json
+import requests
+from bs4 import BeautifulSoup
+from promise import Promise
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from graphql import parse
+from graphql.language import ast
+from ogame.fetchers import PlayerDataFetcher, ForumFetcher
+from ogame.cache import GraphQLResponseCache, response_cache
+from ogame.crawlers import OgameForumCrawler, OgameStatsCrawler, ForumReportText
+from ogame.documents import document_backend, persisted_queries, query_hash
+from ogame.ingest import PlayerScoreIngest, PlayerNameIndex
+from ogame.loaders import Loaders, RelationLoader
+from ogame.management.commands.benchmark_highscore_index import SyntheticHighScores, legacy_lookup
+from ogame.management.commands.benchmark_report_parser import FIXTURES_DIR, LegacyReportParser
+from ogame.optimizer import optimize
+from invictus.schema import schema
+from ogame.models import (Player, Planet, Score, HourlyScore, DailyScore, Alliance, AllianceGalaxy, CombatReport,
+                          CombatReportFleet, CrawlRun, PersistedQuery)
+from ogame.archive import ScoreArchive
+from ogame.rollups import ScoreRollups
+from ogame.scheduler import CrawlScheduler
+from ogame.statistics import hour_relative_freq
+from ogame.types import CompressedDict
 
-# Create your tests here.
+
+def player_record(player_id, name, timestamp=1600000000, total=1000.0, server_id='144'):
+    """
+    Player record as built by `OgameStatsCrawler.get_player_record`.
+    """
+    return {
+        'player_id': player_id,
+        'server_id': server_id,
+        'name': name,
+        'status': None,
+        'planets': CompressedDict({}).bit_string,
+        'planet_rows': {},
+        'alliance': None,
+        'timestamp': timestamp,
+        'datetime': datetime.fromtimestamp(timestamp, pytz.utc),
+        'rank': 1,
+        'scores': {'total_score': total, 'total_rank': 1},
+    }
+
+
+class HighscoreIndexTestCase(TestCase):
+    def test_matches_per_player_lookups(self):
+        highscores = SyntheticHighScores(50, seed=1)
+        highscores.economy.loc[3, 'score'] = float('nan')
+        highscores.military.loc[5, 'ships'] = None
+        # a player missing from a category has no scores
+        missing = highscores.honor.id[7]
+        highscores.honor = highscores.honor.drop(7)
+        # a player listed twice keeps its first row
+        highscores.total = pd.concat([highscores.total, highscores.total.iloc[[2]].assign(score=1.0)])
+
+        index = OgameStatsCrawler.get_highscore_index(highscores)
+
+        self.assertNotIn(missing, index)
+        self.assertEqual(len(index), 49)
+        for player_id in highscores.ids:
+            if player_id != missing:
+                self.assertEqual(index[player_id], legacy_lookup(highscores, player_id))
+
+
+class PlayerScoreIngestTestCase(TestCase):
+    def test_write_players_and_scores(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.add(player_record(2, 'two'))
+        ingest.flush()
+
+        self.assertEqual(set(Player.objects.values_list('name', flat=True)), {'one', 'two'})
+        self.assertEqual(Score.objects.count(), 2)
+        self.assertEqual(len(ingest.written), 2)
+        for player in Player.objects.all():
+            self.assertEqual(player.latest_score.player_id, player.pk)
+
+    def test_failed_chunk_written_one_by_one(self):
+        ingest = PlayerScoreIngest(chunk_size=10)
+        ingest.add(player_record(1, 'one'))
+        # null names break the chunk insert
+        ingest.add(player_record(2, None))
+        ingest.add(player_record(3, 'three'))
+        ingest.flush()
+
+        self.assertEqual(set(Player.objects.values_list('name', flat=True)), {'one', 'three'})
+        self.assertEqual(
+            set(Score.objects.values_list('player__player_id', flat=True)),
+            {1, 3}
+        )
+        self.assertEqual([record['player_id'] for _, record in ingest.written], [1, 3])
+
+    def test_player_listed_twice_created_once(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.add(player_record(1, 'one', timestamp=1600003600))
+        ingest.flush()
+
+        self.assertEqual(Player.objects.count(), 1)
+        self.assertEqual(Score.objects.count(), 2)
+
+    def test_unchanged_players_skipped(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.flush()
+        player = Player.objects.get()
+        self.assertIsNotNone(player.fingerprint)
+
+        # same player content on the next cycle, only the new score is written
+        Player.objects.update(status='x')
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one', timestamp=1600003600, total=1100.0))
+        ingest.flush()
+        player = Player.objects.get()
+        self.assertEqual(player.status, 'x')
+        self.assertEqual(player.latest_score.total_score, 1100.0)
+
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'renamed', timestamp=1600007200))
+        ingest.flush()
+        player = Player.objects.get()
+        self.assertEqual((player.name, player.status), ('renamed', None))
+        self.assertEqual(Score.objects.count(), 3)
+
+    def test_planets_diff(self):
+        def record(timestamp, *planets):
+            data = {'planet': [
+                dict(id=planet_id, name=name, coords=coords, **({'moon': {'name': moon}} if moon else {}))
+                for planet_id, name, coords, moon in planets
+            ]}
+            return dict(
+                player_record(1, 'one', timestamp=timestamp),
+                planets=CompressedDict(data).bit_string,
+                planet_rows=OgameStatsCrawler.get_planet_rows(data)
+            )
+
+        def planets():
+            return {
+                planet.planet_id: (planet.pk, planet.name, planet.galaxy, planet.system, planet.position, planet.moon)
+                for planet in Planet.objects.all()
+            }
+
+        home = ('1', 'home', '1:2:3', None)
+        ingest = PlayerScoreIngest()
+        ingest.add(record(1600000000, home, ('2', 'colony', '4:5:6', None), ('3', 'old', '7:8:9', None)))
+        ingest.flush()
+        first = planets()
+        self.assertEqual(first[1][1:], ('home', 1, 2, 3, None))
+
+        changed = (home, ('2', 'colony', '4:5:7', 'moon'), ('4', 'new', '9:9:9', None))
+        ingest = PlayerScoreIngest()
+        ingest.add(record(1600003600, *changed))
+        ingest.flush()
+        second = planets()
+        self.assertEqual(set(second), {1, 2, 4})
+        # unchanged and moved planets keep their rows
+        self.assertEqual(second[1], first[1])
+        self.assertEqual(second[2], (first[2][0], 'colony', 4, 5, 7, 'moon'))
+        self.assertEqual(second[4][1:], ('new', 9, 9, 9, None))
+
+        # rows are only diffed when the planets of the player changed
+        Planet.objects.filter(planet_id=1).update(name='edited')
+        ingest = PlayerScoreIngest()
+        ingest.add(dict(record(1600007200, *changed), name='renamed'))
+        ingest.flush()
+        self.assertEqual(planets()[1][1], 'edited')
+
+        ingest = PlayerScoreIngest()
+        ingest.add(record(1600010800))
+        ingest.flush()
+        self.assertEqual(planets(), {})
+
+
+class PlayerNameIndexTestCase(TestCase):
+    @override_settings(OGAME_UNIVERSES=[('br', 144), ('br', 150), ('en', 1)])
+    def test_community_servers_only(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'same', server_id='144'))
+        ingest.add(player_record(2, 'same', server_id='1'))
+        ingest.add(player_record(3, 'other', server_id='150'))
+        ingest.flush()
+
+        name_index = PlayerNameIndex(OgameForumCrawler.get_server_ids('br'))
+        players = name_index.lookup(['same', 'other'])
+
+        self.assertEqual(OgameForumCrawler.get_server_ids('br'), ['144', '150'])
+        self.assertEqual(players['same'], {Player.objects.get(player_id=1).pk})
+        self.assertEqual(players['other'], {Player.objects.get(player_id=3).pk})
+        self.assertEqual(len(PlayerNameIndex().lookup(['same'])['same']), 2)
+
+
+class CombatReportFleetTestCase(TestCase):
+    def test_backfill_legacy_reports(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.flush()
+        # participants stored as plain JSON before the codec version header
+        report = CombatReport.objects.create(
+            title='report',
+            url='https://forum.test/report',
+            winner='draw',
+            attackers=json.dumps({'one [TAG]': {'ships': {'Cruzador': 10, 'EDM': 2}}}).encode('utf-8'),
+            defenders=json.dumps({'unknown': {'ships': {'Reciclador': 5}, 'defenses': {}}}).encode('utf-8')
+        )
+
+        self.assertEqual(OgameForumCrawler.backfill_report_fleet(CombatReport.objects.all(), PlayerNameIndex()), (1, 3))
+        self.assertEqual(
+            set(report.fleet.values_list('side', 'player__player_id', 'unit', 'count')),
+            {('attackers', 1, 3, 10), ('attackers', 1, 7, 2), ('defenders', None, 14, 5)}
+        )
+        # reports with fleet rows are skipped
+        self.assertEqual(OgameForumCrawler.backfill_report_fleet(CombatReport.objects.all(), PlayerNameIndex()), (0, 0))
+
+
+def alliance_rows(*rows):
+    """
+    Alliances frame shaped like the ogame_stats universe alliances one.
+    """
+    return pd.DataFrame(
+        [[str(value) if value is not None else None for value in row] for row in rows],
+        columns=['id', 'name', 'tag', 'founder', 'foundDate', 'open', 'logo', 'homepage']
+    )
+
+
+class AllianceUpdateTestCase(TestCase):
+    def setUp(self):
+        ingest = PlayerScoreIngest()
+        for player_id in (1, 2, 3):
+            ingest.add(player_record(player_id, f'player{player_id}'))
+        ingest.add(player_record(1, 'other server', server_id='150'))
+        ingest.flush()
+        self.written = ingest.written
+
+    def test_alliances_upserted(self):
+        Alliance.objects.create(ally_id=10, server_id='144', name='old name', tag='OLD')
+        Alliance.objects.create(ally_id=10, server_id='150', name='other server', tag='OTHER')
+
+        alliance_map = OgameStatsCrawler.update_alliances(alliance_rows(
+            (10, 'first', 'FST', 1, 1600000000, 1, None, None),
+            (10, 'first listed twice', 'FST', 1, 1600000000, 1, None, None),
+            (20, 'second', 'SND', 99, 1600000000, '', 'logo.png', 'https://second.test'),
+            ('bad id', 'broken', 'BRK', 1, 1600000000, 1, None, None),
+        ), 144)
+
+        self.assertEqual(set(alliance_map), {10, 20})
+        self.assertEqual(Alliance.objects.filter(server_id='144').count(), 2)
+        first, second = alliance_map[10], alliance_map[20]
+        self.assertEqual((first.name, first.tag, first.application_open), ('first', 'FST', True))
+        self.assertEqual(first.founder, Player.objects.get(player_id=1, server_id='144'))
+        # founders not stored yet and invalid application flags are left empty
+        self.assertEqual((second.founder, second.application_open, second.logo), (None, None, 'logo.png'))
+        self.assertEqual(Alliance.objects.get(server_id='150').name, 'other server')
+
+    def test_player_alliances(self):
+        alliance_map = OgameStatsCrawler.update_alliances(alliance_rows(
+            (10, 'first', 'FST', 1, 1600000000, 1, None, None),
+        ), 144)
+        Player.objects.filter(player_id__in=(2, 3), server_id='144').update(alliance=alliance_map[10])
+        references = {
+            1: {'id': '10', 'name': 'first'},
+            2: {'id': '30', 'name': 'not listed'},
+            3: None,
+        }
+        written = []
+        for player, record in self.written:
+            if player.server_id == '144':
+                player.refresh_from_db()
+                written.append((player, dict(record, alliance=references[player.player_id])))
+
+        OgameStatsCrawler.update_player_alliances(written, alliance_map)
+
+        alliances = dict(Player.objects.filter(server_id='144').values_list('player_id', 'alliance__ally_id'))
+        # alliances missing from the universe data keep the current one
+        self.assertEqual(alliances, {1: 10, 2: 10, 3: None})
+
+
+class DeletedPlayersTestCase(TestCase):
+    def test_deleted_and_returned_players(self):
+        ingest = PlayerScoreIngest()
+        for player_id in (1, 2, 3, 4):
+            ingest.add(player_record(player_id, f'player{player_id}'))
+        ingest.add(player_record(2, 'other server', server_id='150'))
+        ingest.flush()
+        Player.objects.filter(player_id=3, server_id='144').update(status='del')
+        Player.objects.filter(player_id=4, server_id='144').update(status='del')
+
+        universe_players = pd.DataFrame({'id': ['1', '3', '4'], 'status': [None, 'v', None]})
+        OgameStatsCrawler.update_deleted_players(universe_players, 144)
+
+        self.assertEqual(
+            dict(Player.objects.filter(server_id='144').values_list('player_id', 'status')),
+            {1: None, 2: 'del', 3: 'v', 4: None}
+        )
+        self.assertIsNone(Player.objects.get(server_id='150').status)
+
+
+class AllianceDataTestCase(TestCase):
+    def setUp(self):
+        ingest = PlayerScoreIngest()
+        for player_id, galaxies in ((1, (1, 1, 3)), (2, (3,)), (3, (2,))):
+            record = player_record(player_id, f'player{player_id}')
+            record['planet_rows'] = {
+                player_id * 10 + index: (f'planet{index}', galaxy, 1, index + 1, None)
+                for index, galaxy in enumerate(galaxies)
+            }
+            record['planets'] = CompressedDict(record['planet_rows']).bit_string
+            ingest.add(record)
+        ingest.flush()
+        self.alliance = Alliance.objects.create(ally_id=1, server_id='144', name='alliance', tag='ALLY')
+        AllianceGalaxy.objects.create(alliance=self.alliance, galaxy=10, planets=5)
+
+    def get_galaxies(self):
+        return dict(self.alliance.galaxy_distribution.values_list('galaxy', 'planets'))
+
+    def test_galaxy_rows(self):
+        # members by the ingame ids of the universe data
+        universe = SimpleNamespace(get_players_of_alliance=lambda tag: pd.DataFrame({'id': ['1', '2']}))
+        OgameStatsCrawler.update_ally_data(self.alliance, universe)
+
+        expected = {galaxy: 0 for galaxy in range(1, 10)}
+        expected.update({1: 2, 3: 2})
+        self.assertEqual(self.get_galaxies(), expected)
+        self.alliance.refresh_from_db()
+        self.assertEqual((self.alliance.players_count, self.alliance.planets_count), (2, 4))
+
+        Planet.objects.filter(planet_id=12).update(galaxy=9)
+        universe = SimpleNamespace(get_players_of_alliance=lambda tag: pd.DataFrame({'id': ['1', '3']}))
+        OgameStatsCrawler.update_ally_data(self.alliance, universe)
+
+        expected.update({1: 2, 2: 1, 3: 0, 9: 1})
+        self.assertEqual(self.get_galaxies(), expected)
+        self.alliance.refresh_from_db()
+        self.assertEqual((self.alliance.players_count, self.alliance.planets_count), (2, 4))
+
+
+class ReportParserTestCase(TestCase):
+    def setUp(self):
+        self.reports = {}
+        for filename in sorted(os.listdir(FIXTURES_DIR)):
+            with open(os.path.join(FIXTURES_DIR, filename), 'rb') as report_file:
+                thread_html = BeautifulSoup(report_file.read(), 'html.parser')
+            self.reports[filename] = thread_html.find(class_='messageText').findAll('p')
+
+    def test_legacy_parser_output(self):
+        for filename, message_text in self.reports.items():
+            with self.subTest(report=filename):
+                self.assertEqual(
+                    OgameForumCrawler.get_report_combat_data(message_text),
+                    LegacyReportParser.get_report_combat_data(message_text)
+                )
+
+    def test_report_data(self):
+        winners = {
+            filename: OgameForumCrawler.get_report_combat_data(message_text)['winner']
+            for filename, message_text in self.reports.items()
+        }
+        self.assertEqual(winners, {
+            'attackers_win.html': 'attackers',
+            'defender_only_defenses.html': 'defenders',
+            'defenders_win_acs.html': 'defenders',
+            'draw_english_names.html': 'draw',
+            'no_result_line.html': None,
+            'noise_and_stray_lines.html': 'attackers',
+        })
+        report = OgameForumCrawler.get_report_combat_data(self.reports['defenders_win_acs.html'])
+        self.assertEqual(report['date'], '2022-03-10')
+        self.assertEqual(list(report['attackers']), ['Zeta Reticuli [ALFA]', 'Bellatrix [ALFA]'])
+        self.assertEqual(report['defenders']['Sirius [BETA]'], {'ships': {'Ceifeira': 60, 'Cruzador': 410}, 'defenses': {}})
+
+    def test_line_precedence(self):
+        self.assertEqual(ForumReportText.classify('Cruzador destruído: perdeu 10'), ('noise', 'perdeu'))
+        self.assertEqual(ForumReportText.classify('Atacante Cruzador [TAG]'), ('attacker', 'Atacante'))
+        self.assertEqual(ForumReportText.classify('Nave de Batalha 1.005'), ('ship', 'Nave de Batalha'))
+        self.assertEqual(ForumReportText.classify('nothing to see'), (None, None))
+
+
+class SaveReportsTestCase(TestCase):
+    def setUp(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'Kronos'))
+        ingest.add(player_record(2, 'Arkanon'))
+        ingest.add(player_record(3, 'Orion'))
+        ingest.add(player_record(4, 'Orion', server_id='150'))
+        ingest.flush()
+        self.players = {player.player_id: player for player in Player.objects.all()}
+        self.reports = [
+            (filename, f'https://forum.test/{filename}', OgameForumCrawler.parse_report(fixture_report(filename)))
+            for filename in ('attackers_win.html', 'defenders_win_acs.html')
+        ]
+
+    def test_report_links(self):
+        OgameForumCrawler.save_reports(self.reports, PlayerNameIndex())
+
+        first = CombatReport.objects.get(url='https://forum.test/attackers_win.html')
+        second = CombatReport.objects.get(url='https://forum.test/defenders_win_acs.html')
+        self.assertEqual((str(first.date), first.winner), ('2022-12-09', 'attackers'))
+        self.assertEqual(list(first.attacker_players.all()), [self.players[1]])
+        self.assertEqual(list(first.defender_players.all()), [self.players[2]])
+        # names of several players are linked to all of them, their fleet rows to none
+        self.assertEqual(set(second.defender_players.all()), {self.players[3], self.players[4]})
+        self.assertEqual(set(second.fleet.filter(side='defenders').values_list('player', flat=True)), {None})
+        self.assertEqual(
+            CompressedDict.decode(first.attackers),
+            self.reports[0][2]['attackers']
+        )
+
+    def test_community_players_only(self):
+        with override_settings(OGAME_UNIVERSES=[('br', 144)]):
+            name_index = PlayerNameIndex(OgameForumCrawler.get_server_ids())
+        OgameForumCrawler.save_reports(self.reports[1:], name_index)
+
+        report = CombatReport.objects.get()
+        self.assertEqual(list(report.defender_players.all()), [self.players[3]])
+        self.assertEqual(
+            set(report.fleet.filter(side='defenders').values_list('player', flat=True)),
+            {self.players[3].pk, None}
+        )
+
+    def test_duplicate_urls(self):
+        name_index = PlayerNameIndex()
+        OgameForumCrawler.save_reports(self.reports + self.reports[:1], name_index)
+        counts = (
+            CombatReport.objects.count(),
+            CombatReport.attacker_players.through.objects.count(),
+            CombatReport.defender_players.through.objects.count(),
+            CombatReportFleet.objects.count(),
+        )
+
+        # a report saved again, or meanwhile by another crawl, is left as it is
+        OgameForumCrawler.save_reports(self.reports, name_index)
+        self.assertEqual(counts[0], 2)
+        self.assertEqual(
+            (
+                CombatReport.objects.count(),
+                CombatReport.attacker_players.through.objects.count(),
+                CombatReport.defender_players.through.objects.count(),
+                CombatReportFleet.objects.count(),
+            ),
+            counts
+        )
+
+    def test_unparsed_report_saved_blank(self):
+        OgameForumCrawler.save_reports([('broken', 'https://forum.test/broken', None)], PlayerNameIndex())
+
+        report = CombatReport.objects.get()
+        self.assertEqual((report.title, report.attackers, report.winner), ('broken', None, None))
+        self.assertFalse(report.fleet.exists())
+
+
+class CrawlSchedulerTestCase(TestCase):
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        settings_override = override_settings(CRAWL_LOCK_DIR=lock_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_run_status(self):
+        run = CrawlScheduler('job', lambda: None, interval=60).run_once()
+        self.assertEqual((run.job, run.status, run.error), ('job', CrawlRun.SUCCESS, None))
+        self.assertIsNotNone(run.finished_at)
+        self.assertGreaterEqual(run.duration, 0)
+
+        def fail():
+            raise ValueError('universe unavailable')
+
+        run = CrawlScheduler('job', fail, interval=60).run_once()
+        self.assertEqual((run.status, run.error), (CrawlRun.FAILED, 'universe unavailable'))
+        self.assertEqual(CrawlRun.objects.filter(status=CrawlRun.RUNNING).count(), 0)
+
+    def test_skipped_while_locked(self):
+        job = mock.Mock()
+        scheduler = CrawlScheduler('job', job, interval=60)
+        with scheduler.lock() as acquired:
+            self.assertTrue(acquired)
+            run = CrawlScheduler('job', job, interval=60).run_once()
+            # other jobs have their own lock
+            other = CrawlScheduler('other', job, interval=60).run_once()
+
+        self.assertEqual(run.status, CrawlRun.SKIPPED)
+        self.assertEqual(other.status, CrawlRun.SUCCESS)
+        job.assert_called_once_with()
+        self.assertEqual(scheduler.run_once().status, CrawlRun.SUCCESS)
+
+    def test_fixed_rate_slots(self):
+        scheduler = CrawlScheduler('job', lambda: None, interval=100, jitter=10)
+        delays = []
+
+        def sleep(seconds):
+            delays.append(seconds)
+            if len(delays) == 3:
+                raise KeyboardInterrupt
+
+        # runs ending 30s, 250s and 301s after the first start
+        with mock.patch.object(scheduler, 'run_once'), \
+                mock.patch('ogame.scheduler.time', side_effect=[1000, 1030, 1250, 1301]), \
+                mock.patch('ogame.scheduler.uniform', return_value=4) as uniform, \
+                mock.patch('ogame.scheduler.sleep', side_effect=sleep):
+            with self.assertRaises(KeyboardInterrupt):
+                scheduler.run()
+
+        # the slot at 1200 is missed by the long second run and skipped
+        self.assertEqual(delays, [74, 54, 103])
+        uniform.assert_called_with(0, 10)
+
+
+class StubResponse:
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+
+PLAYER_DATA = b'<playerData id="1" serverId="144"><name>one</name></playerData>'
+
+
+class PlayerDataFetcherTestCase(TestCase):
+    def get_player_data(self, responses, **kwargs):
+        fetcher = PlayerDataFetcher(144, 'br', api_url='http://api.test', **kwargs)
+        with mock.patch.object(fetcher.session, 'get', side_effect=responses) as get, \
+                mock.patch('ogame.fetchers.sleep') as sleep:
+            try:
+                return fetcher.get_player_data(1), get.call_count, [call[0][0] for call in sleep.call_args_list]
+            except Exception as err:
+                return err, get.call_count, [call[0][0] for call in sleep.call_args_list]
+
+    def test_retry_with_backoff(self):
+        data, calls, delays = self.get_player_data([
+            requests.ConnectionError(),
+            StubResponse(503),
+            requests.Timeout(),
+            StubResponse(content=PLAYER_DATA),
+        ], backoff=0.5)
+
+        self.assertEqual(data['playerData']['name'], 'one')
+        self.assertEqual(calls, 4)
+        self.assertEqual(delays, [0.5, 1.0, 2.0])
+
+    def test_give_up_after_retries(self):
+        error, calls, delays = self.get_player_data([requests.Timeout()] * 3, retries=2)
+
+        self.assertIsInstance(error, requests.Timeout)
+        self.assertEqual(calls, 3)
+        self.assertEqual(len(delays), 2)
+
+    def test_malformed_documents_not_retried(self):
+        error, calls, delays = self.get_player_data([StubResponse(content=b'<playerData')])
+
+        self.assertIsInstance(error, ExpatError)
+        self.assertEqual(calls, 1)
+        self.assertEqual(delays, [])
+
+    def test_client_errors_not_retried(self):
+        error, calls, delays = self.get_player_data([StubResponse(404)])
+
+        self.assertIsInstance(error, requests.HTTPError)
+        self.assertEqual(calls, 1)
+        self.assertEqual(delays, [])
+
+
+def fixture_report(filename):
+    with open(os.path.join(FIXTURES_DIR, filename), 'rb') as report_file:
+        return report_file.read()
+
+
+class StubForum:
+    """
+    Forum answering the thread list pages with ETag validators and the
+    thread pages with fixture reports, recording the requests made.
+    """
+    THREADS = {
+        'https://forum.test/thread/1': 'attackers_win.html',
+        'https://forum.test/thread/2': 'defenders_win_acs.html',
+    }
+
+    def __init__(self):
+        self.requests = []
+        self.failing = set()
+
+    def get(self, url, headers=None, timeout=None):
+        headers = headers or {}
+        self.requests.append((url, headers.get('If-None-Match')))
+        if url in self.failing:
+            raise requests.ConnectionError()
+        if url in self.THREADS:
+            return StubResponse(content=fixture_report(self.THREADS[url]))
+        if 'pageNo=1' not in url:
+            return StubResponse(content=b'<html></html>')
+        if headers.get('If-None-Match') == '"page-1"':
+            return StubResponse(304)
+        links = ''.join(f'<a class="messageGroupLink" href="{url}">{url}</a>' for url in self.THREADS)
+        return StubResponse(content=links.encode('utf-8'), headers={'ETag': '"page-1"'})
+
+
+class ForumCrawlTestCase(TestCase):
+    def crawl(self, forum):
+        fetcher = ForumFetcher(workers=2)
+        fetcher.session.get = forum.get
+        return fetcher
+
+    def test_not_modified_pages(self):
+        forum = StubForum()
+        fetcher = self.crawl(forum)
+
+        self.assertIsNotNone(fetcher.get(OgameForumCrawler.FORUM_URL))
+        # validators are only sent once the page is committed
+        self.assertIsNotNone(fetcher.get(OgameForumCrawler.FORUM_URL))
+        fetcher.commit(OgameForumCrawler.FORUM_URL)
+        self.assertIsNone(fetcher.get(OgameForumCrawler.FORUM_URL))
+        self.assertIsNotNone(fetcher.get(OgameForumCrawler.FORUM_URL, conditional=False))
+        self.assertEqual(
+            [etag for _, etag in forum.requests],
+            [None, None, '"page-1"', None]
+        )
+
+    def test_validators_committed_after_save(self):
+        forum = StubForum()
+        forum.failing.add('https://forum.test/thread/2')
+        fetcher = self.crawl(forum)
+
+        OgameForumCrawler.crawl(fetcher)
+        self.assertEqual(list(CombatReport.objects.values_list('url', flat=True)), ['https://forum.test/thread/1'])
+        self.assertNotIn(OgameForumCrawler.FORUM_URL, fetcher.validators)
+
+        # the page with a failed thread is downloaded again
+        forum.failing.clear()
+        forum.requests.clear()
+        OgameForumCrawler.crawl(fetcher)
+        self.assertEqual(forum.requests[0], (OgameForumCrawler.FORUM_URL, None))
+        self.assertIn(('https://forum.test/thread/2', None), forum.requests)
+        self.assertNotIn(('https://forum.test/thread/1', None), forum.requests)
+        self.assertEqual(CombatReport.objects.count(), 2)
+        self.assertEqual(fetcher.validators[OgameForumCrawler.FORUM_URL], ('"page-1"', None))
+
+        forum.requests.clear()
+        OgameForumCrawler.crawl(fetcher)
+        self.assertEqual(forum.requests, [(OgameForumCrawler.FORUM_URL, '"page-1"')])
+
+    def test_validators_not_committed_on_failed_save(self):
+        forum = StubForum()
+        fetcher = self.crawl(forum)
+
+        with mock.patch.object(OgameForumCrawler, 'save_reports', side_effect=Exception('database down')):
+            OgameForumCrawler.crawl(fetcher)
+
+        self.assertNotIn(OgameForumCrawler.FORUM_URL, fetcher.validators)
+        self.assertEqual(CombatReport.objects.count(), 0)
+
+
+class ScoreColumnsMigrationTestCase(TransactionTestCase):
+    migrate_from = [('ogame', '0017_crawlrun')]
+    migrate_to = [('ogame', '0018_score_columns')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.latest = MigrationExecutor(connection).loader.graph.leaf_nodes('ogame')
+        self.addCleanup(self.migrate, self.latest)
+        apps = self.migrate(self.migrate_from)
+
+        player = apps.get_model('ogame', 'Player').objects.create(
+            player_id=1,
+            name='one',
+            server_id='144',
+            planets=b'{}'
+        )
+        blobs = {
+            category: json.dumps({'score': 1000.5 + index, 'rank': index + 1}).encode('utf-8')
+            for index, category in enumerate(Score.CATEGORIES)
+        }
+        blobs['military'] = json.dumps({'score': 20.0, 'rank': 7, 'ships': 350}).encode('utf-8')
+        scores = apps.get_model('ogame', 'Score').objects
+        scores.create(player=player, timestamp=1600000000, **blobs)
+        # scores of players without highscores were stored with empty blobs
+        scores.create(player=player, timestamp=1600003600)
+
+    def test_backfilled_columns(self):
+        apps = self.migrate(self.migrate_to)
+
+        score, empty = apps.get_model('ogame', 'Score').objects.order_by('timestamp')
+        self.assertEqual((score.total_score, score.total_rank), (1000.5, 1))
+        self.assertEqual((score.honor_score, score.honor_rank), (1007.5, 8))
+        self.assertEqual((score.military_score, score.military_rank, score.military_ships), (20.0, 7, 350))
+        self.assertEqual(
+            [getattr(empty, f'{category}_score') for category in Score.CATEGORIES] + [empty.military_ships],
+            [None] * 9
+        )
+
+
+class CompressedDictTestCase(TestCase):
+    def test_round_trip(self):
+        data = {'204': 10, '205': 3}
+        bit_string = CompressedDict(data).bit_string
+        self.assertTrue(CompressedDict.is_current(bit_string))
+        self.assertEqual(CompressedDict.decode(bit_string), data)
+
+    @override_settings(COMPRESSED_DICT_LEGACY_READS=True)
+    @mock.patch('ogame.types.legacy_read_logged', False)
+    def test_legacy_reads_logged_once(self):
+        with self.assertLogs('ogame.types', 'WARNING') as logs:
+            self.assertEqual(CompressedDict.decode(b"{'1:2:3': 4}"), {'1:2:3': 4})
+            self.assertEqual(CompressedDict.decode(b'{"204": 10}'), {'204': 10})
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('recompress_blobs', logs.output[0])
+
+    @override_settings(COMPRESSED_DICT_LEGACY_READS=False)
+    def test_legacy_reads_off(self):
+        with self.assertRaises(ValueError):
+            CompressedDict.decode(b'{"204": 10}')
+        self.assertEqual(CompressedDict.decode_legacy(b'{"204": 10}'), {'204': 10})
+
+    def test_corrupt_legacy_payload(self):
+        with self.assertRaises(ValueError):
+            CompressedDict.decode_legacy(b'not a payload')
+
+
+class ScoreRollupsTestCase(TestCase):
+    def setUp(self):
+        # a crawl cycle every two hours at 40 minutes past the hour
+        start = 1600000000 - 1600000000 % 3600 + 40 * 60
+        for sample in range(24):
+            ingest = PlayerScoreIngest()
+            ingest.add(player_record(1, 'one', timestamp=start + sample * 7200, total=1000.0 + sample * (sample % 5)))
+            ingest.flush()
+            ScoreRollups.add_records(ingest.written)
+        self.player = Player.objects.get()
+
+    def test_hour_buckets_match_raw_scores(self):
+        raw = hour_relative_freq(ScoreRollups.history(self.player), '3600S')
+        rolled_up = hour_relative_freq(ScoreRollups.history(self.player, HourlyScore), '3600S')
+
+        self.assertEqual(list(rolled_up.index), list(raw.index))
+        self.assertEqual(list(rolled_up.REL_FREQ), list(raw.REL_FREQ))
+
+    def test_rebuilt_from_raw_scores(self):
+        fields = ['start'] + ScoreRollups.FIELDS
+        for model in (HourlyScore, DailyScore):
+            crawled = list(model.objects.order_by('start').values_list(*fields))
+            model.objects.all().delete()
+            self.assertEqual(ScoreRollups.add_scores(Score.objects.all(), batch_size=5), 24)
+            self.assertEqual(list(model.objects.order_by('start').values_list(*fields)), crawled)
+
+    def test_pruned_once_per_cycle(self):
+        with mock.patch.object(OgameStatsCrawler, 'crawl') as crawl, \
+                mock.patch.object(ScoreRollups, 'prune') as prune:
+            OgameStatsCrawler.crawl_universes([('br', 144)])
+        crawl.assert_called_once_with('br', 144, PlayerDataFetcher.WORKERS)
+        prune.assert_called_once()
+
+    def test_players_hour_frequency_window(self):
+        query = '''
+            query ($start: DateTime) {
+                players(datetime_Gte: $start) { scores { timestamp } hourRelativeFrequency { hours } }
+            }
+        '''
+        first = Score.objects.order_by('datetime').first().datetime
+        everything = schema.execute(query, variables={'start': first.isoformat()}, context_value=SimpleNamespace())
+        window = schema.execute(
+            query,
+            variables={'start': (first + timedelta(hours=36)).isoformat()},
+            context_value=SimpleNamespace()
+        )
+        self.assertIsNone(everything.errors)
+        self.assertIsNone(window.errors)
+
+        everything, window = everything.data['players'][0], window.data['players'][0]
+        self.assertEqual(len(everything['scores']), 24)
+        self.assertEqual(len(window['scores']), 6)
+        self.assertEqual(len(everything['hourRelativeFrequency']['hours']), 12)
+        self.assertEqual(len(window['hourRelativeFrequency']['hours']), 6)
+
+
+class ScoreArchiveTestCase(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        self.archive = ScoreArchive(archive_dir.name)
+        if not self.archive.enabled:
+            self.skipTest('pyarrow is not installed')
+
+        # two players crawled every eight hours, over three days
+        self.ingest = PlayerScoreIngest()
+        for sample in range(6):
+            for player_id in (1, 2):
+                self.ingest.add(player_record(
+                    player_id, str(player_id), timestamp=1600000000 + sample * 28800, total=1000.0 * player_id + sample
+                ))
+        self.ingest.flush()
+        self.player = Player.objects.get(player_id=1)
+
+    def test_round_trip(self):
+        self.archive.append_records(self.ingest.written)
+        # a backfill archives the same scores again
+        self.archive.append_records(self.ingest.written[:4])
+
+        # a file per write and day
+        self.assertEqual(len(self.archive.files()), 4)
+        frame = self.archive.read()
+        self.assertEqual(list(frame.columns), ScoreArchive.COLUMNS)
+        self.assertEqual(len(frame), 12)
+        self.assertEqual(
+            self.archive.history(self.player.pk),
+            [(score.datetime, score.total_score) for score in self.player.score_set.order_by('timestamp')]
+        )
+
+    def test_read_range(self):
+        self.archive.append_records(self.ingest.written)
+        start = datetime.fromtimestamp(1600000000 + 28800, pytz.utc)
+        stop = datetime.fromtimestamp(1600000000 + 3 * 28800, pytz.utc)
+
+        frame = self.archive.read(['timestamp', 'total_score'], start, stop, player_ids=[self.player.pk])
+        self.assertEqual(list(frame.columns), ['timestamp', 'total_score'])
+        self.assertEqual(list(frame.total_score), [1001.0, 1002.0, 1003.0])
+        self.assertEqual(len(self.archive.read(start=stop + timedelta(days=2))), 0)
+
+
+class ConnectionTestCase(TestCase):
+    def setUp(self):
+        for cycle in range(3):
+            ingest = PlayerScoreIngest()
+            for player_id in range(1, 8):
+                record = player_record(player_id, f'player{player_id}', timestamp=1600000000 + cycle * 3600)
+                record['rank'] = None if player_id == 7 else 8 - player_id
+                ingest.add(record)
+            ingest.flush()
+
+    def walk(self, field, node, first, arguments=''):
+        nodes, after, pages = [], None, 0
+        while True:
+            cursor = f', after: "{after}"' if after else ''
+            result = schema.execute(
+                '{ %s(first: %d%s%s) { totalCount pageInfo { hasNextPage endCursor } edges { node { %s } } } }'
+                % (field, first, cursor, arguments, node),
+                context_value=SimpleNamespace()
+            )
+            self.assertIsNone(result.errors)
+            connection = result.data[field]
+            nodes += [edge['node'] for edge in connection['edges']]
+            pages += 1
+            if not connection['pageInfo']['hasNextPage']:
+                return nodes, pages, connection['totalCount']
+            after = connection['pageInfo']['endCursor']
+
+    def test_players_pages(self):
+        players, pages, total = self.walk('playersConnection', 'playerId rank', 3)
+
+        self.assertEqual((pages, total), (3, 7))
+        # by rank, players without rank last
+        self.assertEqual([player['playerId'] for player in players], [6, 5, 4, 3, 2, 1, 7])
+
+    def test_scores_pages(self):
+        scores, pages, total = self.walk('scoresConnection', 'timestamp', 4, ', playerId: 2')
+
+        self.assertEqual((pages, total), (1, 3))
+        scores, pages, total = self.walk('scoresConnection', 'timestamp', 4)
+        self.assertEqual((pages, total), (6, 21))
+        self.assertEqual(len(scores), 21)
+        self.assertEqual([score['timestamp'] for score in scores], sorted(score['timestamp'] for score in scores))
+
+    def test_invalid_cursor(self):
+        result = schema.execute('{ playersConnection(first: 2, after: "garbage") { totalCount } }')
+        self.assertEqual(str(result.errors[0]), 'Invalid cursor')
+
+    @override_settings(GRAPHQL_MAX_PAGE_SIZE=5)
+    def test_page_size_limit(self):
+        result = schema.execute('{ playersConnection(first: 6) { totalCount } }')
+        self.assertIsNotNone(result.errors)
+
+        # the deprecated list fields are not paginated
+        result = schema.execute('{ players { playerId } scores { timestamp } }', context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['players']), 7)
+        self.assertEqual(len(result.data['scores']), 21)
+
+
+class LoadersTestCase(TestCase):
+    QUERY = '''{
+        players {
+            name combatReportsCount shipsCount planetsCount
+            alliance { name founder { name } }
+            scores { timestamp }
+        }
+        combatReports { title attackerPlayers { name } defenderPlayers { name } }
+    }'''
+
+    def add_players(self, first, count):
+        """
+        Adds `count` players, an alliance and a combat report between them.
+        """
+        ingest = PlayerScoreIngest()
+        for player_id in range(first, first + count):
+            for cycle in range(2):
+                ingest.add(player_record(player_id, f'player {player_id}', timestamp=1600000000 + cycle * 3600))
+        ingest.flush()
+
+        players = list(Player.objects.filter(player_id__gte=first, player_id__lt=first + count).order_by('player_id'))
+        alliance = Alliance.objects.create(ally_id=first, server_id='144', name=f'alliance {first}', founder=players[0])
+        alliance.members.set(players)
+        Player.objects.filter(pk__in=[player.pk for player in players]).update(alliance=alliance)
+        Planet.objects.bulk_create([
+            Planet(player=player, planet_id=player.player_id, name='home', galaxy=1, system=1, position=index)
+            for index, player in enumerate(players, 1)
+        ])
+        report = CombatReport.objects.create(title=f'report {first}', url=f'https://forum.test/{first}')
+        report.attacker_players.set(players[:1])
+        report.defender_players.set(players[1:])
+
+    def test_loaders_match_orm_lookups(self):
+        self.add_players(1, 3)
+        self.add_players(4, 3)
+        players = list(Player.objects.order_by('pk'))
+        alliances = list(Alliance.objects.order_by('pk'))
+        reports = list(CombatReport.objects.order_by('pk'))
+        loaders = Loaders()
+        lookups = [
+            (loaders.alliance_members, [a.pk for a in alliances], [list(a.members.order_by('pk')) for a in alliances]),
+            (loaders.attacker_players, [r.pk for r in reports], [list(r.attacker_players.all()) for r in reports]),
+            (loaders.defender_players, [r.pk for r in reports], [list(r.defender_players.all()) for r in reports]),
+            (loaders.player_scores, [p.pk for p in players], [list(p.score_set.order_by('pk')) for p in players]),
+            (loaders.player_planets, [p.pk for p in players], [list(p.planet_set.all()) for p in players]),
+            (loaders.alliance, [p.alliance_id for p in players], [p.alliance for p in players]),
+            # players without reports count none
+            (loaders.combat_reports_count, [p.pk for p in players] + [0], [
+                p.combat_report_attacker.count() + p.combat_report_defender.count() for p in players
+            ] + [0]),
+        ]
+
+        for loader, keys, expected in lookups:
+            # attackers and defenders are counted apart
+            with self.assertNumQueries(2 if loader is loaders.combat_reports_count else 1):
+                # loads made while a promise resolves are batched, as in the executor
+                loaded = Promise.resolve(None).then(lambda _: loader.load_many(keys)).get()
+            self.assertEqual(loaded, expected)
+
+    def test_query_count_constant(self):
+        self.add_players(1, 2)
+        with CaptureQueriesContext(connection) as few:
+            result = schema.execute(self.QUERY, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['players']), 2)
+
+        for first in range(3, 30, 3):
+            self.add_players(first, 3)
+        with CaptureQueriesContext(connection) as many:
+            result = schema.execute(self.QUERY, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data['players']), 29)
+        self.assertEqual(len(many), len(few))
+
+    def test_abstract_loader(self):
+        with self.assertRaises(TypeError):
+            RelationLoader()
+
+
+class QueryOptimizerTestCase(TestCase):
+    def optimize(self, queryset, query):
+        """
+        Optimizes `queryset` for the first field of `query`, as its resolver
+        would.
+        """
+        definitions = parse(query).definitions
+        info = SimpleNamespace(
+            fragments={d.name.value: d for d in definitions if isinstance(d, ast.FragmentDefinition)},
+            field_asts=definitions[0].selection_set.selections
+        )
+        return optimize(queryset, info)
+
+    def test_only_and_select_related(self):
+        queryset = self.optimize(Player.objects.all(), '''
+            { players { name shipsCount planetsCount alliance { name } ...Rank } }
+            fragment Rank on PlayerType { rank }
+        ''')
+        only, deferred = queryset.query.deferred_loading
+        self.assertFalse(deferred)
+        # planetsCount has no column, the planets blob is not loaded
+        self.assertEqual(set(only), {
+            'name', 'rank', 'alliance', 'latest_score', 'latest_score__military_ships', 'alliance__name',
+            'alliance__founder'
+        })
+        self.assertEqual(queryset.query.select_related, {'alliance': {}, 'latest_score': {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+
+    def test_prefetch(self):
+        queryset = self.optimize(Alliance.objects.all(), '{ alliances { tag members { name alliance { tag } } } }')
+        self.assertEqual(set(queryset.query.deferred_loading[0]), {'tag', 'founder'})
+        self.assertIs(queryset.query.select_related, False)
+
+        prefetch, = queryset._prefetch_related_lookups
+        self.assertEqual(prefetch.prefetch_to, 'members')
+        self.assertEqual(
+            set(prefetch.queryset.query.deferred_loading[0]),
+            {'name', 'alliance', 'latest_score', 'alliance__tag', 'alliance__founder'}
+        )
+        self.assertEqual(prefetch.queryset.query.select_related, {'alliance': {}})
+
+    def test_selected_columns_queried(self):
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.flush()
+
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute('{ players { name } }', context_value=SimpleNamespace())
+        self.assertEqual(result.data, {'players': [{'name': 'one'}]})
+        sql, = [query['sql'] for query in queries]
+        self.assertIn('"ogame_player"."name"', sql)
+        self.assertNotIn('"ogame_player"."planets"', sql)
+        self.assertNotIn('"ogame_player"."status"', sql)
+
+
+class GraphQLViewTestCase(TestCase):
+    def setUp(self):
+        caches['graphql'].clear()
+        response_cache.invalidate()
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.flush()
+
+    def post(self, body):
+        return self.client.post('/graphql/', json.dumps(body), content_type='application/json')
+
+    @mock.patch.object(response_cache, 'version_ttl', 3600)
+    def test_response_cache_crawl_version(self):
+        query = {'query': '{ players { name } }'}
+        self.assertEqual(self.post(query).json(), {'data': {'players': [{'name': 'one'}]}})
+        Player.objects.update(name='renamed')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post(query).json(), {'data': {'players': [{'name': 'one'}]}})
+
+        # a finished crawl bumps the version once the memoized one expires
+        CrawlRun.objects.create(
+            job='crawl_ogame',
+            status=CrawlRun.SUCCESS,
+            started_at=timezone.now(),
+            finished_at=timezone.now()
+        )
+        response_cache.invalidate()
+        self.assertEqual(self.post(query).json(), {'data': {'players': [{'name': 'renamed'}]}})
+
+    @mock.patch.object(response_cache, 'version_ttl', 3600)
+    def test_commands_bump_crawl_version(self):
+        query = {'query': '{ players { name } }'}
+        self.assertEqual(self.post(query).json(), {'data': {'players': [{'name': 'one'}]}})
+        Player.objects.update(name='renamed')
+        other_process = GraphQLResponseCache(version_ttl=0)
+        version = other_process.crawl_version()
+
+        call_command('rollup_scores', stdout=StringIO())
+        self.assertNotEqual(other_process.crawl_version(), version)
+        self.assertEqual(self.post(query).json(), {'data': {'players': [{'name': 'renamed'}]}})
+
+    def test_errors_not_cached(self):
+        query = {'query': '{ player(playerId: 2) { name } }'}
+        self.assertIn('errors', self.post(query).json())
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(2, 'two'))
+        ingest.flush()
+        self.assertEqual(self.post(query).json(), {'data': {'player': {'name': 'two'}}})
+
+
+class PersistedQueryTestCase(TestCase):
+    QUERY = '{ players { name } }'
+
+    def setUp(self):
+        caches['graphql'].clear()
+        document_backend.documents.clear()
+        ingest = PlayerScoreIngest()
+        ingest.add(player_record(1, 'one'))
+        ingest.flush()
+
+    def post(self, query=None, sha256=None):
+        body = {}
+        if query is not None:
+            body['query'] = query
+        if sha256 is not None:
+            body['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': sha256}}
+        return self.client.post('/graphql/', json.dumps(body), content_type='application/json')
+
+    def test_automatic_registration(self):
+        sha256 = query_hash(self.QUERY)
+        self.assertEqual(self.post(sha256=sha256).json(), {'errors': [{'message': 'PersistedQueryNotFound'}]})
+        self.assertEqual(self.post(self.QUERY, sha256).status_code, 200)
+
+        document_backend.documents.clear()
+        self.assertEqual(self.post(sha256=sha256).json(), {'data': {'players': [{'name': 'one'}]}})
+        self.assertEqual(self.post(self.QUERY + ' ', sha256).status_code, 400)
+
+    @mock.patch.object(persisted_queries, 'allow_list', True)
+    def test_allow_list(self):
+        registered = '{ players { playerId } }'
+        PersistedQuery.objects.create(sha256=query_hash(registered), query=registered)
+
+        self.assertEqual(self.post(registered).status_code, 200)
+        self.assertEqual(self.post(sha256=query_hash(registered)).json(), {'data': {'players': [{'playerId': 1}]}})
+
+        response = self.post(self.QUERY)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'errors': [{'message': 'Query is not a persisted query.'}]})
+        self.assertEqual(self.post(self.QUERY, query_hash(self.QUERY)).status_code, 403)
+        response = self.post(sha256=query_hash(self.QUERY))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'errors': [{'message': 'Query is not a persisted query.'}]})
@@ -1,11 +1,19 @@
 from __future__ import unicode_literals
 import json
-from typing import Optional, DefaultDict, Dict
+import logging
+import zlib
+from ast import literal_eval
+from typing import Any, Optional, DefaultDict, Dict
 from collections import defaultdict, OrderedDict
+from django.conf import settings
 from graphene.types.scalars import MAX_INT, MIN_INT, Scalar
 from graphql.language.ast import (BooleanValue, FloatValue, IntValue,
                                   ListValue, ObjectValue, StringValue)
 
+LOGGER = logging.getLogger(__name__)
+# legacy CompressedDict reads are logged once per process
+legacy_read_logged = False
+
 
 class DynamicScalar(Scalar):
     """
@@ -45,19 +53,82 @@ class DynamicScalar(Scalar):
 class CompressedDict:
     """
     Comprime um dicionário em formato binário para armazenamento robusto.
+
+    Payloads start with a header byte naming the codec version, currently
+    compact JSON compressed with zlib. Payloads written before the header
+    existed are decoded by `decode_legacy`, and by `decode` only while the
+    COMPRESSED_DICT_LEGACY_READS setting is on, until recompress_blobs
+    rewrote them.
     """
+    ZLIB_JSON = 1
+    VERSION = ZLIB_JSON
+    LEVEL = 6
+
     def __init__(self, data: Dict[str, int]) -> None:
         self._compress(data)
 
     def _compress(self, data: Dict[str, int]) -> None:
-        self.bit_string = json.dumps(data).encode('utf-8')
+        self.bit_string = CompressedDict.encode(data)
 
     def decompress(self) -> DefaultDict[str, int]:
-        return json.loads(self.bit_string.decode('utf-8'))
+        return CompressedDict.decode(self.bit_string)
+
+    @staticmethod
+    def encode(data: Any) -> bytes:
+        payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return bytes([CompressedDict.VERSION]) + zlib.compress(payload, CompressedDict.LEVEL)
+
+    @staticmethod
+    def decode(bit_string: bytes) -> Any:
+        """
+        Returns the object stored in a payload of the current codec version.
+        """
+        if not bit_string:
+            return None
+        bit_string = bytes(bit_string)
+
+        if bit_string[0] == CompressedDict.ZLIB_JSON:
+            return json.loads(zlib.decompress(bit_string[1:]).decode('utf-8'))
+        if bit_string[0] < 0x20:
+            raise ValueError(f'Unknown CompressedDict codec version {bit_string[0]}')
+        if not settings.COMPRESSED_DICT_LEGACY_READS:
+            raise ValueError('CompressedDict payload has no codec version header')
+
+        global legacy_read_logged
+        if not legacy_read_logged:
+            legacy_read_logged = True
+            LOGGER.warning(
+                'Decoded a CompressedDict payload without codec version, run recompress_blobs to rewrite '
+                'the stored payloads, further legacy reads of this process are not logged'
+            )
+        return CompressedDict.decode_legacy(bit_string)
+
+    @staticmethod
+    def decode_legacy(bit_string: bytes) -> Any:
+        """
+        Returns the object stored in a payload written before the codec
+        version header, plain JSON or, for the alliance coordinates saved
+        once, a python literal.
+        """
+        bit_string = bytes(bit_string)
+        if bit_string[0] == CompressedDict.ZLIB_JSON:
+            return CompressedDict.decode(bit_string)
+
+        text = bit_string.decode('utf-8')
+        try:
+            return json.loads(text)
+        except ValueError:
+            if not text.lstrip().startswith(('{', '[')):
+                raise
+            return literal_eval(text)
+
+    @staticmethod
+    def is_current(bit_string: bytes) -> bool:
+        return not bit_string or bytes(bit_string[:1]) == bytes([CompressedDict.VERSION])
 
     @staticmethod
     def decompress_bytes(bit_string: bytes) -> Dict[str, int]:
-        data = json.loads(bit_string.decode('utf-8')) if bit_string else {}
+        data = CompressedDict.decode(bit_string) or {}
         return defaultdict(int, data)
 
     def __repr__(self) -> str:
@@ -2,7 +2,6 @@ from datetime import datetime, timedelta
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 import pytz
-from ogame.types import CompressedDict
 
 
 class FleetHashMap:
@@ -86,15 +85,8 @@ def day_to_int(weekday):
     return conversion_table.get(weekday, 0)
 
 
-def get_prediction_df(player_scores):
-    data = []
-    for score in player_scores:
-        try:
-            dt = score.datetime
-            total = CompressedDict.decompress_bytes(score.total)['score']
-            data.append([dt, total])
-        except:
-            continue
+def get_prediction_df(history):
+    data = [[dt, total] for dt, total in history]
 
     df = pd.DataFrame(data, columns=['datetime', 'total'])
     if not data:
@@ -115,17 +107,9 @@ def get_prediction_df(player_scores):
     return df, future_dates
 
 
-def get_activity_df(player_scores):
-    data = []
-    datetimes = []
-    for score in player_scores:
-        try:
-            dt = score.datetime
-            total = CompressedDict.decompress_bytes(score.total)['score']
-            data.append([dt, total])
-            datetimes.append(dt)
-        except:
-            continue
+def get_activity_df(history):
+    data = [[dt, total] for dt, total in history]
+    datetimes = [dt for dt, _ in data]
 
     # set up dataframe indexed by dayhours
     df = pd.DataFrame(
@@ -150,8 +134,8 @@ def get_activity_df(player_scores):
     return df
 
 
-def get_future_activity(player_scores):
-    df = get_activity_df(player_scores)
+def get_future_activity(history):
+    df = get_activity_df(history)
 
     # define an estimator and train it over player score diff 
     estimator = RandomForestRegressor()
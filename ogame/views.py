@@ -1,6 +1,10 @@
+import json
 import requests
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from graphene_django.views import GraphQLView, HttpError
+from ogame.cache import response_cache
+from ogame.documents import document_backend, persisted_queries, query_hash
 
 
 def api_root(request):
@@ -8,4 +12,78 @@ def api_root(request):
 
 
 def wiki(request):
-    return HttpResponse(requests.get('https://github.com/brunolcarli/Invictus/wiki').content)
\ No newline at end of file
+    return HttpResponse(requests.get('https://github.com/brunolcarli/Invictus/wiki').content)
+
+
+class CachedGraphQLView(GraphQLView):
+    """
+    GraphQL view serving repeated queries from the response cache, with
+    the parsed and validated documents kept by the document backend.
+
+    Only responses of query operations executed without errors are cached.
+    Queries can be requested by hash as persisted queries.
+    """
+    def get_backend(self, request):
+        return document_backend
+
+    @staticmethod
+    def get_persisted_hash(request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if not extensions:
+            return None
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+        persisted_query = extensions.get('persistedQuery') or {}
+        return persisted_query.get('sha256Hash')
+
+    def get_persisted_query(self, request, data, key):
+        """
+        Returns the query text of the request, from the persisted queries when
+        only its `key` hash was sent. Returns None for a hash of an unknown
+        query.
+        """
+        query, _, _, _ = self.get_graphql_params(request, data)
+        if key is not None:
+            if not query:
+                return persisted_queries.lookup(key)
+            if query_hash(query) != key:
+                raise HttpError(HttpResponseBadRequest('Provided sha256Hash does not match the query.'))
+        if query and persisted_queries.allow_list and not persisted_queries.is_allowed(query):
+            raise HttpError(HttpResponseForbidden('Query is not a persisted query.'))
+        if key is not None:
+            persisted_queries.register(key, query)
+        return query
+
+    def get_response(self, request, data, show_graphiql=False):
+        persisted_hash = self.get_persisted_hash(request, data)
+        query = self.get_persisted_query(request, data, persisted_hash)
+        if query is None and persisted_hash is not None:
+            if persisted_queries.allow_list:
+                # unknown hashes can not be registered, the client must not retry with the query
+                raise HttpError(HttpResponseForbidden('Query is not a persisted query.'))
+            return self.json_encode(request, {'errors': [{'message': 'PersistedQueryNotFound'}]}), 200
+        data = dict(data.items(), query=query)
+
+        _, variables, operation_name, _ = self.get_graphql_params(request, data)
+        pretty = bool(self.pretty or show_graphiql or request.GET.get('pretty'))
+        key = response_cache.get_key(query, variables, operation_name, pretty)
+        if key is not None:
+            response = response_cache.get(key)
+            if response is not None:
+                return response, 200
+
+        self.execution_errors = True
+        response, status_code = super().get_response(request, data, show_graphiql)
+        if key is not None and status_code == 200 and not self.execution_errors and response:
+            response_cache.set(key, response)
+        return response, status_code
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        execution_result = super().execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        self.execution_errors = execution_result is None or bool(execution_result.errors)
+        return execution_result